@@ -1,65 +1,118 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import langchain
 import streamlit as st
-from langchain.agents import AgentType, initialize_agent
-from langchain.cache import InMemoryCache
-from langchain.callbacks import StreamlitCallbackHandler
+from langchain.callbacks import StreamlitCallbackHandler, tracing_v2_enabled
 from langchain.chat_models import ChatOpenAI
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import MessagesPlaceholder
-from langchain.schema import SystemMessage
-from langchain.tools import format_tool_to_openai_function
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 from components.about import about
 from components.calendar import calendarComponent
 from components.timetable import timetable
-from utils.fewshots import example_1, example_2, example_3
-from utils.tools import (
-    TimetableAvailabilityTool,
-    TimetableDeleteTool,
-    TimetableGetTool,
-    TimetablePostTool,
+from utils import metrics
+from utils.agent import FinalAnswerStreamHandler, TurnMetricsHandler, build_agent
+from utils.backends import get_backend
+from utils.llm_cache import TimetableLLMCache
+from utils.memory import TimetableMemory
+from utils.replay import TranscriptRecorder
+from utils.router import answer
+
+# LangChain tracing is not switched on globally, only the sampled agent turns
+# are traced, see ``utils.metrics``.
+TRACING = str(st.secrets.get("LANGCHAIN_TRACING_V2", "false")).lower() == "true"
+if TRACING:
+    os.environ["LANGCHAIN_ENDPOINT"] = st.secrets["LANGCHAIN_ENDPOINT"]
+    os.environ["LANGCHAIN_API_KEY"] = st.secrets["LANGCHAIN_API_KEY"]
+
+# Agent turns are appended here for ``benchmarks.replay_agent`` when set.
+TRANSCRIPT_FILE = os.environ.get("TIMETABLE_TRANSCRIPT")
+
+logger = logging.getLogger(__name__)
+
+
+@st.cache_resource(show_spinner=False)
+def get_llm_cache(path):
+    # Answers depend on the Timetable, sessions holding the same one share them.
+    return TimetableLLMCache(path, stamp=lambda: get_backend().content_stamp())
+
+
+langchain.llm_cache = get_llm_cache(
+    os.environ.get("TIMETABLE_LLM_CACHE", ".timetable_llm_cache.db")
 )
 
-os.environ["LANGCHAIN_TRACING_V2"] = st.secrets["LANGCHAIN_TRACING_V2"]
-os.environ["LANGCHAIN_ENDPOINT"] = st.secrets["LANGCHAIN_ENDPOINT"]
-os.environ["LANGCHAIN_API_KEY"] = st.secrets["LANGCHAIN_API_KEY"]
-
-langchain.debug = True
-
-langchain.llm_cache = InMemoryCache()
-
-tools = [
-    TimetableAvailabilityTool(),
-    TimetableGetTool(),
-    TimetablePostTool(),
-    TimetableDeleteTool(),
-]
-functions = [format_tool_to_openai_function(tool) for tool in tools]
-
-agent_kwargs = {
-    "system_message": SystemMessage(
-        content="""You are an helpful AI assistant who is expert with time management and can handle multiple PERSON and/or ROOM schedule so that no schedule will overlap each other.
-You DO NOT answer anything unrelated to timetable and politely informs that you are programmed to only answer timetable related questions.
-If you do not know the answer to a question, you truthfully says you do not know.
-============
-While helping USER managing Timetable, keep in mind that:
-1 - USER cannot request to occupy a ROOM if there is an overlap between occupied time range and requested time range.
-2 - USER cannot request to meet with a PERSON if there is an overlap between occupied time range and requested time range.
-3 - Similarly, each PERSON listed in the Timetable cannot request to meet with other PERSON if one of them is unavailable.
-============
-Before giving your answer, make sure your answer _DOES NOT result in overlaps_ between user request and existing timetable configuration.
-State your reasoning to the USER for every answer you give."""
-    ),
-    "extra_prompt_messages": [
-        # Few shot examples
-        *example_1,
-        *example_2,
-        *example_3,
-        MessagesPlaceholder(variable_name="memory"),
-    ],
-}
+
+@st.cache_resource(show_spinner=False)
+def get_llm(openai_api_key_hash, model, _openai_api_key):
+    return ChatOpenAI(
+        client="TimetableGPT",
+        temperature=0,
+        model=model,
+        openai_api_key=_openai_api_key,
+        streaming=True,
+    )
+
+
+def get_agent(openai_api_key, model, multi_action):
+    """Agent of this session, rebuilt only when the API key or the settings change."""
+    agent_key = (hashlib.sha256(openai_api_key.encode()).hexdigest(), model)
+    if st.session_state.get("agent_key") != (*agent_key, multi_action):
+        setup_start = time.perf_counter()
+        st.session_state["agent"] = build_agent(
+            get_llm(*agent_key, openai_api_key),
+            st.session_state["memory"],
+            multi_action=multi_action,
+        )
+        st.session_state["agent_key"] = (*agent_key, multi_action)
+        logger.info("agent setup took %.3f s", time.perf_counter() - setup_start)
+    return st.session_state["agent"]
+
+
+def run_async(coroutine):
+    """Run ``coroutine`` in this script thread.
+
+    Tools and synchronous callbacks run in the loop's default executor. Its
+    threads get the script run context, so they can use the session state and
+    draw the Streamlit elements.
+    """
+    ctx = get_script_run_ctx()
+    executor = ThreadPoolExecutor(
+        max_workers=8,
+        thread_name_prefix="timetable-agent",
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(executor)
+        return await coroutine
+
+    return asyncio.run(main())
+
+
+def log_turn(path, seconds, first_token_seconds=None):
+    """Keep the latency of each answer path (rules or agent) for this session.
+
+    ``first_token_seconds`` is the time until the answer started to stream.
+    """
+    turn_latency = st.session_state.setdefault("turn_latency", {})
+    turn_latency.setdefault(path, []).append(seconds)
+    logger.info(
+        "%s turn took %.3f s (mean %.3f s over %d turns)",
+        path,
+        seconds,
+        sum(turn_latency[path]) / len(turn_latency[path]),
+        len(turn_latency[path]),
+    )
+    if first_token_seconds is not None:
+        logger.info(
+            "%s turn streamed its first token after %.3f s", path, first_token_seconds
+        )
 
 
 def callback_function(state, key):
@@ -98,6 +151,18 @@ with st.sidebar:
 
     calendar_mode = st.selectbox("Calendar Mode:", ("Room", "Person"))
 
+    parallel_tools = st.checkbox(
+        "Run independent tool calls in parallel",
+        value=True,
+        help="Let the model request several tools in one step, e.g. the availability of several rooms, and run them concurrently.",
+    )
+
+    fast_path = st.checkbox(
+        "Answer simple questions without the LLM",
+        value=True,
+        help="Availability, schedule and conflict questions are answered directly from the Timetable when they can be parsed.",
+    )
+
     st.markdown(
         "# How to use\n"
         "1. Enter your [OpenAI API key](https://platform.openai.com/account/api-keys) below🔑\n"
@@ -110,6 +175,17 @@ with st.sidebar:
     )
     about()
 
+    with st.expander("Metrics"):
+        st.download_button(
+            "Prometheus text", metrics.prometheus_text(), "metrics.txt", "text/plain"
+        )
+        st.download_button(
+            "Sampled turns (JSON lines)",
+            metrics.jsonl(),
+            "metrics.jsonl",
+            "application/jsonl",
+        )
+
 st.title("📆Timetable GPT")
 
 tab1, tab2, tab3 = st.tabs(["Chat", "Calendar", "Timetable"])
@@ -121,9 +197,9 @@ with tab2:
     calendarComponent(mode=str(calendar_mode))
 
 
-if "timetable" not in st.session_state:
+if not get_backend().has_timetable():
     st.error("Please input your Timetable first")
-elif st.session_state["timetable"].shape[0] == 0:
+elif get_backend().row_count() == 0:
     st.error("Please input your Timetable first")
 
 if "messages" not in st.session_state:
@@ -135,42 +211,77 @@ for message in st.session_state.messages:
             st.markdown(message["content"])
 
 if "memory" not in st.session_state:
-    st.session_state.memory = ConversationBufferMemory(
-        memory_key="memory", return_messages=True
-    )
+    st.session_state.memory = TimetableMemory(memory_key="memory", return_messages=True)
 
 
 if prompt := st.chat_input("Ask me about the timetable"):
     with tab1:
+        turn_start = time.perf_counter()
+        response = None
+        if fast_path:
+            with metrics.span("turn", "rules") as rules_span:
+                try:
+                    response = answer(prompt)
+                except Exception:
+                    # The agent can still answer what the rules trip over.
+                    logger.exception("rules failed on %r", prompt)
+                    response = None
+                if response is None:
+                    # Left to the agent, the turn is counted there.
+                    rules_span.discard()
+        if response is not None:
+            st.session_state.messages.append({"role": "user", "content": prompt})
+            st.chat_message("user").write(prompt)
+            with st.chat_message("assistant"):
+                st.markdown(response)
+            # Keep the exchange in memory, follow-up questions may need the agent.
+            st.session_state.memory.save_context(
+                {"input": prompt}, {"output": response}
+            )
+            log_turn("rules", time.perf_counter() - turn_start)
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            st.stop()
+
         if not openai_api_key:
             st.info("Please add your OpenAI API key to continue.")
             st.stop()
 
-        llm = ChatOpenAI(
-            client="TimetableGPT",
-            temperature=0,
-            model=str(model),
-            openai_api_key=openai_api_key,
-            streaming=True,
-        )
-
-        open_ai_agent_executor = initialize_agent(
-            tools,
-            llm,
-            agent=AgentType.OPENAI_FUNCTIONS,
-            verbose=True,
-            agent_kwargs=agent_kwargs,
-            memory=st.session_state["memory"],
-        )
+        open_ai_agent_executor = get_agent(openai_api_key, str(model), parallel_tools)
 
         st.session_state.messages.append({"role": "user", "content": prompt})
         st.chat_message("user").write(prompt)
 
         with st.chat_message("assistant"):
-            message_placeholder = st.empty()
+            # Tool steps above, the answer streams below them as it is written.
             st_callback = StreamlitCallbackHandler(
                 st.container(), expand_new_thoughts=True
             )
-            response = open_ai_agent_executor.run(prompt, callbacks=[st_callback])
+            message_placeholder = st.empty()
+            recorder = TranscriptRecorder()
+            with metrics.span("turn", "agent") as turn_span:
+                with (
+                    tracing_v2_enabled()
+                    if TRACING and turn_span.sampled
+                    else contextlib.nullcontext()
+                ):
+                    response = run_async(
+                        open_ai_agent_executor.arun(
+                            prompt,
+                            callbacks=[
+                                st_callback,
+                                FinalAnswerStreamHandler(
+                                    message_placeholder.markdown, turn_span
+                                ),
+                                TurnMetricsHandler(turn_span),
+                                recorder,
+                            ],
+                        )
+                    )
+            if TRANSCRIPT_FILE:
+                recorder.write(TRANSCRIPT_FILE, prompt, parallel_tools)
+            log_turn(
+                "agent", time.perf_counter() - turn_start, turn_span.first_token_seconds
+            )
+            logger.info("llm cache: %s", langchain.llm_cache.stats())
             message_placeholder.markdown(response)
         st.session_state.messages.append({"role": "assistant", "content": response})
@@ -0,0 +1,313 @@
+"""HTTP/JSON API of the Timetable engine, without Streamlit.
+
+Run with ``uvicorn api:app``. The Timetable is the SQLite database of
+``TIMETABLE_DATABASE`` when set. It is the only store that is safe with
+several workers (``--workers N``), as writes run in ``BEGIN IMMEDIATE``
+transactions. Otherwise the file of ``TIMETABLE_FILE`` (``sample.xlsx`` by
+default) is loaded into memory for this single process. Writes there are
+serialized by the backend lock and swap in a new frame, so requests served
+concurrently by the thread pool always read a consistent Timetable.
+"""
+import datetime
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
+
+from utils import metrics
+from utils.backends import DataFrameBackend, TimetableBackend, open_sqlite_backend
+from utils.classes import (
+    InstanceTypeEnum,
+    TimetableCheckInput,
+    TimetableFreeSlotInput,
+    TimetablePostBatchInput,
+    TimetablePostInput,
+    TimetablePostRecurringInput,
+    TimetableSolveInput,
+)
+from utils.functions import (
+    audit_timetable,
+    find_free_slots,
+    get_availability_json,
+    get_availability_matrix,
+    get_timetable,
+    post_timetable_batch_result,
+    solve_timetable,
+    working_hours_from,
+)
+from utils.recurrence import make_rule
+from utils.store import read_timetable
+
+
+class Schedule(BaseModel):
+    id: int
+    person: str
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+    room: str
+
+
+class FreeSlot(BaseModel):
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+
+
+class Window(BaseModel):
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+
+
+class AvailabilityMatrixRequest(BaseModel):
+    instance_type: InstanceTypeEnum = InstanceTypeEnum.ROOM
+    names: list[str] = []
+    windows: list[Window]
+
+
+class Conflict(BaseModel):
+    resource: str
+    name: str
+    row_id: int
+    other_row_id: int
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+
+
+class PlacedMeeting(BaseModel):
+    meeting: int
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+    room: str
+
+
+def open_backend() -> TimetableBackend:
+    database = os.environ.get("TIMETABLE_DATABASE")
+    if database:
+        return open_sqlite_backend(database)
+    file_name = os.environ.get("TIMETABLE_FILE", "sample.xlsx")
+    backend = DataFrameBackend({})
+    with open(file_name, "rb") as file:
+        backend.replace(read_timetable(file, file_name))
+    return backend
+
+
+app = FastAPI(title="TimetableGPT API")
+backend = open_backend()
+
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    with metrics.span("request", f"{request.method} {request.url.path}"):
+        return await call_next(request)
+
+
+@app.exception_handler(ValueError)
+def value_error_handler(request: Request, error: ValueError):
+    return JSONResponse(status_code=422, content={"detail": str(error)})
+
+
+@app.get("/health")
+def health() -> dict:
+    return {"status": "ok", "version": backend.version}
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(
+        metrics.prometheus_text(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/metrics/records")
+def get_metric_records():
+    return PlainTextResponse(metrics.jsonl(), media_type="application/jsonl")
+
+
+@app.post("/availability")
+def availability(request: TimetableCheckInput) -> dict:
+    """Unavailable person booked in any room, unavailable rooms booked by anyone."""
+    return get_availability_json(
+        request.person_requested,
+        request.datetime_start_requested,
+        request.datetime_end_requested,
+        request.room_requested,
+        backend=backend,
+    )
+
+
+@app.post("/availability/matrix")
+def availability_matrix(request: AvailabilityMatrixRequest) -> dict:
+    """One string per name with a character per window, "1" when free."""
+    free_df = get_availability_matrix(
+        request.instance_type.value,
+        request.names,
+        [window.datetime_start for window in request.windows],
+        [window.datetime_end for window in request.windows],
+        backend=backend,
+    )
+    return {
+        "names": free_df.index.tolist(),
+        "free": [
+            "".join("1" if free else "0" for free in row)
+            for row in free_df.to_numpy(dtype=bool).tolist()
+        ],
+    }
+
+
+@app.post("/timetable/query")
+def query(request: TimetableCheckInput) -> list[Schedule]:
+    timetable_df = get_timetable(
+        request.person_requested,
+        request.datetime_start_requested,
+        request.datetime_end_requested,
+        request.room_requested,
+        backend=backend,
+    )
+    return [
+        Schedule(id=row_id, **row)
+        for row_id, row in zip(
+            timetable_df.index.tolist(),
+            timetable_df.astype({"person": str, "room": str}).to_dict("records"),
+        )
+    ]
+
+
+@app.post("/conflict")
+def conflict(request: TimetableCheckInput) -> dict:
+    return {
+        "conflict": len(
+            get_timetable(
+                request.person_requested,
+                request.datetime_start_requested,
+                request.datetime_end_requested,
+                request.room_requested,
+                backend=backend,
+            )
+        )
+        > 0
+    }
+
+
+@app.post("/free-slots")
+def free_slots(request: TimetableFreeSlotInput) -> list[FreeSlot]:
+    return [
+        FreeSlot(datetime_start=slot_start, datetime_end=slot_end)
+        for slot_start, slot_end in find_free_slots(
+            request.person_requested,
+            request.room_requested,
+            request.datetime_start_requested,
+            request.datetime_end_requested,
+            datetime.timedelta(minutes=request.duration_minutes_requested),
+            working_hours_from(
+                request.working_hour_start_requested,
+                request.working_hour_end_requested,
+            ),
+            request.top_k,
+            backend=backend,
+        )
+    ]
+
+
+@app.get("/audit")
+def audit(max_pairs: int = 1000) -> dict:
+    conflicts_df, total, n_rows = audit_timetable(max_pairs, backend=backend)
+    return {
+        "total": total,
+        "rows": n_rows,
+        "conflicts": [
+            Conflict(**conflict)
+            for conflict in conflicts_df.astype({"name": str}).to_dict("records")
+        ],
+    }
+
+
+@app.post("/solve")
+def solve(request: TimetableSolveInput) -> dict:
+    placed_df, unplaced = solve_timetable(
+        request.meetings_requested,
+        working_hours_from(
+            request.working_hour_start_requested,
+            request.working_hour_end_requested,
+        ),
+        datetime.timedelta(minutes=request.step_minutes_requested),
+        backend=backend,
+    )
+    return {
+        "placed": [
+            PlacedMeeting(
+                meeting=number,
+                datetime_start=row.datetime_start,
+                datetime_end=row.datetime_end,
+                room=row.room,
+            )
+            for number, row in zip(placed_df.index.tolist(), placed_df.itertuples())
+        ],
+        "unplaced": unplaced,
+    }
+
+
+@app.post("/timetable")
+def post(request: TimetablePostInput):
+    if request.datetime_start_requested > request.datetime_end_requested:
+        raise ValueError(
+            f"time inversion found: {request.datetime_start_requested} > {request.datetime_end_requested}"
+        )
+    if not backend.post(
+        request.person_requested,
+        request.datetime_start_requested,
+        request.datetime_end_requested,
+        request.room_requested,
+    ):
+        return JSONResponse(
+            status_code=409,
+            content={"added": False, "detail": "conflict with the Timetable"},
+        )
+    return {"added": True}
+
+
+@app.post("/timetable/batch")
+def post_batch(request: TimetablePostBatchInput):
+    added, message = post_timetable_batch_result(
+        request.schedules_requested, backend=backend
+    )
+    if not added:
+        return JSONResponse(
+            status_code=409,
+            content={
+                "added": False,
+                "detail": "conflict with the Timetable",
+                "message": message,
+            },
+        )
+    return {"added": True, "message": message}
+
+
+@app.post("/timetable/recurring")
+def post_recurring(request: TimetablePostRecurringInput):
+    rule_df = make_rule(
+        request.person_requested,
+        request.datetime_start_requested,
+        request.datetime_end_requested,
+        request.room_requested,
+        request.frequency_requested,
+        request.interval_requested,
+        request.datetime_until_requested,
+    )
+    if not backend.post_rule(rule_df):
+        return JSONResponse(
+            status_code=409,
+            content={"added": False, "detail": "conflict with the Timetable"},
+        )
+    return {"added": True, "occurrences": int(rule_df["count"].iloc[0])}
+
+
+@app.post("/timetable/delete")
+def delete(request: TimetableCheckInput) -> dict:
+    return {
+        "deleted": backend.delete(
+            request.person_requested,
+            request.room_requested,
+            request.datetime_start_requested,
+            request.datetime_end_requested,
+        )
+    }
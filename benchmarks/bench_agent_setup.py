@@ -0,0 +1,83 @@
+"""Per-message setup cost of the agent before and after session caching.
+
+Run with ``python -m benchmarks.bench_agent_setup``. No request is sent to OpenAI.
+"""
+import timeit
+
+from langchain.agents import AgentType, initialize_agent
+from langchain.chat_models import ChatOpenAI
+from langchain.memory import ConversationBufferMemory
+from langchain.prompts import MessagesPlaceholder
+
+from utils.agent import SYSTEM_MESSAGE, TOOLS, build_agent
+from utils.fewshots import example_1, example_2, example_3
+
+
+def setup_before(memory):
+    llm = ChatOpenAI(
+        client="TimetableGPT",
+        temperature=0,
+        model="gpt-4",
+        openai_api_key="sk-benchmark",
+        streaming=True,
+    )
+    return initialize_agent(
+        TOOLS,
+        llm,
+        agent=AgentType.OPENAI_FUNCTIONS,
+        verbose=True,
+        agent_kwargs={
+            "system_message": SYSTEM_MESSAGE,
+            "extra_prompt_messages": [
+                *example_1,
+                *example_2,
+                *example_3,
+                MessagesPlaceholder(variable_name="memory"),
+            ],
+        },
+        memory=memory,
+    )
+
+
+def main():
+    memory = ConversationBufferMemory(memory_key="memory", return_messages=True)
+    llm = ChatOpenAI(
+        client="TimetableGPT",
+        temperature=0,
+        model="gpt-4",
+        openai_api_key="sk-benchmark",
+        streaming=True,
+    )
+    session = {}
+
+    def setup_after():
+        if "agent" not in session:
+            session["agent"] = build_agent(llm, memory)
+        return session["agent"]
+
+    number = 50
+    setup_after()
+    before = timeit.timeit(lambda: setup_before(memory), number=number) / number
+    after = timeit.timeit(setup_after, number=number) / number
+
+    agent_before = setup_before(memory).agent
+    agent_after = setup_after().agent
+    _ = agent_after.functions
+    functions_before = (
+        timeit.timeit(lambda: agent_before.functions, number=number) / number
+    )
+    functions_after = (
+        timeit.timeit(lambda: agent_after.functions, number=number) / number
+    )
+
+    print(
+        f"agent setup per message:    before {before * 1e3:.2f} ms, after {after * 1e6:.2f} us"
+    )
+    print(
+        f"function schemas per call:  before {functions_before * 1e3:.2f} ms, "
+        f"after {functions_after * 1e6:.2f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Turn latency with several tool calls in one step, sequential versus async.
+
+Run with ``python -m benchmarks.bench_async_tools``. The model is scripted, no
+request is sent to OpenAI. It asks for the availability of several rooms in
+one step, then answers, with ``LLM_LATENCY`` seconds per call.
+
+Each setting is run with the in-memory Timetable as is, and with
+``BACKEND_LATENCY`` seconds added to every backend query, like a store
+reached over the network. The pandas work of the tools holds the GIL for the
+most part, so without I/O waits the gain depends on the number of cores.
+"""
+import asyncio
+import itertools
+import json
+import time
+from unittest import mock
+
+import langchain
+from langchain.memory import ConversationBufferMemory
+
+from benchmarks.synthetic import make_timetable
+from utils.agent import build_agent
+from utils.backends import DataFrameBackend
+from utils.replay import ReplayChatOpenAI
+from utils.store import compact_timetable
+
+LLM_LATENCY = 0.5
+BACKEND_LATENCY = 0.1
+
+
+def main():
+    langchain.llm_cache = None
+    session_state = {
+        "timetable": compact_timetable(
+            make_timetable(1_000_000, n_person=5_000, n_room=1_000)
+        )
+    }
+    mock.patch("streamlit.session_state", session_state).start()
+
+    query = DataFrameBackend.query
+
+    def slow_query(*args, **kwargs):
+        time.sleep(BACKEND_LATENCY)
+        return query(*args, **kwargs)
+
+    print(
+        f"{'backend latency':>15} {'tool calls':>10} {'sequential (s)':>15} {'async (s)':>10}"
+    )
+    for backend_latency, n_actions in itertools.product(
+        (0, BACKEND_LATENCY), (1, 4, 8)
+    ):
+        with mock.patch.object(
+            DataFrameBackend, "query", slow_query if backend_latency else query
+        ):
+            actions = [
+                {
+                    "action_name": "timetable_availability",
+                    "action": {
+                        "room_requested": [f"Room {i}"],
+                        "datetime_start_requested": f"2023-02-{6 + i % 20:02d}T08:00:00",
+                        "datetime_end_requested": f"2023-02-{6 + i % 20:02d}T18:00:00",
+                    },
+                }
+                for i in range(n_actions)
+            ]
+            # The same turn is run twice, sequentially and then async.
+            turn = {
+                "input": "availability of the rooms",
+                "responses": [
+                    {
+                        "content": "",
+                        "function_call": {
+                            "name": "tool_selection",
+                            "arguments": json.dumps({"actions": actions}),
+                        },
+                    },
+                    {"content": "Done"},
+                ],
+            }
+            llm = ReplayChatOpenAI.from_transcript([turn, turn], latency=LLM_LATENCY)
+            agent = build_agent(
+                llm,
+                ConversationBufferMemory(memory_key="memory", return_messages=True),
+                multi_action=True,
+            )
+            agent.verbose = False
+
+            start = time.perf_counter()
+            agent.run("availability of the rooms")
+            sequential = time.perf_counter() - start
+            start = time.perf_counter()
+            asyncio.run(agent.arun("availability of the rooms"))
+            parallel = time.perf_counter() - start
+            print(
+                f"{backend_latency:>15} {n_actions:>10} {sequential:>15.2f} {parallel:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Full Timetable conflict audit against checking every row on its own.
+
+Run with ``python -m benchmarks.bench_audit``. "audit" lists the conflicting
+pairs with ``audit_timetable``, "mask" marks the conflicting rows like the
+editor and the calendar do, "per row" asks the backend for the schedules of
+each row's person and room, as ``get_conflict_status`` would, extrapolated from
+``N_SAMPLE`` rows.
+"""
+import time
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import DataFrameBackend
+from utils.functions import audit_timetable
+from utils.intervals import conflict_mask
+from utils.store import compact_timetable
+
+N_SAMPLE = 200
+
+
+def main():
+    print(
+        f"{'rows':>9} {'pairs':>9} {'load (s)':>9} {'audit (s)':>10} "
+        f"{'mask (s)':>9} {'per row (s)':>12}"
+    )
+    for n_rows in (10_000, 100_000, 1_000_000):
+        timetable_df = compact_timetable(make_timetable(n_rows))
+        backend = DataFrameBackend({})
+        started = time.perf_counter()
+        backend.replace(timetable_df)
+        load = time.perf_counter() - started
+
+        started = time.perf_counter()
+        conflicts_df, total, checked = audit_timetable(backend=backend)
+        audit = time.perf_counter() - started
+        assert checked == n_rows
+
+        started = time.perf_counter()
+        mask = conflict_mask(backend.read())
+        masked = time.perf_counter() - started
+        rows = set(conflicts_df["row_id"]) | set(conflicts_df["other_row_id"])
+        assert rows <= set(backend.read().index[mask])
+
+        started = time.perf_counter()
+        for row in timetable_df.head(N_SAMPLE).itertuples():
+            for person, room in ((row.person, None), (None, row.room)):
+                backend.query(
+                    [person] if person else None,
+                    [room] if room else None,
+                    row.datetime_start,
+                    row.datetime_end,
+                )
+        per_row = (time.perf_counter() - started) / N_SAMPLE * n_rows
+        print(
+            f"{n_rows:>9} {total:>9} {load:>9.2f} {audit:>10.2f} "
+            f"{masked:>9.2f} {per_row:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
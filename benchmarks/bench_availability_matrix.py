@@ -0,0 +1,96 @@
+"""Availability of many rooms over many slots: one matrix against a query per slot.
+
+Run with ``python -m benchmarks.bench_availability_matrix``. The Timetable has
+``N_ROWS`` rows over ``N_ROOM`` rooms and the question is which rooms are
+free at each hour of one week. "per slot" asks the backend once per hour, as
+the agent does when it iterates over ``timetable_availability``; the matrix
+runs with 1 to ``MAX_WORKERS`` threads and processes. Worker counts above the
+number of CPUs cannot scale, the CPU count is printed first.
+"""
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import DataFrameBackend
+from utils.functions import get_availability_matrix
+from utils.intervals import busy_matrix
+from utils.store import compact_timetable
+
+N_ROWS = 1_000_000
+N_ROOM = 500
+MAX_WORKERS = 4
+
+
+def best_seconds(function, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    print(f"CPUs: {os.cpu_count()}")
+    timetable_df = compact_timetable(make_timetable(N_ROWS, n_room=N_ROOM))
+    backend = DataFrameBackend({})
+    backend.replace(timetable_df)
+    rooms = backend.list_rooms()
+    week_start = timetable_df["datetime_start"].min().normalize() + pd.Timedelta(
+        weeks=4
+    )
+    window_starts = pd.date_range(week_start, periods=7 * 24, freq="H")
+    window_ends = window_starts + pd.Timedelta(hours=1)
+
+    def per_slot():
+        return [
+            set(backend.query(None, rooms, window_start, window_end)["room"])
+            for window_start, window_end in zip(window_starts, window_ends)
+        ]
+
+    busy_rooms = per_slot()
+    free_df = get_availability_matrix(
+        "room", rooms, window_starts, window_ends, backend=backend
+    )
+    assert all(
+        set(free_df.index[~free_df[window].to_numpy()]) == busy
+        for window, busy in zip(free_df.columns, busy_rooms)
+    )
+
+    print(f"{len(rooms)} rooms x {len(window_starts)} slots, {N_ROWS} rows")
+    print(f"{'method':>22} {'seconds':>8}")
+    print(f"{'per slot':>22} {best_seconds(per_slot):>8.3f}")
+    print(
+        f"{'matrix (end to end)':>22} "
+        f"{best_seconds(lambda: get_availability_matrix('room', rooms, window_starts, window_ends, 1, backend)):>8.3f}"
+    )
+
+    # The matrix kernel alone, on the rows of the week, across worker counts.
+    week_df = backend.query(None, rooms, window_starts[0], window_ends[-1])
+    # Many more windows than one week, so the kernel dominates the pool start.
+    many_starts = np.tile(window_starts.to_numpy(), 50)
+    many_ends = np.tile(window_ends.to_numpy(), 50)
+    for executor in ("thread", "process"):
+        for workers in range(1, MAX_WORKERS + 1):
+            seconds = best_seconds(
+                lambda: busy_matrix(
+                    week_df["room"],
+                    week_df["datetime_start"],
+                    week_df["datetime_end"],
+                    rooms,
+                    many_starts,
+                    many_ends,
+                    workers,
+                    executor,
+                )
+            )
+            label = f"kernel x50, {workers} {executor}"
+            print(f"{label:>22} {seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
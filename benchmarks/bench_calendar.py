@@ -0,0 +1,67 @@
+"""Calendar payload size and build time as the Timetable history grows.
+
+Run with ``python -m benchmarks.bench_calendar``. "all" serializes every
+event like the calendar did before, "window" the selected week and its
+prefetch margin, built from scratch (cold) or from cached weekly chunks
+(warm).
+"""
+import datetime
+import json
+import timeit
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import DataFrameBackend
+from utils.events import merge_events, to_events, window_weeks
+from utils.store import compact_timetable
+
+
+def main():
+    print(
+        f"{'rows':>9} {'days':>6} {'all (MB)':>9} {'window (MB)':>12} "
+        f"{'all (ms)':>9} {'cold (ms)':>10} {'warm (ms)':>10}"
+    )
+    for n_rows in (10_000, 100_000, 1_000_000):
+        timetable_df = compact_timetable(make_timetable(n_rows, n_room=50))
+        backend = DataFrameBackend({"timetable": timetable_df})
+        date = backend.time_range()[1].date() - datetime.timedelta(days=30)
+
+        def build_week(week):
+            week_start = datetime.datetime.combine(week, datetime.time(0, 0, 0))
+            return to_events(
+                backend.query(
+                    None, None, week_start, week_start + datetime.timedelta(weeks=1)
+                ),
+                "Room",
+            )
+
+        chunks = {week: build_week(week) for week in window_weeks(date)}
+        all_events = to_events(timetable_df, "Room")
+        window_events = merge_events(list(chunks.values()))
+
+        all_ms = min(
+            timeit.repeat(lambda: to_events(timetable_df, "Room"), number=1, repeat=3)
+        )
+        cold_ms = min(
+            timeit.repeat(
+                lambda: merge_events([build_week(week) for week in window_weeks(date)]),
+                number=1,
+                repeat=3,
+            )
+        )
+        warm_ms = min(
+            timeit.repeat(
+                lambda: merge_events([chunks[week] for week in window_weeks(date)]),
+                number=1,
+                repeat=3,
+            )
+        )
+        days = (backend.time_range()[1] - backend.time_range()[0]).days
+        print(
+            f"{n_rows:>9} {days:>6} {len(json.dumps(all_events)) / 2**20:>9.1f} "
+            f"{len(json.dumps(window_events)) / 2**20:>12.2f} {all_ms * 1e3:>9.0f} "
+            f"{cold_ms * 1e3:>10.1f} {warm_ms * 1e3:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Prompt size and memory overhead over a simulated 100-turn session.
+
+Run with ``python -m benchmarks.bench_conversation``. Turns alternate between
+availability questions answered with the real tool output and questions
+answered with a paragraph, like the agent does. The prompt is the full agent
+prompt (system message, few-shots, memory and question), tokens are
+estimated like the tool results are.
+"""
+import datetime
+import time
+from unittest import mock
+
+from langchain.chat_models import ChatOpenAI
+from langchain.memory import ConversationBufferMemory
+
+from utils.agent import build_agent
+from utils.formatters import estimate_tokens
+from utils.functions import get_availability
+from utils.memory import TimetableMemory
+from utils.store import read_timetable
+
+N_TURNS = 100
+REPORTED_TURNS = (1, 10, 25, 50, 100)
+
+ANSWER = (
+    "Based on the availability of the requested person and rooms, the best time "
+    "is from 08:00 to 09:30, when all of them are free and no schedule overlaps. "
+) * 3
+
+
+def simulate(memory):
+    llm = ChatOpenAI(
+        client="TimetableGPT", openai_api_key="sk-benchmark", model="gpt-4"
+    )
+    prompt = build_agent(llm, memory).agent.prompt
+    rows = {}
+    for turn in range(1, N_TURNS + 1):
+        day = datetime.datetime(2023, 2, 6) + datetime.timedelta(days=turn % 5)
+        question = f"who is available on {day:%B %d} from 10am to 12pm? (turn {turn})"
+
+        answer = (
+            get_availability(None, day.replace(hour=10), day.replace(hour=12), None)
+            if turn % 2
+            else ANSWER
+        )
+
+        start = time.perf_counter()
+        messages = prompt.format_prompt(
+            input=question, agent_scratchpad=[], **memory.load_memory_variables({})
+        ).to_messages()
+        memory.save_context({"input": question}, {"output": answer})
+        overhead = time.perf_counter() - start
+
+        if turn in REPORTED_TURNS:
+            rows[turn] = (
+                sum(estimate_tokens(message.content) for message in messages),
+                overhead,
+            )
+    return rows
+
+
+def main():
+    with open("sample.xlsx", "rb") as file:
+        session_state = {"timetable": read_timetable(file, "sample.xlsx")}
+    mock.patch("streamlit.session_state", session_state).start()
+
+    buffer = simulate(
+        ConversationBufferMemory(memory_key="memory", return_messages=True)
+    )
+    bounded = simulate(TimetableMemory(memory_key="memory", return_messages=True))
+    print(
+        f"{'turn':>5} {'buffer tokens':>14} {'bounded tokens':>15} "
+        f"{'buffer ms':>10} {'bounded ms':>11}"
+    )
+    for turn in REPORTED_TURNS:
+        print(
+            f"{turn:>5} {buffer[turn][0]:>14} {bounded[turn][0]:>15} "
+            f"{buffer[turn][1] * 1e3:>10.1f} {bounded[turn][1] * 1e3:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
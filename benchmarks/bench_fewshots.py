@@ -0,0 +1,88 @@
+"""Prompt size and prompt latency with static versus selected few-shots.
+
+Run with ``python -m benchmarks.bench_fewshots``. No request is sent to OpenAI.
+The questions are those of ``benchmarks/transcripts/sample.jsonl`` and of the
+router corpus. "static" is the prompt with the first three examples for every
+question, like before ``FewShotIndex``; "selected" is the prompt with the
+examples ``FEW_SHOTS`` selects, the selection included in its time. Tokens are
+estimated with ``estimate_tokens`` over the text and the function calls of
+the prompt messages, tool schemas excluded as they are the same in both.
+"""
+import json
+import statistics
+import timeit
+
+from langchain.chat_models import ChatOpenAI
+from langchain.memory import ConversationBufferMemory
+
+from benchmarks.replay_agent import SAMPLE_TRANSCRIPT
+from benchmarks.router_corpus import CORPUS
+from utils.agent import FEW_SHOTS, build_agent
+from utils.fewshots import EXAMPLES
+from utils.formatters import estimate_tokens
+from utils.replay import read_transcript
+
+NUMBER = 200
+
+
+def prompt_tokens(messages) -> int:
+    return sum(
+        estimate_tokens(message.content + json.dumps(message.additional_kwargs))
+        for message in messages
+    )
+
+
+def main():
+    questions = [turn["input"] for turn in read_transcript(SAMPLE_TRANSCRIPT)]
+    questions += [question for question, _, _ in CORPUS]
+    llm = ChatOpenAI(
+        client="TimetableGPT", openai_api_key="sk-benchmark", streaming=True
+    )
+    memory = ConversationBufferMemory(memory_key="memory", return_messages=True)
+    agents = {
+        "static": build_agent(llm, memory, few_shots=None).agent,
+        "selected": build_agent(llm, memory).agent,
+    }
+
+    def format_prompt(agent, question):
+        inputs = agent._with_examples(
+            {"input": question, "agent_scratchpad": [], "memory": []}
+        )
+        return agent.prompt.format_prompt(**inputs).to_messages()
+
+    print(
+        f"{len(questions)} questions, {len(EXAMPLES)} examples, "
+        f"prompt tokens and microseconds per prompt"
+    )
+    print(f"{'prompt':>10} {'mean tok':>9} {'max tok':>8} {'mean us':>8}")
+    for name, agent in agents.items():
+        tokens = [
+            prompt_tokens(format_prompt(agent, question)) for question in questions
+        ]
+        seconds = [
+            min(
+                timeit.repeat(
+                    lambda: format_prompt(agent, question), number=NUMBER, repeat=3
+                )
+            )
+            / NUMBER
+            for question in questions
+        ]
+        print(
+            f"{name:>10} {statistics.mean(tokens):>9.0f} {max(tokens):>8} "
+            f"{statistics.mean(seconds) * 1e6:>8.0f}"
+        )
+
+    print("\nexamples selected for the sample transcript")
+    for question in questions[: len(read_transcript(SAMPLE_TRANSCRIPT))]:
+        selected = FEW_SHOTS.select(question)
+        numbers = [
+            number
+            for number, example in enumerate(EXAMPLES, start=1)
+            if example[0] in selected
+        ]
+        print(f"  {question[:60]!r:<64} {numbers}")
+
+
+if __name__ == "__main__":
+    main()
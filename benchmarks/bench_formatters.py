@@ -0,0 +1,74 @@
+"""Estimated prompt tokens of tool results, verbose listing versus compact format.
+
+Run with ``python -m benchmarks.bench_formatters``.
+"""
+import datetime
+from unittest import mock
+
+from benchmarks.synthetic import make_timetable
+from utils.formatters import estimate_tokens, format_timetable
+from utils.functions import get_availability, get_timetable
+
+
+def verbose_availability(list_all_person, list_all_room, timetable_intersect_df):
+    """The markdown listing ``get_availability`` produced before the formatters."""
+    timetable_intersect_df = timetable_intersect_df.astype({"person": str, "room": str})
+    prompt = (
+        "-- "
+        + timetable_intersect_df["datetime_start"].dt.strftime("%H:%M:%S")
+        + " to "
+        + timetable_intersect_df["datetime_end"].dt.strftime("%H:%M:%S")
+    )
+    return (
+        "List of person in the Timetable are: \n```\n"
+        + "\n".join(f"- {person}" for person in list_all_person)
+        + "\n```\n\nList of room in the Timetable are: \n```\n"
+        + "\n".join(f"- Room {room}" for room in list_all_room)
+        + "\n```\n\nPerson inavailability based on user requested time range are specified below:\n\n```\n"
+        + "\n".join(
+            f"- {person} is unavailable/occupied from: \n" + "\n".join(rows)
+            for person, rows in prompt.groupby(timetable_intersect_df["person"])
+        )
+        + "\n```\n\nRoom inavailability based on user requested time range are specified below:\n\n```\n"
+        + "\n".join(
+            f"- Room {room} is unavailable/occupied."
+            for room in sorted(timetable_intersect_df["room"].unique())
+        )
+        + "\n```\n"
+    )
+
+
+def main():
+    datetime_start_requested = datetime.datetime(2023, 2, 6, 10)
+    datetime_end_requested = datetime.datetime(2023, 2, 6, 12)
+    print(
+        f"{'rows':>9} {'avail verbose':>14} {'avail compact':>14} "
+        f"{'get verbose':>12} {'get compact':>12}"
+    )
+    for n_rows in (1_000, 100_000, 1_000_000):
+        timetable_df = make_timetable(n_rows, n_person=2_000, n_room=200)
+        session_state = {"timetable": timetable_df}
+        with mock.patch("streamlit.session_state", session_state):
+            intersect_df = get_timetable(
+                None, datetime_start_requested, datetime_end_requested, None
+            )
+            availability_verbose = verbose_availability(
+                sorted(timetable_df["person"].unique()),
+                sorted(timetable_df["room"].unique()),
+                intersect_df,
+            )
+            availability_compact = get_availability(
+                None, datetime_start_requested, datetime_end_requested, None
+            )
+            person_df = get_timetable(["Person 0", "Person 1"])
+            get_verbose = person_df.to_string()
+            get_compact = format_timetable(person_df)
+        print(
+            f"{n_rows:>9} {estimate_tokens(availability_verbose):>14} "
+            f"{estimate_tokens(availability_compact):>14} "
+            f"{estimate_tokens(get_verbose):>12} {estimate_tokens(get_compact):>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
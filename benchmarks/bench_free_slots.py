@@ -0,0 +1,43 @@
+"""Time find_free_slots for growing resource sets over a three-month window.
+
+Run with ``python -m benchmarks.bench_free_slots``.
+"""
+import datetime
+import timeit
+from unittest import mock
+
+from benchmarks.synthetic import make_timetable
+from utils.functions import find_free_slots
+
+
+def main():
+    # Outside `streamlit run` session state does not persist, inject it instead.
+    session_state = {
+        "timetable": make_timetable(1_000_000, n_person=5_000, n_room=1_000)
+    }
+    mock.patch("streamlit.session_state", session_state).start()
+    datetime_start_requested = datetime.datetime(2023, 2, 6)
+    datetime_end_requested = datetime.datetime(2023, 5, 6)
+    print(f"{'persons':>8} {'rooms':>6} {'ms':>8}")
+    for n_person, n_room in ((10, 2), (500, 100), (2_500, 500), (5_000, 1_000)):
+        person_requested = [f"Person {i}" for i in range(n_person)]
+        room_requested = [f"Room {i}" for i in range(n_room)]
+        seconds = min(
+            timeit.repeat(
+                lambda: find_free_slots(
+                    person_requested,
+                    room_requested,
+                    datetime_start_requested,
+                    datetime_end_requested,
+                    datetime.timedelta(minutes=30),
+                    (datetime.time(8, 0, 0), datetime.time(17, 0, 0)),
+                ),
+                number=1,
+                repeat=5,
+            )
+        )
+        print(f"{n_person:>8} {n_room:>6} {seconds * 1e3:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
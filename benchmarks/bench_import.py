@@ -0,0 +1,72 @@
+"""Parse time per import format, and per-rerun cost before and after load caching.
+
+Run with ``python -m benchmarks.bench_import``.
+"""
+import hashlib
+import io
+import timeit
+
+import pandas as pd
+
+from benchmarks.synthetic import make_timetable
+from utils.store import read_timetable
+
+
+def write(timetable_df: pd.DataFrame, extension: str) -> bytes:
+    buffer = io.BytesIO()
+    if extension == ".xlsx":
+        timetable_df.to_excel(buffer, index=False)
+    elif extension == ".csv":
+        timetable_df.to_csv(buffer, index=False)
+    elif extension == ".parquet":
+        timetable_df.to_parquet(buffer, index=False)
+    else:
+        timetable_df.to_feather(buffer)
+    return buffer.getvalue()
+
+
+def main():
+    print(f"{'rows':>8} {'format':>9} {'MB':>6} {'parse (s)':>10}")
+    for n_rows, extensions in (
+        (20_000, (".xlsx", ".csv", ".parquet", ".feather")),
+        (1_000_000, (".csv", ".parquet", ".feather")),
+    ):
+        timetable_df = make_timetable(n_rows)
+        for extension in extensions:
+            content = write(timetable_df, extension)
+            seconds = timeit.timeit(
+                lambda: read_timetable(io.BytesIO(content), "file" + extension),
+                number=1,
+            )
+            print(
+                f"{n_rows:>8} {extension:>9} {len(content) / 2**20:>6.1f} {seconds:>10.3f}"
+            )
+
+    # Before: every rerun parsed sample.xlsx (and any upload) and sorted the frame.
+    # After: the upload is hashed and the parsed frame comes from the cache.
+    upload = write(make_timetable(20_000), ".xlsx")
+
+    def rerun_before():
+        pd.read_excel("sample.xlsx", parse_dates=["datetime_start", "datetime_end"])
+        pd.read_excel(
+            io.BytesIO(upload), parse_dates=["datetime_start", "datetime_end"]
+        ).sort_values(["datetime_start", "datetime_end", "person", "room"])
+
+    cache = {}
+
+    def rerun_after():
+        content_hash = hashlib.sha256(upload).hexdigest()
+        if content_hash not in cache:
+            cache[content_hash] = read_timetable(io.BytesIO(upload), "upload.xlsx")
+        return cache[content_hash]
+
+    rerun_after()
+    before = min(timeit.repeat(rerun_before, number=1, repeat=3))
+    after = min(timeit.repeat(rerun_after, number=10, repeat=3)) / 10
+    print(
+        f"\nrerun with a 20k row upload: before {before:.3f} s, after {after * 1e3:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare a full-frame conflict scan against the per-resource interval index.
+
+Run with ``python -m benchmarks.bench_index``.
+"""
+import datetime
+import timeit
+
+import numpy as np
+
+from benchmarks.synthetic import make_timetable
+from utils.intervals import TimetableIndex, overlap_mask
+
+
+def scan_conflict(timetable_df, person, datetime_start, datetime_end, room):
+    person_df = timetable_df[timetable_df["person"] == person]
+    room_df = timetable_df[timetable_df["room"] == room]
+    return bool(
+        overlap_mask(
+            person_df["datetime_start"],
+            person_df["datetime_end"],
+            datetime_start,
+            datetime_end,
+        ).any()
+        or overlap_mask(
+            room_df["datetime_start"],
+            room_df["datetime_end"],
+            datetime_start,
+            datetime_end,
+        ).any()
+    )
+
+
+def main():
+    rng = np.random.default_rng(2)
+    print(f"{'rows':>8} {'build (s)':>10} {'scan (us)':>10} {'index (us)':>11}")
+    for n_rows in (10_000, 100_000, 500_000):
+        timetable_df = make_timetable(n_rows)
+        build = min(
+            timeit.repeat(lambda: TimetableIndex(timetable_df), number=1, repeat=1)
+        )
+        timetable_index = TimetableIndex(timetable_df)
+
+        queries = []
+        for row in timetable_df.sample(200, random_state=3).itertuples():
+            offset = datetime.timedelta(minutes=int(rng.integers(-120, 120)))
+            queries.append(
+                (
+                    row.person,
+                    row.datetime_start + offset,
+                    row.datetime_start + offset + datetime.timedelta(minutes=30),
+                    row.room,
+                )
+            )
+        for query in queries:
+            assert scan_conflict(timetable_df, *query) == timetable_index.has_conflict(
+                *query
+            )
+
+        scan = timeit.timeit(
+            lambda: [scan_conflict(timetable_df, *query) for query in queries], number=1
+        )
+        index = timeit.timeit(
+            lambda: [timetable_index.has_conflict(*query) for query in queries],
+            number=1,
+        )
+        print(
+            f"{n_rows:>8} {build:>10.3f} {scan / len(queries) * 1e6:>10.0f} "
+            f"{index / len(queries) * 1e6:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
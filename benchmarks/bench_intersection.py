@@ -0,0 +1,129 @@
+"""Compare the vectorized overlap mask against the per-row DateTimeRange path.
+
+Run with ``python -m benchmarks.bench_intersection``.
+"""
+import datetime
+import timeit
+
+import numpy as np
+import pandas as pd
+from datetimerange import DateTimeRange
+
+from benchmarks.synthetic import make_timetable
+from utils.intervals import overlap_mask
+
+
+def datetimerange_mask(timetable_df, datetime_start_requested, datetime_end_requested):
+    return timetable_df.apply(
+        lambda row: DateTimeRange(
+            row["datetime_start"], row["datetime_end"]
+        ).is_intersection(
+            DateTimeRange(datetime_start_requested, datetime_end_requested)
+        ),
+        axis=1,
+    ).to_numpy(dtype=bool)
+
+
+def check_equivalence():
+    base = datetime.datetime(2023, 2, 6, 10, 0, 0)
+    minute = datetime.timedelta(minutes=1)
+    # Touching endpoints, containment, zero-length ranges and disjoint ranges.
+    timetable_df = pd.DataFrame(
+        {
+            "datetime_start": [
+                base - 60 * minute,
+                base,
+                base + 60 * minute,
+                base,
+                base - 120 * minute,
+                base + 61 * minute,
+            ],
+            "datetime_end": [
+                base,
+                base,
+                base + 90 * minute,
+                base + 30 * minute,
+                base + 240 * minute,
+                base + 62 * minute,
+            ],
+        }
+    )
+    requests = [
+        (base, base + 60 * minute),
+        (base, base),
+        (base + 60 * minute, base + 60 * minute),
+        (base - 300 * minute, base - 200 * minute),
+        (base + 30 * minute, base + 45 * minute),
+        (base + 61 * minute, base + 62 * minute),
+    ]
+    synthetic_df = make_timetable(2_000, seed=1)
+    for datetime_start_requested, datetime_end_requested in requests:
+        for frame in (timetable_df, synthetic_df):
+            expected = datetimerange_mask(
+                frame, datetime_start_requested, datetime_end_requested
+            )
+            actual = overlap_mask(
+                frame["datetime_start"],
+                frame["datetime_end"],
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+            assert np.array_equal(expected, actual), (
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+
+    for mask_function in (datetimerange_mask, overlap_mask_frame):
+        try:
+            mask_function(timetable_df, base + minute, base)
+        except ValueError:
+            continue
+        raise AssertionError(f"{mask_function.__name__} accepted an inverted range")
+
+
+def overlap_mask_frame(timetable_df, datetime_start_requested, datetime_end_requested):
+    return overlap_mask(
+        timetable_df["datetime_start"],
+        timetable_df["datetime_end"],
+        datetime_start_requested,
+        datetime_end_requested,
+    )
+
+
+def main():
+    check_equivalence()
+    print("equivalence: ok")
+
+    datetime_start_requested = datetime.datetime(2023, 2, 6, 10, 0, 0)
+    datetime_end_requested = datetime.datetime(2023, 2, 6, 12, 0, 0)
+    print(
+        f"{'rows':>8} {'DateTimeRange (s)':>18} {'overlap_mask (s)':>17} {'speedup':>8}"
+    )
+    for n_rows in (1_000, 10_000, 50_000):
+        timetable_df = make_timetable(n_rows)
+        slow = min(
+            timeit.repeat(
+                lambda: datetimerange_mask(
+                    timetable_df, datetime_start_requested, datetime_end_requested
+                ),
+                number=1,
+                repeat=3,
+            )
+        )
+        fast = (
+            min(
+                timeit.repeat(
+                    lambda: overlap_mask_frame(
+                        timetable_df, datetime_start_requested, datetime_end_requested
+                    ),
+                    number=10,
+                    repeat=3,
+                )
+            )
+            / 10
+        )
+        print(f"{n_rows:>8} {slow:>18.4f} {fast:>17.6f} {slow / fast:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
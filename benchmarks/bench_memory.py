@@ -0,0 +1,42 @@
+"""Memory footprint of the raw timetable frame versus the compact store.
+
+Run with ``python -m benchmarks.bench_memory``.
+"""
+import timeit
+
+from benchmarks.synthetic import make_timetable
+from utils.store import compact_timetable, memory_footprint
+
+
+def main():
+    print(
+        f"{'rows':>9} {'raw (MB)':>9} {'compact (MB)':>13} {'ratio':>6} "
+        f"{'isin raw (ms)':>14} {'isin compact (ms)':>18}"
+    )
+    for n_rows in (100_000, 1_000_000):
+        timetable_df = make_timetable(n_rows, n_person=5_000, n_room=1_000)
+        compact_df = compact_timetable(timetable_df)
+        raw = memory_footprint(timetable_df)
+        compact = memory_footprint(compact_df)
+
+        person_requested = [f"Person {i}" for i in range(50)]
+        isin_raw = min(
+            timeit.repeat(
+                lambda: timetable_df["person"].isin(person_requested),
+                number=1,
+                repeat=5,
+            )
+        )
+        isin_compact = min(
+            timeit.repeat(
+                lambda: compact_df["person"].isin(person_requested), number=1, repeat=5
+            )
+        )
+        print(
+            f"{n_rows:>9} {raw / 2**20:>9.1f} {compact / 2**20:>13.1f} "
+            f"{raw / compact:>5.1f}x {isin_raw * 1e3:>14.1f} {isin_compact * 1e3:>18.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
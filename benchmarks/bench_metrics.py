@@ -0,0 +1,48 @@
+"""Cost of the metrics spans around the Timetable functions.
+
+Run with ``python -m benchmarks.bench_metrics``. The same ``get_timetable``
+query runs with and without its span, unsampled and sampled, on ``N_ROWS``
+rows.
+"""
+import time
+
+from benchmarks.synthetic import make_timetable
+from utils import metrics
+from utils.backends import DataFrameBackend
+from utils.functions import get_timetable
+from utils.store import compact_timetable
+
+N_ROWS = 100_000
+N_CALLS = 200
+
+
+def best_seconds(function, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(N_CALLS):
+            function()
+        timings.append((time.perf_counter() - started) / N_CALLS)
+    return min(timings)
+
+
+def main():
+    timetable_df = compact_timetable(make_timetable(N_ROWS))
+    backend = DataFrameBackend({})
+    backend.replace(timetable_df)
+    person = timetable_df["person"].iloc[0]
+    raw_get_timetable = get_timetable.__wrapped__
+
+    print(f"{N_ROWS} rows, mean of {N_CALLS} calls")
+    print(f"{'calls':>16} {'microseconds':>13}")
+    raw = best_seconds(lambda: raw_get_timetable([person], backend=backend))
+    print(f"{'no span':>16} {raw * 1e6:>13.1f}")
+    for label, sample_rate in (("span, unsampled", 0.0), ("span, sampled", 1.0)):
+        metrics.SAMPLE_RATE = sample_rate
+        seconds = best_seconds(lambda: get_timetable([person], backend=backend))
+        print(f"{label:>16} {seconds * 1e6:>13.1f}")
+    metrics.reset()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Recurring schedules stored as rules versus their materialized occurrences.
+
+Run with ``python -m benchmarks.bench_recurrence``. Each rule is a weekly
+class repeated for ``N_WEEKS`` weeks; "rules" stores the rules, "rows" every
+occurrence as a row. Both answer a one-week availability query, check a
+single schedule and check a new weekly class against the Timetable, both
+conflicting so nothing is written.
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from utils.backends import DataFrameBackend
+from utils.recurrence import compact_rules, expand_rules, make_rule
+from utils.store import TIMETABLE_COLUMNS, memory_footprint
+
+N_WEEKS = 4 * 52
+N_SLOTS = 5 * 9
+FIRST_MONDAY = pd.Timestamp("2023-02-06")
+
+
+def make_rules(n_rules: int) -> pd.DataFrame:
+    """Weekly 50 minutes classes, one teacher each, in the 45 hourly slots of enough rooms."""
+    numbers = np.arange(n_rules)
+    n_room = -(-n_rules // N_SLOTS)
+    slot = numbers // n_room
+    datetime_start = (
+        FIRST_MONDAY
+        + pd.to_timedelta(slot % 5, unit="D")
+        + pd.to_timedelta(8 + slot // 5, unit="h")
+    )
+    return compact_rules(
+        pd.DataFrame(
+            {
+                "person": [f"Teacher {number}" for number in numbers],
+                "datetime_start": datetime_start,
+                "datetime_end": datetime_start + pd.Timedelta(minutes=50),
+                "room": [f"Room {number % n_room}" for number in numbers],
+                "period": pd.Timedelta(weeks=1),
+                "count": N_WEEKS,
+            }
+        )
+    )
+
+
+def best_ms(function, number: int) -> float:
+    return min(timeit.repeat(function, number=number, repeat=3)) / number * 1e3
+
+
+def main():
+    print(
+        f"{'rules':>6} {'backend':>8} {'rows':>9} {'MB':>7} {'insert (s)':>11} "
+        f"{'week (ms)':>10} {'post (ms)':>10} {'class (ms)':>11}"
+    )
+    week_start = FIRST_MONDAY + pd.Timedelta(weeks=N_WEEKS // 2)
+    week_end = week_start + pd.Timedelta(days=6, hours=23, minutes=59)
+    # Teacher 1 teaches in Room 1 on Mondays at 8:00, the new class of Teacher 0
+    # ends when their Monday class starts.
+    busy_slot = week_start + pd.Timedelta(hours=8, minutes=30)
+    new_class = make_rule(
+        "Teacher 0",
+        week_start + pd.Timedelta(hours=7),
+        week_start + pd.Timedelta(hours=8),
+        "Room 0",
+        "weekly",
+        1,
+        week_start + pd.Timedelta(weeks=26),
+    )
+
+    for n_rules in (100, 1_000, 5_000):
+        rules_df = make_rules(n_rules)
+        empty_df = pd.DataFrame(columns=TIMETABLE_COLUMNS)
+
+        rules_backend = DataFrameBackend({})
+        rules_backend.replace(empty_df)
+        started = timeit.default_timer()
+        for rule_id in range(n_rules):
+            assert rules_backend.post_rule(rules_df.iloc[[rule_id]])
+        rules_insert = timeit.default_timer() - started
+
+        occurrences_df = expand_rules(
+            rules_df, FIRST_MONDAY, FIRST_MONDAY + pd.Timedelta(weeks=N_WEEKS)
+        )
+        rows_backend = DataFrameBackend({})
+        started = timeit.default_timer()
+        rows_backend.replace(empty_df)
+        assert not any(
+            conflict.any()
+            for conflict in rows_backend.post_batch(
+                occurrences_df.reset_index(drop=True)
+            )
+        )
+        rows_insert = timeit.default_timer() - started
+        new_occurrences_df = expand_rules(
+            new_class, FIRST_MONDAY, FIRST_MONDAY + pd.Timedelta(weeks=N_WEEKS * 2)
+        ).reset_index(drop=True)
+
+        for name, backend, insert, check_class in [
+            (
+                "rules",
+                rules_backend,
+                rules_insert,
+                lambda: backend.post_rule(new_class),
+            ),
+            (
+                "rows",
+                rows_backend,
+                rows_insert,
+                lambda: backend.post_batch(new_occurrences_df, commit=False),
+            ),
+        ]:
+            week_ms = best_ms(
+                lambda: backend.query(None, None, week_start, week_end), 10
+            )
+            assert len(backend.query(None, None, week_start, week_end)) == n_rules
+            assert not backend.post("Visitor", busy_slot, busy_slot, "Room 1")
+            post_ms = best_ms(
+                lambda: backend.post("Visitor", busy_slot, busy_slot, "Room 1"), 100
+            )
+            class_ms = best_ms(check_class, 3)
+            stored = len(backend.read()) + len(backend.read_rules())
+            footprint = memory_footprint(backend.read()) + memory_footprint(
+                backend.read_rules()
+            )
+            print(
+                f"{n_rules:>6} {name:>8} {stored:>9} {footprint / 2**20:>7.2f} "
+                f"{insert:>11.2f} {week_ms:>10.2f} {post_ms:>10.3f} {class_ms:>11.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Check the intent router against its query corpus and time both answer paths.
+
+Run with ``python -m benchmarks.bench_router``. Every mismatch is printed and
+the exit status is non-zero if there is any.
+"""
+import sys
+import timeit
+from unittest import mock
+
+from benchmarks.router_corpus import CORPUS, NOW
+from benchmarks.synthetic import make_timetable
+from utils.router import answer, route
+from utils.store import compact_timetable, read_timetable
+
+
+def main():
+    with open("sample.xlsx", "rb") as file:
+        session_state = {"timetable": read_timetable(file, "sample.xlsx")}
+    mock.patch("streamlit.session_state", session_state).start()
+
+    list_all_person = sorted(session_state["timetable"]["person"].unique())
+    list_all_room = sorted(session_state["timetable"]["room"].unique())
+    mismatches = 0
+    for question, tool_name, arguments in CORPUS:
+        routed = route(question, list_all_person, list_all_room, NOW)
+        routed_name, routed_arguments = routed if routed else (None, {})
+        wrong = {
+            key: routed_arguments.get(key)
+            for key, value in arguments.items()
+            if routed_arguments.get(key) != value
+        }
+        if routed_name != tool_name or wrong:
+            mismatches += 1
+            print(f"MISMATCH {question!r}: {routed_name} {wrong or ''}")
+    print(f"{len(CORPUS) - mismatches}/{len(CORPUS)} questions routed as expected")
+
+    print(f"\n{'rows':>9} {'question':<40} {'path':>6} {'ms':>8}")
+    for n_rows in (1_000, 1_000_000):
+        session_state["timetable"] = compact_timetable(make_timetable(n_rows))
+        session_state.pop("timetable_index", None)
+        for question in (
+            "is Room 1 free Monday 10-12",
+            "show Person 7 schedule tomorrow",
+            "delete my 3pm",
+        ):
+            path = "rules" if answer(question, NOW) is not None else "agent"
+            seconds = min(
+                timeit.repeat(lambda: answer(question, NOW), number=1, repeat=5)
+            )
+            print(f"{n_rows:>9} {question:<40} {path:>6} {seconds * 1e3:>8.2f}")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Solve time and quality of ``solve_timetable`` on synthetic weeks of meetings.
+
+Run with ``python -m benchmarks.bench_solver``. Each team has ``TEAM_PERSON``
+person and ``TEAM_ROOM`` rooms, already busy ``BUSY_PER_PERSON`` hours of the
+week, and ``TEAM_MEETINGS`` meetings of 2 to 5 of its person in one of 1 to 3
+of its rooms, within a given day or the whole week, 08:00 to 17:00. Teams
+share nothing, so they are independent groups for the solver. Every solution
+is checked against the Timetable and itself with ``sweep_overlap_mask``.
+"""
+import datetime
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.backends import DataFrameBackend
+from utils.classes import TimetableMeetingInput
+from utils.functions import solve_timetable
+from utils.intervals import sweep_overlap_mask
+
+TEAM_PERSON = 20
+TEAM_ROOM = 4
+TEAM_MEETINGS = 50
+BUSY_PER_PERSON = 5
+FIRST_MONDAY = pd.Timestamp("2023-02-06")
+WORKING_HOURS = (datetime.time(8, 0), datetime.time(17, 0))
+
+
+def make_instance(n_meetings: int, seed: int = 0):
+    """Existing Timetable and meeting requests of ``n_meetings // TEAM_MEETINGS`` teams."""
+    rng = np.random.default_rng(seed)
+    n_team = max(1, n_meetings // TEAM_MEETINGS)
+
+    n_busy = n_team * TEAM_PERSON * BUSY_PER_PERSON
+    team = rng.integers(0, n_team, n_busy)
+    busy_start = (
+        FIRST_MONDAY
+        + pd.to_timedelta(rng.integers(0, 5, n_busy), unit="D")
+        + pd.to_timedelta(rng.integers(8, 16, n_busy), unit="h")
+    )
+    timetable_df = pd.DataFrame(
+        {
+            "person": [
+                f"Person {t}-{p}"
+                for t, p in zip(team, rng.integers(0, TEAM_PERSON, n_busy))
+            ],
+            "datetime_start": busy_start,
+            "datetime_end": busy_start + pd.Timedelta(minutes=50),
+            "room": [f"Office {t}" for t in team],
+        }
+    )
+
+    meetings = []
+    for number in range(n_meetings):
+        team = number % n_team
+        persons = rng.choice(TEAM_PERSON, rng.integers(2, 6), replace=False)
+        rooms = rng.choice(TEAM_ROOM, rng.integers(1, 4), replace=False)
+        if rng.random() < 0.5:
+            day = FIRST_MONDAY + pd.Timedelta(days=int(rng.integers(0, 5)))
+            window = (day, day + pd.Timedelta(hours=23, minutes=59))
+        else:
+            window = (FIRST_MONDAY, FIRST_MONDAY + pd.Timedelta(days=4, hours=23))
+        meetings.append(
+            TimetableMeetingInput(
+                person_requested=[f"Person {team}-{person}" for person in persons],
+                room_requested=[f"Room {team}-{room}" for room in rooms],
+                duration_minutes_requested=int(rng.choice([30, 45, 60, 90])),
+                datetime_start_requested=window[0],
+                datetime_end_requested=window[1],
+            )
+        )
+    return timetable_df, meetings
+
+
+def is_conflict_free(timetable_df, meetings, placed_df) -> bool:
+    """Placed meetings overlap neither the Timetable nor each other, within bounds."""
+    persons = [meetings[number].person_requested for number in placed_df.index]
+    placed_rows = placed_df.loc[placed_df.index.repeat([len(p) for p in persons])]
+    person_df = pd.DataFrame(
+        {
+            "person": [person for p in persons for person in p],
+            "datetime_start": placed_rows["datetime_start"].to_numpy(),
+            "datetime_end": placed_rows["datetime_end"].to_numpy(),
+        }
+    )
+    # One row per attendee for the person check, one per meeting for the rooms.
+    for key, placed_key_df in [("person", person_df), ("room", placed_df)]:
+        all_df = pd.concat(
+            [placed_key_df[[key, "datetime_start", "datetime_end"]], timetable_df],
+            ignore_index=True,
+        )
+        mask = sweep_overlap_mask(
+            all_df[key], all_df["datetime_start"], all_df["datetime_end"]
+        )
+        if mask[: len(placed_key_df)].any():
+            return False
+    for number, row in placed_df.iterrows():
+        meeting = meetings[number]
+        if not (
+            meeting.datetime_start_requested
+            <= row["datetime_start"]
+            <= row["datetime_end"]
+            <= meeting.datetime_end_requested
+            and row["room"] in meeting.room_requested
+            and WORKING_HOURS[0] <= row["datetime_start"].time()
+            and row["datetime_end"].time() <= WORKING_HOURS[1]
+        ):
+            return False
+    return True
+
+
+def main():
+    workers = os.cpu_count()
+    print(
+        f"{'meetings':>9} {'busy rows':>10} {'1 worker (s)':>13} "
+        f"{f'{workers} workers (s)':>15} {'placed %':>9} {'conflict-free':>14}"
+    )
+    for n_meetings in (100, 1_000, 5_000):
+        timetable_df, meetings = make_instance(n_meetings)
+        backend = DataFrameBackend({})
+        backend.replace(timetable_df)
+
+        seconds = []
+        for pool in (1, workers):
+            started = time.perf_counter()
+            placed_df, unplaced = solve_timetable(
+                meetings, WORKING_HOURS, backend=backend, workers=pool
+            )
+            seconds.append(time.perf_counter() - started)
+        assert len(placed_df) + len(unplaced) == n_meetings
+        print(
+            f"{n_meetings:>9} {len(timetable_df):>10} {seconds[0]:>13.2f} "
+            f"{seconds[1]:>15.2f} {100 * len(placed_df) / n_meetings:>9.1f} "
+            f"{str(is_conflict_free(timetable_df, meetings, placed_df)):>14}"
+        )
+
+
+if __name__ == "__main__":
+    main()
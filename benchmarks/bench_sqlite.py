@@ -0,0 +1,78 @@
+"""Range query and insert latency of the SQLite backend.
+
+Run with ``python -m benchmarks.bench_sqlite``.
+"""
+import datetime
+import os
+import tempfile
+import timeit
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import SQLiteBackend
+
+
+def main():
+    datetime_start_requested = datetime.datetime(2023, 2, 8, 10, 0, 0)
+    datetime_end_requested = datetime.datetime(2023, 2, 8, 12, 0, 0)
+    print(
+        f"{'rows':>8} {'load (s)':>9} {'person (ms)':>12} {'range (ms)':>11} {'post (ms)':>10}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in (10_000, 100_000, 1_000_000):
+            backend = SQLiteBackend(os.path.join(directory, f"timetable_{n_rows}.db"))
+            timetable_df = make_timetable(n_rows, n_person=5_000, n_room=1_000)
+            load = timeit.timeit(lambda: backend.replace(timetable_df), number=1)
+
+            person = (
+                min(
+                    timeit.repeat(
+                        lambda: backend.query(
+                            ["Person 1", "Person 2"],
+                            None,
+                            datetime_start_requested,
+                            datetime_end_requested,
+                        ),
+                        number=10,
+                        repeat=3,
+                    )
+                )
+                / 10
+            )
+            time_range = (
+                min(
+                    timeit.repeat(
+                        lambda: backend.query(
+                            None, None, datetime_start_requested, datetime_end_requested
+                        ),
+                        number=10,
+                        repeat=3,
+                    )
+                )
+                / 10
+            )
+            minute = iter(range(10**6))
+            post = (
+                min(
+                    timeit.repeat(
+                        lambda: backend.post(
+                            "Person 1",
+                            datetime.datetime(2030, 1, 1)
+                            + datetime.timedelta(minutes=2 * next(minute)),
+                            datetime.datetime(2030, 1, 1)
+                            + datetime.timedelta(minutes=2 * next(minute)),
+                            "Room 1",
+                        ),
+                        number=10,
+                        repeat=3,
+                    )
+                )
+                / 10
+            )
+            print(
+                f"{n_rows:>8} {load:>9.2f} {person * 1e3:>12.2f} "
+                f"{time_range * 1e3:>11.2f} {post * 1e3:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
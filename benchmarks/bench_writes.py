@@ -0,0 +1,62 @@
+"""Throughput of ``DataFrameBackend.post`` with and without the append buffer.
+
+Run with ``python -m benchmarks.bench_writes``. "copy" flushes after every
+insert, i.e. copies the whole frame per schedule like the write path did
+before the buffer, "buffered" keeps the default chunk size. Each run posts
+``N_POSTS`` non-conflicting schedules after the end of the Timetable and
+queries the schedule of its person after each, like the tool calls of a turn,
+reading the whole Timetable back every ``READ_EVERY`` posts like a rerun of
+the editor. Queries scan the pending rows without flushing them.
+"""
+import datetime
+import time
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import DataFrameBackend
+from utils.store import compact_timetable
+
+N_POSTS = 2_000
+READ_EVERY = 100
+
+
+def post_all(backend, datetime_start):
+    started = time.perf_counter()
+    for i in range(N_POSTS):
+        slot_start = datetime_start + datetime.timedelta(hours=i)
+        assert backend.post(
+            f"Person {i % 7}",
+            slot_start,
+            slot_start + datetime.timedelta(minutes=30),
+            f"Room {i % 5}",
+        )
+        backend.query(
+            [f"Person {i % 7}"],
+            None,
+            slot_start,
+            slot_start + datetime.timedelta(minutes=30),
+        )
+        if i % READ_EVERY == READ_EVERY - 1:
+            backend.read()
+    return time.perf_counter() - started
+
+
+def main():
+    print(f"{'rows':>9} {'copy (posts/s)':>15} {'buffered (posts/s)':>19}")
+    for n_rows in (10_000, 100_000, 1_000_000):
+        timetable_df = compact_timetable(make_timetable(n_rows))
+        datetime_start = timetable_df["datetime_end"].max() + datetime.timedelta(days=1)
+        rates = []
+        for chunk_rows in (1, DataFrameBackend.append_chunk_rows):
+            backend = DataFrameBackend({})
+            backend.append_chunk_rows = chunk_rows
+            backend.replace(timetable_df)
+            backend.post("warm up", datetime_start, datetime_start, "warm up")
+            seconds = post_all(backend, datetime_start + datetime.timedelta(minutes=1))
+            assert len(backend.read()) == n_rows + N_POSTS + 1
+            assert backend.read().index.is_unique
+            rates.append(N_POSTS / seconds)
+        print(f"{n_rows:>9} {rates[0]:>15.0f} {rates[1]:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
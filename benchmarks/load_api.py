@@ -0,0 +1,126 @@
+"""Throughput of the HTTP API under concurrent clients.
+
+Run with ``python -m benchmarks.load_api`` to start the API in this process
+on a free port, or with ``python -m benchmarks.load_api http://host:port`` to
+load an API started separately, e.g. with ``uvicorn api:app --workers 4`` and
+``TIMETABLE_DATABASE`` set. Each client sends a mix of reads and writes, the
+writes of different clients use distinct person and room so all succeed.
+"""
+import datetime
+import json
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+N_CLIENTS = (1, 4, 16)
+REQUESTS_PER_CLIENT = 100
+
+
+def start_server() -> str:
+    import uvicorn
+
+    from api import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def call(url: str, path: str, body: dict) -> int:
+    request = urllib.request.Request(
+        url + path,
+        data=json.dumps(body, default=str).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def client(url: str, number: int) -> list[tuple[str, float, int]]:
+    rng = random.Random(number)
+    day = datetime.datetime(2023, 2, 6)
+    results = []
+    for index in range(REQUESTS_PER_CLIENT):
+        start = day + datetime.timedelta(
+            days=rng.randrange(5), hours=rng.randrange(8, 17)
+        )
+        window = {
+            "datetime_start_requested": start,
+            "datetime_end_requested": start + datetime.timedelta(hours=1),
+        }
+        path, body = rng.choice(
+            [
+                ("/availability", window),
+                ("/timetable/query", {**window, "room_requested": ["Alpha"]}),
+                ("/conflict", {**window, "person_requested": ["Anna Koch"]}),
+                (
+                    "/free-slots",
+                    {
+                        "datetime_start_requested": day,
+                        "datetime_end_requested": day + datetime.timedelta(days=5),
+                        "room_requested": ["Bravo"],
+                        "duration_minutes_requested": 60,
+                    },
+                ),
+                (
+                    "/timetable",
+                    {
+                        "person_requested": f"Load {number}",
+                        "room_requested": f"Load {number}",
+                        "datetime_start_requested": datetime.datetime(2030, 1, 1)
+                        + datetime.timedelta(hours=index),
+                        "datetime_end_requested": datetime.datetime(2030, 1, 1)
+                        + datetime.timedelta(hours=index, minutes=30),
+                    },
+                ),
+            ]
+        )
+        request_start = time.perf_counter()
+        status = call(url, path, body)
+        results.append((path, time.perf_counter() - request_start, status))
+    return results
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else start_server()
+    print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for n_clients in N_CLIENTS:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(n_clients) as executor:
+            results = [
+                result
+                for results in executor.map(
+                    lambda number: client(url, number + 1000 * n_clients),
+                    range(n_clients),
+                )
+                for result in results
+            ]
+        seconds = time.perf_counter() - start
+        latencies = sorted(latency for _, latency, _ in results)
+        errors = sum(status >= 400 for _, _, status in results)
+        print(
+            f"{n_clients:>7} {len(results) / seconds:>8.0f} "
+            f"{statistics.median(latencies) * 1e3:>8.1f} "
+            f"{latencies[int(len(latencies) * 0.95)] * 1e3:>8.1f} {errors:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""Replay recorded agent turns offline and split their time by where it goes.
+
+Run with ``python -m benchmarks.replay_agent [transcript.jsonl]``. The agent
+is built like in the chat (tools, few-shots, ``TimetableMemory``) around
+``ReplayChatOpenAI``, which answers with the recorded responses, so the same
+tools run with the same arguments on every replay. Without a transcript the
+turns of ``benchmarks/transcripts/sample.jsonl`` run on ``sample.xlsx``.
+Transcripts of real sessions are written by the app when
+``TIMETABLE_TRANSCRIPT`` is set.
+
+Each turn is split into the time spent in the tools, in formatting the
+prompt, in loading and saving the memory and in the model, the rest being
+the agent executor and its callbacks. The model answers at once by default,
+so everything but "model" is the overhead of a turn around the LLM; pass
+``--latency`` or ``--recorded-latency`` to include model time. With
+``--stream`` the answers are streamed word by word like in the chat, and the
+time to the first word of the answer, the wait the user perceives, is
+reported next to the total.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import statistics
+import time
+from collections import defaultdict
+from unittest import mock
+
+import langchain
+import pandas as pd
+from langchain.tools import BaseTool
+
+from benchmarks.synthetic import make_timetable
+from utils import metrics
+from utils.agent import FinalAnswerStreamHandler, build_agent
+from utils.memory import TimetableMemory
+from utils.replay import ReplayChatOpenAI, read_transcript
+from utils.store import compact_timetable, read_timetable
+
+SAMPLE_TRANSCRIPT = "benchmarks/transcripts/sample.jsonl"
+CATEGORIES = ("tools", "prompt", "memory", "model", "other")
+
+
+class Stopwatch:
+    """Seconds spent in the methods patched by ``patch``, per category."""
+
+    def __init__(self):
+        self.seconds: defaultdict = defaultdict(float)
+
+    def timed(self, category: str, method):
+        if asyncio.iscoroutinefunction(method):
+
+            @functools.wraps(method)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await method(*args, **kwargs)
+                finally:
+                    self.seconds[category] += time.perf_counter() - started
+
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.seconds[category] += time.perf_counter() - started
+
+        return wrapper
+
+    def patch(self, prompt_class) -> list:
+        targets = [
+            ("tools", BaseTool, "run"),
+            ("tools", BaseTool, "arun"),
+            ("prompt", prompt_class, "format_prompt"),
+            ("memory", TimetableMemory, "load_memory_variables"),
+            ("memory", TimetableMemory, "save_context"),
+            ("model", ReplayChatOpenAI, "_generate"),
+            ("model", ReplayChatOpenAI, "_agenerate"),
+        ]
+        return [
+            mock.patch.object(owner, name, self.timed(category, getattr(owner, name)))
+            for category, owner, name in targets
+        ]
+
+
+def load_timetable(n_rows: int) -> pd.DataFrame:
+    """``sample.xlsx``, with ``n_rows`` synthetic rows added when asked."""
+    timetable_df = read_timetable("sample.xlsx", "sample.xlsx")
+    if n_rows:
+        timetable_df = compact_timetable(
+            pd.concat([timetable_df, make_timetable(n_rows)], ignore_index=True)
+        )
+    return timetable_df
+
+
+def replay(turns: list[dict], timetable_df: pd.DataFrame, args) -> list[dict]:
+    """Run every turn once on a fresh Timetable and memory, return their timings."""
+    multi_action = {turn.get("multi_action", True) for turn in turns}
+    if len(multi_action) > 1:
+        raise ValueError("the transcript mixes single and multi action turns")
+    llm = ReplayChatOpenAI.from_transcript(
+        turns,
+        latency=None if args.recorded_latency else args.latency,
+        streaming=args.stream,
+    )
+    agent = build_agent(
+        llm,
+        TimetableMemory(memory_key="memory", return_messages=True),
+        multi_action=multi_action.pop(),
+    )
+    agent.verbose = False
+    # The agent validates the model into a copy of its own.
+    llm = agent.agent.llm
+
+    stopwatch = Stopwatch()
+    patches = stopwatch.patch(type(agent.agent.prompt))
+    session_state = {"timetable": timetable_df.copy()}
+    patches.append(mock.patch("streamlit.session_state", session_state))
+    for patch in patches:
+        patch.start()
+    try:
+        timings = []
+        for turn in turns:
+            stopwatch.seconds.clear()
+            started = time.perf_counter()
+            with metrics.span("turn", "replay") as turn_span:
+                callbacks = [FinalAnswerStreamHandler(lambda text: None, turn_span)]
+                if args.sequential:
+                    agent.run(turn["input"], callbacks=callbacks)
+                else:
+                    asyncio.run(agent.arun(turn["input"], callbacks=callbacks))
+            total = time.perf_counter() - started
+            timing = {category: stopwatch.seconds[category] for category in CATEGORIES}
+            timing["other"] = total - sum(timing.values())
+            timing["total"] = total
+            timing["first_token"] = turn_span.first_token_seconds
+            timings.append(timing)
+    finally:
+        for patch in patches:
+            patch.stop()
+    if llm._position != len(llm.responses):
+        raise ValueError(
+            f"the agent used {llm._position} of the {len(llm.responses)} responses"
+        )
+    return timings
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("transcript", nargs="?", default=SAMPLE_TRANSCRIPT)
+    parser.add_argument(
+        "--rows", type=int, default=0, help="synthetic rows added to sample.xlsx"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per model response"
+    )
+    parser.add_argument("--recorded-latency", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument(
+        "--sequential",
+        action="store_true",
+        help="run the turns with agent.run instead of arun like the chat",
+    )
+    parser.add_argument("--output", default=None, help="JSON file of the timings")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    langchain.llm_cache = None
+    turns = read_transcript(args.transcript)
+    timetable_df = load_timetable(args.rows)
+    runs = [replay(turns, timetable_df, args) for _ in range(args.repeat)]
+    keys = (*CATEGORIES, "total", *(("first_token",) if args.stream else ()))
+    # Tools running concurrently in one step add up, "other" can then go below 0.
+    timings = [
+        {key: statistics.mean(run[number][key] for run in runs) for key in keys}
+        for number in range(len(turns))
+    ]
+
+    print(f"{len(timetable_df)} rows, mean of {args.repeat} replays, in ms")
+    header = "".join(f"{key.replace('_', ' '):>12}" for key in keys)
+    print(f"{'turn':>4} {header} {'non-LLM':>12}")
+    mean = {key: statistics.mean(timing[key] for timing in timings) for key in keys}
+    for label, timing in [*enumerate(timings, start=1), ("mean", mean)]:
+        values = "".join(f"{timing[key] * 1e3:>12.1f}" for key in keys)
+        non_llm = (timing["total"] - timing["model"]) * 1e3
+        print(f"{label:>4} {values} {non_llm:>12.1f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "transcript": args.transcript,
+                    "rows": len(timetable_df),
+                    "repeat": args.repeat,
+                    "turns": [
+                        {"input": turn["input"], **timing}
+                        for turn, timing in zip(turns, timings)
+                    ],
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
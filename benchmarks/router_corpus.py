@@ -0,0 +1,147 @@
+"""Questions about ``sample.xlsx`` and the route expected from ``utils.router.route``.
+
+Each entry is ``(question, tool name or None, expected arguments)``, ``None``
+meaning the question must go to the agent. Only the listed arguments are
+compared. Relative dates are resolved against ``NOW``, a Monday.
+"""
+import datetime
+
+NOW = datetime.datetime(2023, 2, 6, 8, 0, 0)
+
+FEB_6 = datetime.date(2023, 2, 6)
+FEB_7 = datetime.date(2023, 2, 7)
+
+
+def at(date, hour, minute=0, second=0):
+    return datetime.datetime.combine(date, datetime.time(hour, minute, second))
+
+
+CORPUS = [
+    (
+        "is Room Alpha free Monday 10-12",
+        "timetable_availability",
+        {
+            "room_requested": ["Alpha"],
+            "person_requested": None,
+            "datetime_start_requested": at(FEB_6, 10),
+            "datetime_end_requested": at(FEB_6, 12),
+        },
+    ),
+    (
+        "show Anna's schedule tomorrow",
+        "timetable_get",
+        {
+            "person_requested": ["Anna Koch"],
+            "datetime_start_requested": at(FEB_7, 0),
+            "datetime_end_requested": at(FEB_7, 23, 59, 59),
+        },
+    ),
+    ("delete my 3pm", None, {}),
+    # Questions about the whole Timetable are left to the agent.
+    ("list all unoccupied room on February 6th, 2023 from 10am to 12pm", None, {}),
+    (
+        "Is Wilson Cole available on 6 Feb between 1 and 3pm?",
+        "timetable_availability",
+        {
+            "person_requested": ["Wilson Cole"],
+            "datetime_start_requested": at(FEB_6, 13),
+            "datetime_end_requested": at(FEB_6, 15),
+        },
+    ),
+    (
+        "are rooms Bravo and Charlie available 2023-02-07 at 9:30?",
+        "timetable_availability",
+        {
+            "room_requested": ["Bravo", "Charlie"],
+            "datetime_start_requested": at(FEB_7, 9, 30),
+            "datetime_end_requested": at(FEB_7, 9, 30),
+        },
+    ),
+    (
+        "which rooms are free today 3-5",
+        None,
+        {},
+    ),
+    ("who is busy today from 09:00 to 11:30", None, {}),
+    (
+        "show the timetable of Room Delta",
+        "timetable_get",
+        {
+            "room_requested": ["Delta"],
+            "datetime_start_requested": datetime.datetime(1970, 1, 1),
+            "datetime_end_requested": datetime.datetime(9999, 1, 1),
+        },
+    ),
+    (
+        "What's on Anna Koch and Wilson Cole's calendar on Feb 6?",
+        "timetable_get",
+        {
+            "person_requested": ["Anna Koch", "Wilson Cole"],
+            "datetime_start_requested": at(FEB_6, 0),
+            "datetime_end_requested": at(FEB_6, 23, 59, 59),
+        },
+    ),
+    (
+        "does Anna Koch have a conflict in room Echo tomorrow at noon",
+        "timetable_check_conflict",
+        {
+            "person_requested": ["Anna Koch"],
+            "room_requested": ["Echo"],
+            "datetime_start_requested": at(FEB_7, 12),
+            "datetime_end_requested": at(FEB_7, 12),
+        },
+    ),
+    ("is there any overlap?", None, {}),
+    ("create a schedule for Person X on 6th February from 10am to 12pm", None, {}),
+    (
+        "what is the best time to arrange a 30 minutes meeting with Anna Koch and Wilson Cole on February 6th 2023?",
+        None,
+        {},
+    ),
+    ("book Room Alpha tomorrow 10-11 for Anna Koch", None, {}),
+    ("cancel Wilson Cole's meeting on Monday", None, {}),
+    ("show me a schedule", None, {}),
+    ("hello, what can you do?", None, {}),
+    ("tell me a joke about calendars", None, {}),
+    (
+        "is room Kilo occupied next monday?",
+        "timetable_availability",
+        {
+            "room_requested": ["Kilo"],
+            "datetime_start_requested": at(FEB_6 + datetime.timedelta(days=7), 0),
+            "datetime_end_requested": at(
+                FEB_6 + datetime.timedelta(days=7), 23, 59, 59
+            ),
+        },
+    ),
+    (
+        "Rajan Long availability Feb 7 2023 8am-10am",
+        "timetable_availability",
+        {
+            "person_requested": ["Rajan Long"],
+            "datetime_start_requested": at(FEB_7, 8),
+            "datetime_end_requested": at(FEB_7, 10),
+        },
+    ),
+    (
+        "is room alpha free at 3?",
+        "timetable_availability",
+        {
+            "room_requested": ["Alpha"],
+            "datetime_start_requested": at(FEB_6, 15),
+            "datetime_end_requested": at(FEB_6, 15),
+        },
+    ),
+    # Names the rules cannot resolve, the agent may.
+    ("Is Charlie free tomorrow?", None, {}),
+    ("is anna free tomorrow at 3", None, {}),
+    ("Is the projector available tomorrow 10-12?", None, {}),
+    ("is Anna Koch free in room Zulu tomorrow", None, {}),
+    ("is Anna Koch or Zoe Smith free tomorrow at 3", None, {}),
+    # Times the rules cannot turn into a range of one day.
+    ("is Anna Koch free tomorrow 10.30-11", None, {}),
+    ("is Anna Koch free tomorrow at 25:00", None, {}),
+    ("is room Alpha free tomorrow from 11pm to 1am", None, {}),
+    ("is Wilson Cole busy after 3pm tomorrow", None, {}),
+    ("is room Bravo occupied before noon on Feb 6?", None, {}),
+]
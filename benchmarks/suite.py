@@ -0,0 +1,290 @@
+"""Every Timetable operation at several sizes, written as a JSON report.
+
+Run with ``python -m benchmarks.suite`` from the repository root. The
+synthetic Timetable of each size is injected into a backend, so neither
+Streamlit nor an OpenAI key is needed. ``--baseline`` compares the run with an
+earlier report and exits with status 1 when an operation got slower than the
+tolerance allows, e.g. in CI:
+
+    python -m benchmarks.suite --sizes 1000 100000 --output new.json \\
+        --baseline main.json
+
+Excel files above ``--excel-max-rows`` take minutes to write and parse, their
+import is reported as skipped unless the limit is raised.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import make_timetable
+from utils.backends import DataFrameBackend, SQLiteBackend
+from utils.events import conflict_ids, merge_events, to_events, window_weeks
+from utils.functions import (
+    delete_timetable,
+    get_availability,
+    get_availability_json,
+    get_conflict_status,
+    get_timetable,
+    post_timetable,
+)
+from utils.store import compact_timetable, read_timetable
+
+SIZES = (1_000, 100_000, 1_000_000)
+# Calls per timed repeat, the report holds the mean call time of each repeat.
+CALLS = 20
+REPEAT = 5
+EXCEL_MAX_ROWS = 100_000
+TOLERANCE = 0.5
+
+
+def make_backend(kind: str, timetable_df: pd.DataFrame, directory: str):
+    if kind == "sqlite":
+        backend = SQLiteBackend(
+            os.path.join(directory, f"timetable_{len(timetable_df)}.db")
+        )
+    else:
+        backend = DataFrameBackend({})
+    backend.replace(timetable_df)
+    return backend
+
+
+def timed(function, calls: int, repeat: int) -> list[float]:
+    """Mean seconds per call of ``function`` in each of ``repeat`` runs."""
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        timings.append((time.perf_counter() - started) / calls)
+    return timings
+
+
+def timed_writes(backend, datetime_start, calls: int, repeat: int):
+    """Mean seconds per post and per delete of ``calls`` new schedules.
+
+    Each repeat posts its schedules after the end of the Timetable and deletes
+    them again, so every repeat sees the same number of rows.
+    """
+    post_timings, delete_timings = [], []
+    for round_number in range(repeat + 1):
+        slots = [
+            datetime_start + datetime.timedelta(hours=round_number * calls + i)
+            for i in range(calls)
+        ]
+        started = time.perf_counter()
+        for slot_start in slots:
+            post_timetable(
+                "Benchmark person",
+                slot_start,
+                slot_start + datetime.timedelta(minutes=30),
+                "Benchmark room",
+                backend=backend,
+            )
+        post_seconds = (time.perf_counter() - started) / calls
+        started = time.perf_counter()
+        for slot_start in slots:
+            delete_timetable(
+                ["Benchmark person"],
+                slot_start,
+                slot_start + datetime.timedelta(minutes=30),
+                ["Benchmark room"],
+                backend=backend,
+            )
+        delete_seconds = (time.perf_counter() - started) / calls
+        # The first round adds the new person and room, like the warm up call.
+        if round_number > 0:
+            post_timings.append(post_seconds)
+            delete_timings.append(delete_seconds)
+    return post_timings, delete_timings
+
+
+def calendar_payload(backend, date: datetime.date, mode: str = "Room") -> str:
+    """The events the calendar sends to the browser, built without its cache."""
+    chunks = []
+    for week in window_weeks(date):
+        week_start = datetime.datetime.combine(week, datetime.time(0, 0, 0))
+        week_df = backend.query(
+            None, None, week_start, week_start + datetime.timedelta(weeks=1)
+        )
+        chunks.append(to_events(week_df, mode, conflict_ids(week_df, backend)))
+    return json.dumps(merge_events(chunks))
+
+
+def excel_bytes(timetable_df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    timetable_df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def run_size(n_rows: int, args, directory: str) -> list[dict]:
+    timetable_df = compact_timetable(
+        make_timetable(
+            n_rows,
+            n_person=args.person,
+            n_room=args.room,
+            seed=args.seed,
+            n_days=args.days,
+            density=args.density,
+        )
+    )
+    backend = make_backend(args.backend, timetable_df, directory)
+    first, last = backend.time_range()
+    middle = first + (last - first) / 2
+    window_start = datetime.datetime.combine(middle.date(), datetime.time(10, 0))
+    window_end = window_start + datetime.timedelta(hours=1)
+    person, room = "Person 0", "Room 0"
+
+    operations = {
+        "get_availability": lambda: get_availability(
+            [person], window_start, window_end, [room], backend=backend
+        ),
+        "get_availability_json": lambda: get_availability_json(
+            [person], window_start, window_end, [room], backend=backend
+        ),
+        "get_timetable": lambda: get_timetable([person], backend=backend),
+        "get_conflict_status": lambda: get_conflict_status(
+            [person], window_start, window_end, [room], backend=backend
+        ),
+        "calendar_payload": lambda: calendar_payload(backend, middle.date()),
+    }
+    timings = {
+        name: timed(function, args.calls, args.repeat)
+        for name, function in operations.items()
+    }
+    (timings["post_timetable"], timings["delete_timetable"]) = timed_writes(
+        backend,
+        datetime.datetime.combine(last.date(), datetime.time(0, 0))
+        + datetime.timedelta(days=2),
+        args.calls,
+        args.repeat,
+    )
+    assert len(backend.read()) == n_rows
+    if n_rows <= args.excel_max_rows:
+        content = excel_bytes(timetable_df)
+        timings["excel_import"] = timed(
+            lambda: read_timetable(io.BytesIO(content), "timetable.xlsx"),
+            1,
+            min(args.repeat, 3),
+        )
+    else:
+        timings["excel_import"] = None
+
+    return [
+        {
+            "operation": name,
+            "backend": args.backend,
+            "rows": n_rows,
+            "seconds_min": None if seconds is None else min(seconds),
+            "seconds_median": None if seconds is None else statistics.median(seconds),
+            "repeat": 0 if seconds is None else len(seconds),
+        }
+        for name, seconds in timings.items()
+    ]
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float) -> list[str]:
+    """Operations slower than ``1 + tolerance`` times their baseline time."""
+    baseline_seconds = {
+        (result["operation"], result["backend"], result["rows"]): result["seconds_min"]
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        before = baseline_seconds.get(
+            (result["operation"], result["backend"], result["rows"])
+        )
+        after = result["seconds_min"]
+        if before is None or after is None:
+            continue
+        if after > before * (1 + tolerance):
+            regressions.append(
+                f"{result['operation']} ({result['backend']}) at {result['rows']} rows: "
+                f"{before * 1e3:.3f} ms -> {after * 1e3:.3f} ms"
+            )
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--person", type=int, default=200)
+    parser.add_argument("--room", type=int, default=50)
+    parser.add_argument("--days", type=int, default=None)
+    parser.add_argument(
+        "--density", type=float, default=4.0, help="schedules per room per day"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backend", choices=("dataframe", "sqlite"), default="dataframe"
+    )
+    parser.add_argument("--calls", type=int, default=CALLS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--excel-max-rows", type=int, default=EXCEL_MAX_ROWS)
+    parser.add_argument("--output", default="benchmark_report.json")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    print(f"{'operation':>22} {'rows':>9} {'min (ms)':>10} {'median (ms)':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_rows in args.sizes:
+            for result in run_size(n_rows, args, directory):
+                results.append(result)
+                if result["seconds_min"] is None:
+                    print(f"{result['operation']:>22} {n_rows:>9} {'skipped':>10}")
+                    continue
+                print(
+                    f"{result['operation']:>22} {n_rows:>9} "
+                    f"{result['seconds_min'] * 1e3:>10.3f} "
+                    f"{result['seconds_median'] * 1e3:>12.3f}"
+                )
+
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "config": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("output", "baseline")
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nreport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print(f"\nslower than the baseline by more than {args.tolerance:.0%}:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(
+            f"\nno operation slower than the baseline by more than {args.tolerance:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
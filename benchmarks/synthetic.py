@@ -0,0 +1,47 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def make_timetable(
+    n_rows: int,
+    n_person: int = 200,
+    n_room: int = 50,
+    datetime_start: str = "2023-02-06",
+    seed: int = 0,
+    n_days: Optional[int] = None,
+    density: float = 4.0,
+) -> pd.DataFrame:
+    """A reproducible random Timetable of ``n_rows`` schedules.
+
+    Schedules start between 06:00 and 17:00 on one of ``n_days`` days and last
+    30 minutes to 3 hours. Without ``n_days`` the days are chosen so each room
+    holds about ``density`` schedules per day. The same arguments always give
+    the same frame.
+    """
+    rng = np.random.default_rng(seed)
+    if n_days is None:
+        n_days = int(n_rows // max(1.0, n_room * density))
+    n_days = max(1, n_days)
+    day = rng.integers(0, n_days, n_rows)
+    minute = rng.integers(6 * 60, 17 * 60, n_rows) // 10 * 10
+    duration = rng.integers(3, 19, n_rows) * 10
+
+    datetime_start_col = (
+        pd.Timestamp(datetime_start)
+        + pd.to_timedelta(day, unit="D")
+        + pd.to_timedelta(minute, unit="m")
+    )
+    return pd.DataFrame(
+        {
+            "person": np.array([f"Person {i}" for i in range(n_person)], dtype=object)[
+                rng.integers(0, n_person, n_rows)
+            ],
+            "datetime_start": datetime_start_col,
+            "datetime_end": datetime_start_col + pd.to_timedelta(duration, unit="m"),
+            "room": np.array([f"Room {i}" for i in range(n_room)], dtype=object)[
+                rng.integers(0, n_room, n_rows)
+            ],
+        }
+    )
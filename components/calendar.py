@@ -1,53 +1,60 @@
+import datetime
+
 import streamlit as st
 from streamlit_calendar import calendar
 
+from utils.backends import get_backend
+from utils.events import (
+    MAX_ALL_RESOURCES,
+    conflict_ids,
+    merge_events,
+    to_events,
+    to_resources,
+    window_weeks,
+)
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def week_events(version, mode, week, _backend):
+    """Serialized events of one week, cached until the Timetable version changes."""
+    week_start = datetime.datetime.combine(week, datetime.time(0, 0, 0))
+    week_df = _backend.query(
+        None, None, week_start, week_start + datetime.timedelta(weeks=1)
+    )
+    return to_events(week_df, mode, conflict_ids(week_df, _backend))
+
 
 def calendarComponent(mode: str = "Room"):
-    event_data = st.session_state["timetable"].copy()
+    backend = get_backend()
+    time_range = backend.time_range()
+    if time_range is None:
+        st.info("The Timetable is empty")
+        return
 
-    event_data["datetime_start"] = event_data["datetime_start"].dt.strftime(
-        "%Y-%m-%dT%H:%M:%S"
+    # Start on today if the Timetable covers it, otherwise on its first week.
+    first_date, last_date = time_range[0].date(), time_range[1].date()
+    today = datetime.date.today()
+    date = st.date_input(
+        "Week of",
+        value=today if first_date <= today <= last_date else first_date,
+        key="calendar_date",
     )
-    event_data["datetime_end"] = event_data["datetime_end"].dt.strftime(
-        "%Y-%m-%dT%H:%M:%S"
+
+    weeks = window_weeks(date)
+    events = merge_events(
+        [week_events(backend.version, mode, week, backend) for week in weeks]
     )
 
-    initial_date = ((event_data["datetime_start"].sort_values())[0].split("T"))[0]
-
-    if mode == "Room":
-        room_data = event_data["room"].unique()
-        resources = [
-            {"id": room, "title": f"Room {room}"} for room in sorted(room_data)
-        ]
-
-        event_data = event_data.rename(
-            columns={
-                "datetime_start": "start",
-                "datetime_end": "end",
-                "person": "title",
-                "room": "resourceId",
-            }
-        )
-    else:
-        person_data = event_data["person"].unique()
-        resources = [{"id": person, "title": person} for person in sorted(person_data)]
-
-        event_data = event_data.rename(
-            columns={
-                "datetime_start": "start",
-                "datetime_end": "end",
-                "person": "resourceId",
-                "room": "title",
-            }
-        )
-
-    event_data_dict = event_data.to_dict(orient="records")
+    names = backend.list_rooms() if mode == "Room" else backend.list_persons()
+    if len(names) > MAX_ALL_RESOURCES:
+        names = list({event["resourceId"] for event in events})
+    resources = to_resources(names, mode)
 
     calendar(
-        events=event_data_dict,
+        events=events,
         options={
             "height": 520,
-            "initialDate": initial_date,
+            "initialDate": date.isoformat(),
             "initialView": "resourceTimelineDay",
             "hiddenDays": [0, 6],
             "slotMinTime": "06:00:00",
@@ -57,6 +64,11 @@ def calendarComponent(mode: str = "Room"):
                 "center": "title",
                 "right": "resourceTimelineMonth,resourceTimelineWeek,resourceTimelineDay",
             },
+            # Only the loaded weeks can be browsed, pick another week above.
+            "validRange": {
+                "start": weeks[0].isoformat(),
+                "end": (weeks[-1] + datetime.timedelta(weeks=1)).isoformat(),
+            },
             "resources": resources,
         },
     )
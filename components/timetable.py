@@ -1,33 +1,72 @@
-import pandas as pd
+import hashlib
+import io
+
 import streamlit as st
 
+from utils.backends import StaleVersionError, get_backend
+from utils.intervals import conflict_mask
+from utils.store import TIMETABLE_FILE_TYPES, read_timetable
+
 
 def timetable():
-    @st.cache_data
-    def convert_df(df):
-        return df.to_csv(index=False).encode("utf-8")
+    @st.cache_data(show_spinner=False, max_entries=2)
+    def convert_df(version, _backend):
+        # Keyed on the version, hashing the whole frame on every rerun costs
+        # as much as the export.
+        return _backend.read().to_csv(index=False).encode("utf-8")
+
+    @st.cache_data(show_spinner=False, max_entries=8)
+    def load_timetable(content_hash, file_name, _content):
+        return read_timetable(io.BytesIO(_content), file_name)
 
     uploaded_file = st.file_uploader(
-        "Choose an Excel file", type=[".xlsx", ".xls"], key="uploaded_file"
+        "Choose an Excel, CSV, Parquet or Feather file",
+        type=TIMETABLE_FILE_TYPES,
+        key="uploaded_file",
     )
 
-    dataframe = pd.read_excel(
-        "sample.xlsx",
-        parse_dates=["datetime_start", "datetime_end"],
-    )
+    backend = get_backend()
 
+    # Files are parsed once per content, afterwards the backend is the source.
     if uploaded_file is not None:
-        dataframe = pd.read_excel(
-            uploaded_file, parse_dates=["datetime_start", "datetime_end"]
+        content = uploaded_file.getvalue()
+        content_hash = hashlib.sha256(content).hexdigest()
+        if st.session_state.get("uploaded_timetable_hash") != content_hash:
+            backend.replace(load_timetable(content_hash, uploaded_file.name, content))
+            st.session_state["uploaded_timetable_hash"] = content_hash
+    else:
+        st.session_state.pop("uploaded_timetable_hash", None)
+        if not backend.has_timetable():
+            with open("sample.xlsx", "rb") as file:
+                content = file.read()
+            backend.replace(
+                load_timetable(
+                    hashlib.sha256(content).hexdigest(), "sample.xlsx", content
+                )
+            )
+
+    # The version is read before the frame: if a write slips in between, the
+    # editor shows newer rows than its version and saving it fails safely.
+    version = backend.version
+    if st.session_state.get("timetable_editor_version") != version:
+        st.session_state["timetable_editor_version"] = version
+        editor_df = (
+            backend.read()
+            .astype({"person": str, "room": str})
+            .sort_values(["datetime_start", "datetime_end", "person", "room"])
         )
-    elif "timetable" in st.session_state:
-        dataframe = st.session_state["timetable"][
-            ["person", "datetime_start", "datetime_end", "room"]
-        ]
+        st.session_state["timetable_editor_data"] = editor_df.assign(
+            conflict=conflict_mask(editor_df)
+        )
+    dataframe = st.session_state["timetable_editor_data"]
 
-    dataframe.sort_values(
-        ["datetime_start", "datetime_end", "person", "room"], inplace=True
-    )
+    n_conflict = int(dataframe["conflict"].sum())
+    if n_conflict > 0:
+        st.warning(
+            f"{n_conflict} schedules overlap another schedule of the same person or "
+            "room, they are ticked in the Conflict column and shown in red in the "
+            "calendar."
+        )
 
     timetable_df = st.data_editor(
         dataframe,
@@ -44,16 +83,37 @@ def timetable():
             "room": st.column_config.TextColumn(
                 label="Room", max_chars=50, required=True
             ),
+            "conflict": st.column_config.CheckboxColumn(
+                label="Conflict",
+                help="Overlaps another schedule of the same person or room",
+            ),
         },
+        disabled=["conflict"],
         hide_index=True,
         use_container_width=True,
         num_rows="dynamic",
     )
 
-    st.session_state["timetable"] = timetable_df
+    # Only write back edits, so a shared backend is not rewritten on every rerun,
+    # and only over the version they were made on, not over a newer write.
+    if not timetable_df.equals(dataframe):
+        try:
+            backend.replace(
+                timetable_df.drop(columns="conflict"), expected_version=version
+            )
+        except StaleVersionError:
+            st.warning(
+                "The Timetable was changed by someone else while you were editing, "
+                "your edit was not saved. Please apply it again."
+            )
+
+    rules_df = backend.read_rules()
+    if len(rules_df) > 0:
+        st.caption("Recurring schedules, repeated `count` times every `period`")
+        st.dataframe(rules_df, hide_index=True, use_container_width=True)
 
-    if "timetable" in st.session_state:
-        csv = convert_df(st.session_state["timetable"])
+    if backend.has_timetable():
+        csv = convert_df(backend.version, backend)
 
         st.download_button(
             "Press to Download", csv, "file.csv", "text/csv", key="download-csv"
@@ -0,0 +1,251 @@
+import json
+import time
+from typing import Any, Callable, Optional
+
+from langchain.agents import AgentExecutor, OpenAIFunctionsAgent
+from langchain.agents.openai_functions_multi_agent.base import (
+    OpenAIMultiFunctionsAgent,
+)
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.chat_models import ChatOpenAI
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.prompts import MessagesPlaceholder
+from langchain.schema import LLMResult, SystemMessage
+from langchain.tools import BaseTool
+from pydantic import PrivateAttr
+
+from utils import metrics
+from utils.fewshots import EXAMPLES, FewShotIndex, example_1, example_2, example_3
+from utils.formatters import estimate_tokens
+from utils.tools import (
+    TimetableAuditTool,
+    TimetableAvailabilityMatrixTool,
+    TimetableAvailabilityTool,
+    TimetableDeleteTool,
+    TimetableFreeSlotTool,
+    TimetableGetTool,
+    TimetablePostBatchTool,
+    TimetablePostRecurringTool,
+    TimetablePostTool,
+    TimetableSolveTool,
+)
+
+SYSTEM_MESSAGE = SystemMessage(
+    content="""You are an helpful AI assistant who is expert with time management and can handle multiple PERSON and/or ROOM schedule so that no schedule will overlap each other.
+You DO NOT answer anything unrelated to timetable and politely informs that you are programmed to only answer timetable related questions.
+If you do not know the answer to a question, you truthfully says you do not know.
+============
+While helping USER managing Timetable, keep in mind that:
+1 - USER cannot request to occupy a ROOM if there is an overlap between occupied time range and requested time range.
+2 - USER cannot request to meet with a PERSON if there is an overlap between occupied time range and requested time range.
+3 - Similarly, each PERSON listed in the Timetable cannot request to meet with other PERSON if one of them is unavailable.
+============
+Before giving your answer, make sure your answer _DOES NOT result in overlaps_ between user request and existing timetable configuration.
+State your reasoning to the USER for every answer you give."""
+)
+
+TOOLS = [
+    TimetableAvailabilityTool(),
+    TimetableAvailabilityMatrixTool(),
+    TimetableFreeSlotTool(),
+    TimetableSolveTool(),
+    TimetableGetTool(),
+    TimetablePostTool(),
+    TimetablePostBatchTool(),
+    TimetablePostRecurringTool(),
+    TimetableDeleteTool(),
+    TimetableAuditTool(),
+]
+
+FEW_SHOTS = FewShotIndex(EXAMPLES, {tool.name: tool.description for tool in TOOLS})
+
+
+class FewShotSelectionMixin:
+    """Fill the ``examples`` placeholder of the prompt with the few-shots of
+    ``_few_shots`` closest to the question, before each LLM call.
+    """
+
+    @property
+    def input_keys(self) -> list[str]:
+        # Selected by the agent, not given by the caller.
+        return [key for key in super().input_keys if key != "examples"]
+
+    def _with_examples(self, kwargs: dict) -> dict:
+        if self._few_shots is None:
+            return kwargs
+        return {**kwargs, "examples": self._few_shots.select(kwargs["input"])}
+
+    def plan(self, intermediate_steps, callbacks=None, **kwargs: Any):
+        return super().plan(
+            intermediate_steps, callbacks, **self._with_examples(kwargs)
+        )
+
+    async def aplan(self, intermediate_steps, callbacks=None, **kwargs: Any):
+        return await super().aplan(
+            intermediate_steps, callbacks, **self._with_examples(kwargs)
+        )
+
+
+class TimetableFunctionsAgent(FewShotSelectionMixin, OpenAIFunctionsAgent):
+    """OpenAIFunctionsAgent that builds the function schemas of its tools only once.
+
+    The parent class converts every tool with ``format_tool_to_openai_function``
+    on each LLM call of each turn.
+    """
+
+    _functions: Optional[list[dict]] = PrivateAttr(default=None)
+    _few_shots: Optional[FewShotIndex] = PrivateAttr(default=None)
+
+    @property
+    def functions(self) -> list[dict]:
+        if self._functions is None:
+            self._functions = super().functions
+        return self._functions
+
+
+class TimetableMultiFunctionsAgent(FewShotSelectionMixin, OpenAIMultiFunctionsAgent):
+    """OpenAIMultiFunctionsAgent with the function schemas built only once.
+
+    The model can request several tools in one step, ``AgentExecutor.arun``
+    then runs them concurrently.
+    """
+
+    _functions: Optional[list[dict]] = PrivateAttr(default=None)
+    _few_shots: Optional[FewShotIndex] = PrivateAttr(default=None)
+
+    @property
+    def functions(self) -> list[dict]:
+        if self._functions is None:
+            self._functions = super().functions
+        return self._functions
+
+
+def build_agent(
+    llm: ChatOpenAI,
+    memory: BaseChatMemory,
+    tools: Optional[list[BaseTool]] = None,
+    multi_action: bool = False,
+    few_shots: Optional[FewShotIndex] = FEW_SHOTS,
+) -> AgentExecutor:
+    """Agent of the chat, sending the few-shots ``few_shots`` selects for each
+    question, or always the first three examples when it is None.
+    """
+    tools = TOOLS if tools is None else tools
+    agent_class = (
+        TimetableMultiFunctionsAgent if multi_action else TimetableFunctionsAgent
+    )
+    if few_shots is None:
+        examples = [*example_1, *example_2, *example_3]
+    else:
+        examples = [MessagesPlaceholder(variable_name="examples")]
+    agent = agent_class.from_llm_and_tools(
+        llm,
+        tools,
+        system_message=SYSTEM_MESSAGE,
+        extra_prompt_messages=[
+            # Few shot examples
+            *examples,
+            MessagesPlaceholder(variable_name="memory"),
+        ],
+    )
+    agent._few_shots = few_shots
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent, tools=tools, memory=memory, verbose=True
+    )
+
+
+class TurnMetricsHandler(BaseCallbackHandler):
+    """Count the LLM round-trips and tokens of one agent turn into its span.
+
+    Streaming responses carry no token usage, those tokens are estimated from
+    the messages, the function schemas and the generated text.
+    """
+
+    def __init__(self, span: metrics.Span):
+        self.span = span
+        self.prompt_tokens: dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        functions = kwargs.get("invocation_params", {}).get("functions") or []
+        self.prompt_tokens[run_id] = sum(
+            estimate_tokens(message.content or "") + 4
+            for batch in messages
+            for message in batch
+        ) + estimate_tokens(json.dumps(functions))
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = self.prompt_tokens.pop(run_id, 0)
+        if token_usage:
+            self.span.add(
+                llm_calls=1,
+                prompt_tokens=token_usage.get("prompt_tokens", 0),
+                completion_tokens=token_usage.get("completion_tokens", 0),
+            )
+            return
+        # Function calls are in the message, not in the text.
+        completion = []
+        for generations in response.generations:
+            for generation in generations:
+                completion.append(generation.text)
+                message = getattr(generation, "message", None)
+                if message is not None and message.additional_kwargs:
+                    completion.append(json.dumps(message.additional_kwargs))
+        self.span.add(
+            llm_calls=1,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=estimate_tokens("".join(completion)),
+        )
+
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Write the answer of the agent with ``write`` while its tokens arrive.
+
+    Only the text of a model response is streamed, the function calls of the
+    intermediate steps carry none. A response that ends with a function call
+    after some text is taken back. The first token of the answer is noted on
+    ``span`` as the time to first token of the turn.
+
+    It runs inline in the event loop of ``arun``, which keeps the tokens in
+    order and saves a thread hop per token.
+    """
+
+    run_inline = True
+
+    def __init__(
+        self,
+        write: Callable[[str], Any],
+        span: Optional[metrics.Span] = None,
+        cursor: str = "▌",
+    ):
+        self.write = write
+        self.span = span
+        self.cursor = cursor
+        self.text = ""
+        self.first_token_at: Optional[float] = None
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.text, self.first_token_at = "", None
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.text, self.first_token_at = "", None
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if not token:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.text += token
+        self.write(self.text + self.cursor)
+
+    def on_llm_end(self, response: LLMResult, **kwargs):
+        message = getattr(response.generations[0][0], "message", None)
+        if message is not None and message.additional_kwargs.get("function_call"):
+            if self.text:
+                self.write("")
+            self.text, self.first_token_at = "", None
+            return
+        if self.text:
+            self.write(self.text)
+        if self.span is not None and self.first_token_at is not None:
+            self.span.first_token(self.first_token_at)
@@ -0,0 +1,1192 @@
+import contextlib
+import datetime
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections.abc import MutableMapping
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import metrics
+from utils.intervals import (
+    TimetableIndex,
+    batch_overlap_masks,
+    overlap_mask,
+    to_epoch_ns,
+)
+from utils.recurrence import (
+    RULE_COLUMNS,
+    RuleIndex,
+    compact_rules,
+    empty_rules,
+    expand_rules,
+    filter_rules,
+    last_ends,
+    rule_has_conflict,
+    rule_span,
+    rule_tuples,
+    split_rules,
+)
+from utils.store import (
+    TIMETABLE_COLUMNS,
+    add_categories,
+    append_rows,
+    compact_timetable,
+    next_row_id,
+)
+
+INT64_MIN = int(np.iinfo(np.int64).min) + 1
+
+
+class StaleVersionError(Exception):
+    """The Timetable changed since the version a write was based on."""
+
+
+def content_hash(timetable_df: pd.DataFrame, rules_df: pd.DataFrame) -> str:
+    """Hash of the values of the rows and rules, whatever their order and ids."""
+    digest = hashlib.sha256()
+    for frame in [timetable_df, rules_df]:
+        row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+        digest.update(np.sort(row_hashes).tobytes())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class TimetableBackend:
+    """Storage behind the Timetable functions in ``utils/functions.py``.
+
+    Intervals are closed on both ends, like the rest of the Timetable, and
+    ``query`` returns the rows sorted by start and end. Besides the stored
+    rows, the Timetable holds recurring rules (see ``utils/recurrence.py``):
+    ``query``, the conflict checks of the writes and ``delete`` see their
+    occurrences as rows, while ``read`` and ``replace`` only cover the stored
+    rows and leave the rules alone.
+    """
+
+    def has_timetable(self) -> bool:
+        raise NotImplementedError
+
+    def read(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def row_count(self) -> int:
+        """Number of stored rows, without reading them."""
+        raise NotImplementedError
+
+    @property
+    def version(self) -> str:
+        """Opaque stamp that changes whenever the Timetable changes."""
+        raise NotImplementedError
+
+    def content_stamp(self) -> str:
+        """``content_hash`` of the Timetable, computed once per version.
+
+        Unlike ``version``, it is the same for every session and process
+        holding the same rows and rules.
+        """
+        raise NotImplementedError
+
+    def replace(
+        self, timetable_df: pd.DataFrame, expected_version: Optional[str] = None
+    ) -> None:
+        """Swap in a new Timetable.
+
+        With ``expected_version`` the swap is a compare-and-swap: it raises
+        ``StaleVersionError`` when another write happened since that version
+        was read, instead of silently dropping that write.
+        """
+        raise NotImplementedError
+
+    def read_rules(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def list_persons(self) -> list[str]:
+        raise NotImplementedError
+
+    def list_rooms(self) -> list[str]:
+        raise NotImplementedError
+
+    def time_range(self) -> Optional[tuple[pd.Timestamp, pd.Timestamp]]:
+        """Earliest start and latest end, ``None`` for an empty Timetable."""
+        raise NotImplementedError
+
+    def query(
+        self,
+        person_requested: Optional[list[str]],
+        room_requested: Optional[list[str]],
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+    ) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def post(
+        self,
+        person_requested: str,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        room_requested: str,
+    ) -> bool:
+        """Insert the schedule unless it overlaps the person or the room."""
+        raise NotImplementedError
+
+    def post_batch(
+        self, batch_df: pd.DataFrame, commit: bool = True
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Person and room conflict masks; all rows are inserted only if both are empty."""
+        raise NotImplementedError
+
+    def post_rule(self, rule_df: pd.DataFrame) -> bool:
+        """Insert the one-row rule of ``make_rule`` unless it overlaps the person or the room."""
+        raise NotImplementedError
+
+    def delete(
+        self,
+        person_requested: Optional[list[str]],
+        room_requested: Optional[list[str]],
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+    ) -> int:
+        """Delete the rows and rule occurrences intersecting the range, return their number."""
+        raise NotImplementedError
+
+
+class DataFrameBackend(TimetableBackend):
+    """Timetable kept as a compact DataFrame inside a session-like mapping.
+
+    Writes of one Timetable are serialized by its own lock, so tools running
+    in parallel threads never interleave a conflict check and an insert, and
+    every write bumps the version. Inserted rows get ids from a counter that
+    deletes never rewind, and go to a buffer of pending rows instead of
+    copying the frame. Queries, person/room lists and the time range scan the
+    pending rows next to the frame; they are concatenated to it in one go once
+    ``append_chunk_rows`` of them are pending, or when the whole frame is read
+    (editor, calendar, audit, export) or rewritten. Frames are never modified
+    in place, readers keep a consistent one.
+    """
+
+    append_chunk_rows = 1024
+    _locks_guard = threading.Lock()
+
+    def __init__(self, state: MutableMapping):
+        self.state = state
+
+    @property
+    def write_lock(self) -> threading.RLock:
+        lock = self.state.get("timetable_lock")
+        if lock is None:
+            with self._locks_guard:
+                lock = self.state.get("timetable_lock")
+                if lock is None:
+                    lock = self.state["timetable_lock"] = threading.RLock()
+        return lock
+
+    def has_timetable(self) -> bool:
+        return "timetable" in self.state
+
+    def read(self) -> pd.DataFrame:
+        if self.state.get("timetable_pending"):
+            with self.write_lock:
+                return self._flush()
+        return self.state["timetable"]
+
+    def row_count(self) -> int:
+        timetable_df, pending, _ = self._snapshot()
+        return len(timetable_df) + len(pending)
+
+    @property
+    def version(self) -> str:
+        return self.state.get("timetable_version", "")
+
+    def _bump_version(self):
+        # Random rather than a counter, two sessions must never share a stamp.
+        self.state["timetable_version"] = uuid.uuid4().hex
+
+    def content_stamp(self) -> str:
+        if not self.has_timetable():
+            return ""
+        version = self.version
+        stamp = self.state.get("timetable_content_stamp")
+        if stamp is None or stamp[0] != version:
+            stamp = self.state["timetable_content_stamp"] = (
+                version,
+                content_hash(self.read(), self.read_rules()),
+            )
+        return stamp[1]
+
+    def _next_row_id(self) -> int:
+        row_id = self.state.get("timetable_next_id")
+        if row_id is None:
+            # Frames handed over directly rather than through ``replace``.
+            row_id = next_row_id(self.state["timetable"])
+        return row_id
+
+    def replace(self, timetable_df, expected_version=None):
+        timetable_df = compact_timetable(timetable_df)
+        if not (
+            pd.api.types.is_integer_dtype(timetable_df.index)
+            and timetable_df.index.is_unique
+            and (len(timetable_df) == 0 or timetable_df.index.min() >= 0)
+        ):
+            timetable_df = timetable_df.reset_index(drop=True)
+        with self.write_lock:
+            if expected_version is not None and expected_version != self.version:
+                raise StaleVersionError(
+                    f"Timetable version {self.version} != {expected_version}"
+                )
+            next_id = next_row_id(timetable_df)
+            if self.has_timetable():
+                next_id = max(next_id, self._next_row_id())
+            self.state["timetable"] = timetable_df
+            self.state["timetable_pending"] = []
+            self.state["timetable_next_id"] = next_id
+            self._bump_version()
+
+    def _flush(self) -> pd.DataFrame:
+        """Concatenate the pending rows to the frame, under the write lock."""
+        timetable_df = self.state["timetable"]
+        pending = self.state.get("timetable_pending")
+        if not pending:
+            return timetable_df
+        # Pending rows have consecutive ids, any delete or batch flushes first.
+        timetable_df = append_rows(
+            timetable_df,
+            pd.DataFrame.from_records(pending, columns=TIMETABLE_COLUMNS),
+            first_row_id=self._next_row_id() - len(pending),
+        )
+        timetable_index = self.state.get("timetable_index")
+        if timetable_index is not None and (
+            timetable_index.source is self.state["timetable"]
+        ):
+            timetable_index.source = timetable_df
+        # The frame goes first, a reader seeing no pending rows must see them in it.
+        self.state["timetable"] = timetable_df
+        self.state["timetable_pending"] = []
+        return timetable_df
+
+    def _snapshot(self) -> tuple[pd.DataFrame, list[tuple], int]:
+        """The frame, its pending rows and the row id of the first of them."""
+        if not self.state.get("timetable_pending"):
+            # Flushes set the frame before clearing the pending rows.
+            return self.state["timetable"], [], 0
+        with self.write_lock:
+            pending = list(self.state.get("timetable_pending") or ())
+            return (
+                self.state["timetable"],
+                pending,
+                self._next_row_id() - len(pending),
+            )
+
+    def read_rules(self) -> pd.DataFrame:
+        rules_df = self.state.get("timetable_rules")
+        return empty_rules() if rules_df is None else rules_df
+
+    def _has_rules(self) -> bool:
+        return len(self.state.get("timetable_rules", ())) > 0
+
+    def list_persons(self) -> list[str]:
+        timetable_df, pending, _ = self._snapshot()
+        persons = timetable_df["person"].unique()
+        if pending:
+            persons = set(persons) | {row[0] for row in pending}
+        if self._has_rules():
+            persons = set(persons) | set(self.read_rules()["person"])
+        return sorted(persons)
+
+    def list_rooms(self) -> list[str]:
+        timetable_df, pending, _ = self._snapshot()
+        rooms = timetable_df["room"].unique()
+        if pending:
+            rooms = set(rooms) | {row[3] for row in pending}
+        if self._has_rules():
+            rooms = set(rooms) | set(self.read_rules()["room"])
+        return sorted(rooms)
+
+    def time_range(self):
+        timetable_df, pending, _ = self._snapshot()
+        starts = [timetable_df["datetime_start"]]
+        ends = [timetable_df["datetime_end"]]
+        if pending:
+            starts.append(pd.Series([row[1] for row in pending]))
+            ends.append(pd.Series([row[2] for row in pending]))
+        if self._has_rules():
+            starts.append(self.read_rules()["datetime_start"])
+            ends.append(last_ends(self.read_rules()))
+        if sum(len(values) for values in starts) == 0:
+            return None
+        return (
+            min(values.min() for values in starts if len(values) > 0),
+            max(values.max() for values in ends if len(values) > 0),
+        )
+
+    def _index(self) -> TimetableIndex:
+        """Interval index of the frame and its pending rows, under the write lock."""
+        timetable_index = self.state.get("timetable_index")
+        if (
+            timetable_index is None
+            or timetable_index.source is not self.state["timetable"]
+        ):
+            timetable_index = TimetableIndex(self._flush())
+            self.state["timetable_index"] = timetable_index
+        return timetable_index
+
+    def _write(self, timetable_df: pd.DataFrame, timetable_index: TimetableIndex):
+        timetable_index.source = timetable_df
+        self.state["timetable"] = timetable_df
+        self.state["timetable_next_id"] = max(
+            self._next_row_id(), next_row_id(timetable_df)
+        )
+        self._bump_version()
+
+    def query(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+    ):
+        timetable_df, pending, first_row_id = self._snapshot()
+        rows_scanned = len(timetable_df) + len(pending)
+        if person_requested:
+            timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
+        if room_requested:
+            timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
+
+        intersection = overlap_mask(
+            timetable_df["datetime_start"],
+            timetable_df["datetime_end"],
+            datetime_start_requested,
+            datetime_end_requested,
+        )
+        timetable_df = timetable_df[intersection]
+        if pending:
+            # A few rows at most, checked one by one rather than framed.
+            persons = set(person_requested or ())
+            rooms = set(room_requested or ())
+            start = pd.Timestamp(datetime_start_requested)
+            end = pd.Timestamp(datetime_end_requested)
+            matches = {
+                row_id: row
+                for row_id, row in enumerate(pending, start=first_row_id)
+                if (not persons or row[0] in persons)
+                and (not rooms or row[3] in rooms)
+                and row[1] <= end
+                and row[2] >= start
+            }
+            if matches:
+                matches_df = pd.DataFrame.from_records(
+                    list(matches.values()),
+                    columns=TIMETABLE_COLUMNS,
+                    index=list(matches),
+                )
+                timetable_df = timetable_df.copy(deep=False)
+                for column in ["person", "room"]:
+                    add_categories(timetable_df, column, matches_df[column])
+                timetable_df = pd.concat(
+                    [timetable_df, matches_df.astype(timetable_df.dtypes.to_dict())]
+                )
+        if self._has_rules():
+            occurrences_df = self._occurrences(
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+            if len(timetable_df) == 0:
+                timetable_df = occurrences_df
+            elif len(occurrences_df) > 0:
+                timetable_df = pd.concat([timetable_df, occurrences_df])
+        metrics.add(rows_scanned=rows_scanned, rows_matched=len(timetable_df))
+        return timetable_df.sort_values(["datetime_start", "datetime_end"])
+
+    def _occurrences(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        either=False,
+    ) -> pd.DataFrame:
+        return expand_rules(
+            filter_rules(
+                self.read_rules(),
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+                either,
+            ),
+            datetime_start_requested,
+            datetime_end_requested,
+        )
+
+    def _rule_index(self) -> RuleIndex:
+        rule_index = self.state.get("timetable_rule_index")
+        if rule_index is None or rule_index.source is not self.read_rules():
+            rule_index = RuleIndex(self.read_rules())
+            self.state["timetable_rule_index"] = rule_index
+        return rule_index
+
+    def _with_new_rules(
+        self, rules_df: pd.DataFrame, new_rules_df: pd.DataFrame
+    ) -> tuple[pd.DataFrame, int]:
+        """``rules_df`` plus ``new_rules_df`` numbered with fresh rule ids, and
+        the next rule id. Nothing is written.
+        """
+        next_id = self.state.get("timetable_next_rule_id", 0)
+        if len(new_rules_df) == 0:
+            return rules_df, next_id
+        # Deletes leave gaps in the ids, every frame gets a plain int64 index.
+        new_rules_df = new_rules_df.reset_index(drop=True)
+        new_rules_df.index = pd.Index(
+            np.arange(next_id, next_id + len(new_rules_df)), dtype="int64"
+        )
+        rules_df = rules_df.set_axis(pd.Index(rules_df.index, dtype="int64"))
+        return pd.concat([rules_df, new_rules_df]), next_id + len(new_rules_df)
+
+    def _write_rules(self, rules_df: pd.DataFrame, next_rule_id: int):
+        self.state["timetable_rules"] = rules_df
+        self.state["timetable_next_rule_id"] = next_rule_id
+        self._bump_version()
+
+    def post(
+        self,
+        person_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        room_requested,
+    ):
+        with self.write_lock:
+            return self._post(
+                person_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+                room_requested,
+            )
+
+    def _post(
+        self,
+        person_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        room_requested,
+    ):
+        timetable_index = self._index()
+        if timetable_index.has_conflict(
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        ):
+            return False
+        if self._has_rules() and self._rule_index().has_conflict(
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        ):
+            return False
+
+        row_id = self._next_row_id()
+        pending = self.state.get("timetable_pending")
+        if pending is None:
+            pending = self.state["timetable_pending"] = []
+        pending.append(
+            (
+                person_requested,
+                pd.Timestamp(datetime_start_requested),
+                pd.Timestamp(datetime_end_requested),
+                room_requested,
+            )
+        )
+        timetable_index.insert(
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+            row_id,
+        )
+        self.state["timetable_next_id"] = row_id + 1
+        self._bump_version()
+        if len(pending) >= self.append_chunk_rows:
+            self._flush()
+        return True
+
+    def post_batch(self, batch_df, commit=True):
+        with self.write_lock:
+            return self._post_batch(batch_df, commit)
+
+    def _post_batch(self, batch_df, commit):
+        timetable_index = self._index()
+        timetable_df = self._flush()
+
+        # Only existing rows that can touch the batch take part in the sweep.
+        existing_df = timetable_df[
+            (
+                timetable_df["person"].isin(batch_df["person"])
+                | timetable_df["room"].isin(batch_df["room"])
+            )
+            & (timetable_df["datetime_start"] <= batch_df["datetime_end"].max())
+            & (timetable_df["datetime_end"] >= batch_df["datetime_start"].min())
+        ]
+        if self._has_rules():
+            existing_df = pd.concat(
+                [
+                    existing_df,
+                    self._occurrences(
+                        list(batch_df["person"].unique()),
+                        list(batch_df["room"].unique()),
+                        batch_df["datetime_start"].min(),
+                        batch_df["datetime_end"].max(),
+                        either=True,
+                    ),
+                ]
+            )
+        person_conflict, room_conflict = batch_overlap_masks(batch_df, existing_df)
+        if not commit or person_conflict.any() or room_conflict.any():
+            return person_conflict, room_conflict
+
+        timetable_df = append_rows(
+            timetable_df, batch_df, first_row_id=self._next_row_id()
+        )
+        for row_id, row in timetable_df.iloc[
+            len(timetable_df) - len(batch_df) :
+        ].iterrows():
+            timetable_index.insert(
+                row["person"],
+                row["datetime_start"],
+                row["datetime_end"],
+                row["room"],
+                row_id,
+            )
+        self._write(timetable_df, timetable_index)
+        return person_conflict, room_conflict
+
+    def delete(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+    ):
+        with self.write_lock:
+            return self._delete(
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+
+    def _delete(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+    ):
+        timetable_index = self._index()
+        deleted_df = self.query(
+            person_requested,
+            room_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+        )
+        # Occurrences have negative ids, they are removed by splitting their rules.
+        deleted_df = deleted_df[deleted_df.index >= 0]
+
+        # The new rules and rows are built first, then both are written.
+        deleted_occurrences = 0
+        if self._has_rules():
+            rules_df = self.read_rules()
+            hit_df = filter_rules(
+                rules_df,
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+            kept_df, parts_df, deleted_occurrences = split_rules(
+                hit_df, datetime_start_requested, datetime_end_requested
+            )
+            if deleted_occurrences > 0:
+                rules_df, next_rule_id = self._with_new_rules(
+                    rules_df.drop(hit_df.index.difference(kept_df.index)), parts_df
+                )
+        timetable_df = (
+            self.read().drop(deleted_df.index) if len(deleted_df) > 0 else None
+        )
+
+        if len(deleted_df) > 0:
+            for row_id, row in deleted_df.iterrows():
+                timetable_index.remove(
+                    row["person"], row["datetime_start"], row["room"], row_id
+                )
+            self._write(timetable_df, timetable_index)
+        if deleted_occurrences > 0:
+            self._write_rules(rules_df, next_rule_id)
+        return len(deleted_df) + deleted_occurrences
+
+    def post_rule(self, rule_df):
+        with self.write_lock:
+            return self._post_rule(rule_df)
+
+    def _post_rule(self, rule_df):
+        person, room = rule_df["person"].iat[0], rule_df["room"].iat[0]
+        rule = rule_tuples(rule_df)[0]
+        datetime_start, datetime_end = rule_span(rule)
+        timetable_index = self._index()
+        row_ids = timetable_index.person.overlaps(
+            person, datetime_start, datetime_end
+        ) + timetable_index.room.overlaps(room, datetime_start, datetime_end)
+        rule_index = self._rule_index()
+        if rule_has_conflict(
+            rule_df, self.read().loc[row_ids], rule_index.rules(person, room)
+        ):
+            return False
+        self._write_rules(*self._with_new_rules(self.read_rules(), rule_df))
+        rule_index.insert(person, room, rule)
+        rule_index.source = self.read_rules()
+        return True
+
+
+class SQLiteBackend(TimetableBackend):
+    """Timetable stored in a SQLite database that several app workers can share.
+
+    Start and end are stored as int64 epoch nanoseconds. Range queries use the
+    (person, start), (room, start) and (start) indexes, bounded from below by
+    the longest stored interval so they never scan the whole table, and writes
+    run in ``BEGIN IMMEDIATE`` transactions so the overlap check and the insert
+    are atomic across processes.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Version and content hash of the last ``content_stamp``.
+        self._content_stamp: Optional[tuple[str, str]] = None
+        with self._connection() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS timetable (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    person TEXT NOT NULL,
+                    datetime_start INTEGER NOT NULL,
+                    datetime_end INTEGER NOT NULL,
+                    room TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS timetable_person_start
+                    ON timetable (person, datetime_start);
+                CREATE INDEX IF NOT EXISTS timetable_room_start
+                    ON timetable (room, datetime_start);
+                CREATE INDEX IF NOT EXISTS timetable_start
+                    ON timetable (datetime_start);
+                CREATE TABLE IF NOT EXISTS timetable_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS timetable_rules (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    person TEXT NOT NULL,
+                    datetime_start INTEGER NOT NULL,
+                    datetime_end INTEGER NOT NULL,
+                    room TEXT NOT NULL,
+                    period INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    last_end INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS timetable_rules_start
+                    ON timetable_rules (datetime_start);
+                """
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            yield connection
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def _connection(self):
+        connection = self._connect()
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _longest(connection: sqlite3.Connection) -> int:
+        row = connection.execute(
+            "SELECT value FROM timetable_meta WHERE key = 'longest'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _update_longest(connection: sqlite3.Connection, longest: int):
+        connection.execute(
+            """
+            INSERT INTO timetable_meta (key, value) VALUES ('longest', ?)
+            ON CONFLICT (key) DO UPDATE SET value = max(value, excluded.value)
+            """,
+            (longest,),
+        )
+
+    @staticmethod
+    def _bump_version(connection: sqlite3.Connection):
+        connection.execute(
+            """
+            INSERT INTO timetable_meta (key, value) VALUES ('version', 1)
+            ON CONFLICT (key) DO UPDATE SET value = value + 1
+            """
+        )
+
+    @staticmethod
+    def _to_frame(rows: list) -> pd.DataFrame:
+        timetable_df = pd.DataFrame.from_records(
+            rows, columns=["id", *TIMETABLE_COLUMNS], index="id"
+        )
+        timetable_df.index.name = None
+        for column in ["datetime_start", "datetime_end"]:
+            timetable_df[column] = pd.to_datetime(
+                timetable_df[column].astype("int64"), unit="ns"
+            )
+        return timetable_df
+
+    @staticmethod
+    def _resource_conditions(person_requested, room_requested, either, params):
+        resource_conditions = []
+        for column, requested in [
+            ("person", person_requested),
+            ("room", room_requested),
+        ]:
+            if requested:
+                resource_conditions.append(
+                    f"{column} IN (SELECT value FROM json_each(?))"
+                )
+                params.append(json.dumps([str(value) for value in requested]))
+        if not resource_conditions:
+            return []
+        return ["(" + (" OR " if either else " AND ").join(resource_conditions) + ")"]
+
+    def _select_rules(
+        self,
+        connection,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        either=False,
+    ) -> pd.DataFrame:
+        """Rules of the requested person and room active during the requested range."""
+        params = [
+            int(to_epoch_ns(datetime_end_requested)),
+            int(to_epoch_ns(datetime_start_requested)),
+        ]
+        conditions = [
+            "datetime_start <= ?",
+            "last_end >= ?",
+            *self._resource_conditions(
+                person_requested, room_requested, either, params
+            ),
+        ]
+        rows = connection.execute(
+            f"""
+            SELECT id, {", ".join(RULE_COLUMNS)} FROM timetable_rules
+            WHERE {" AND ".join(conditions)}
+            """,
+            params,
+        ).fetchall()
+        return self._to_rules_frame(rows)
+
+    @staticmethod
+    def _to_rules_frame(rows: list) -> pd.DataFrame:
+        rules_df = pd.DataFrame.from_records(
+            rows, columns=["id", *RULE_COLUMNS], index="id"
+        )
+        rules_df.index.name = None
+        for column in ["datetime_start", "datetime_end"]:
+            rules_df[column] = pd.to_datetime(
+                rules_df[column].astype("int64"), unit="ns"
+            )
+        rules_df["period"] = pd.to_timedelta(rules_df["period"].astype("int64"))
+        return compact_rules(rules_df)
+
+    def _insert_rules(self, connection, rules_df: pd.DataFrame):
+        connection.executemany(
+            f"""
+            INSERT INTO timetable_rules ({", ".join(RULE_COLUMNS)}, last_end)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            zip(
+                rules_df["person"].astype(str),
+                to_epoch_ns(rules_df["datetime_start"]).tolist(),
+                to_epoch_ns(rules_df["datetime_end"]).tolist(),
+                rules_df["room"].astype(str),
+                rules_df["period"].to_numpy().view("i8").tolist(),
+                rules_df["count"].tolist(),
+                to_epoch_ns(last_ends(rules_df)).tolist(),
+            ),
+        )
+
+    def _select(
+        self,
+        connection,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        either=False,
+        occurrences=True,
+    ) -> pd.DataFrame:
+        """Rows intersecting the requested range, and the rule occurrences unless disabled."""
+        start_requested = int(to_epoch_ns(datetime_start_requested))
+        end_requested = int(to_epoch_ns(datetime_end_requested))
+        if start_requested > end_requested:
+            raise ValueError(
+                f"time inversion found: {datetime_start_requested} > {datetime_end_requested}"
+            )
+
+        conditions = [
+            "datetime_start >= ?",
+            "datetime_start <= ?",
+            "datetime_end >= ?",
+        ]
+        params = [
+            max(start_requested - self._longest(connection), INT64_MIN),
+            end_requested,
+            start_requested,
+        ]
+        conditions += self._resource_conditions(
+            person_requested, room_requested, either, params
+        )
+
+        rows = connection.execute(
+            f"""
+            SELECT id, {", ".join(TIMETABLE_COLUMNS)} FROM timetable
+            WHERE {" AND ".join(conditions)}
+            ORDER BY datetime_start, datetime_end
+            """,
+            params,
+        ).fetchall()
+        timetable_df = self._to_frame(rows)
+        if occurrences:
+            occurrences_df = expand_rules(
+                self._select_rules(
+                    connection,
+                    person_requested,
+                    room_requested,
+                    datetime_start_requested,
+                    datetime_end_requested,
+                    either,
+                ),
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+            if len(occurrences_df) > 0:
+                timetable_df = pd.concat([timetable_df, occurrences_df]).sort_values(
+                    ["datetime_start", "datetime_end"]
+                )
+        return timetable_df
+
+    def has_timetable(self) -> bool:
+        with self._connection() as connection:
+            return (
+                connection.execute(
+                    "SELECT 1 FROM timetable_meta WHERE key = 'initialized'"
+                ).fetchone()
+                is not None
+            )
+
+    def row_count(self) -> int:
+        with self._connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM timetable").fetchone()[0]
+
+    def read(self) -> pd.DataFrame:
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT id, {', '.join(TIMETABLE_COLUMNS)} FROM timetable"
+            ).fetchall()
+        return compact_timetable(self._to_frame(rows))
+
+    def _version(self, connection: sqlite3.Connection) -> str:
+        row = connection.execute(
+            "SELECT value FROM timetable_meta WHERE key = 'version'"
+        ).fetchone()
+        return f"{os.path.abspath(self.path)}:{row[0] if row else 0}"
+
+    @property
+    def version(self) -> str:
+        with self._connection() as connection:
+            return self._version(connection)
+
+    def content_stamp(self) -> str:
+        with self._connection() as connection:
+            version = self._version(connection)
+        stamp = self._content_stamp
+        if stamp is None or stamp[0] != version:
+            stamp = self._content_stamp = (
+                version,
+                content_hash(self.read(), self.read_rules()),
+            )
+        return stamp[1]
+
+    def replace(self, timetable_df, expected_version=None):
+        timetable_df = compact_timetable(timetable_df)
+        starts = to_epoch_ns(timetable_df["datetime_start"])
+        ends = to_epoch_ns(timetable_df["datetime_end"])
+        with self._transaction() as connection:
+            version = self._version(connection)
+            if expected_version is not None and expected_version != version:
+                raise StaleVersionError(
+                    f"Timetable version {version} != {expected_version}"
+                )
+            connection.execute("DELETE FROM timetable")
+            # The version survives a replace, it must keep increasing.
+            connection.execute("DELETE FROM timetable_meta WHERE key != 'version'")
+            connection.executemany(
+                f"INSERT INTO timetable ({', '.join(TIMETABLE_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                zip(
+                    timetable_df["person"].astype(str),
+                    starts.tolist(),
+                    ends.tolist(),
+                    timetable_df["room"].astype(str),
+                ),
+            )
+            self._update_longest(
+                connection, int((ends - starts).max()) if len(starts) > 0 else 0
+            )
+            connection.execute(
+                "INSERT INTO timetable_meta (key, value) VALUES ('initialized', 1)"
+            )
+            self._bump_version(connection)
+
+    def read_rules(self) -> pd.DataFrame:
+        with self._connection() as connection:
+            rows = connection.execute(
+                f"SELECT id, {', '.join(RULE_COLUMNS)} FROM timetable_rules"
+            ).fetchall()
+        return self._to_rules_frame(rows)
+
+    def list_persons(self) -> list[str]:
+        with self._connection() as connection:
+            rows = connection.execute(
+                """
+                SELECT person FROM timetable UNION
+                SELECT person FROM timetable_rules ORDER BY person
+                """
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_rooms(self) -> list[str]:
+        with self._connection() as connection:
+            rows = connection.execute(
+                """
+                SELECT room FROM timetable UNION
+                SELECT room FROM timetable_rules ORDER BY room
+                """
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def time_range(self):
+        with self._connection() as connection:
+            start, end = connection.execute(
+                """
+                SELECT min(datetime_start), max(datetime_end) FROM (
+                    SELECT datetime_start, datetime_end FROM timetable UNION ALL
+                    SELECT datetime_start, last_end FROM timetable_rules
+                )
+                """
+            ).fetchone()
+        if start is None:
+            return None
+        return pd.Timestamp(start, unit="ns"), pd.Timestamp(end, unit="ns")
+
+    def query(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+    ):
+        with self._connection() as connection:
+            timetable_df = self._select(
+                connection,
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+        # The index range scanned inside SQLite is not known, only the matches.
+        metrics.add(rows_matched=len(timetable_df))
+        return timetable_df
+
+    def post(
+        self,
+        person_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        room_requested,
+    ):
+        with self._transaction() as connection:
+            if (
+                len(
+                    self._select(
+                        connection,
+                        [person_requested],
+                        [room_requested],
+                        datetime_start_requested,
+                        datetime_end_requested,
+                        either=True,
+                    )
+                )
+                > 0
+            ):
+                return False
+            start = int(to_epoch_ns(datetime_start_requested))
+            end = int(to_epoch_ns(datetime_end_requested))
+            connection.execute(
+                f"INSERT INTO timetable ({', '.join(TIMETABLE_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                (person_requested, start, end, room_requested),
+            )
+            self._update_longest(connection, end - start)
+            self._bump_version(connection)
+        return True
+
+    def post_batch(self, batch_df, commit=True):
+        with self._transaction() as connection:
+            existing_df = self._select(
+                connection,
+                list(batch_df["person"].unique()),
+                list(batch_df["room"].unique()),
+                batch_df["datetime_start"].min(),
+                batch_df["datetime_end"].max(),
+                either=True,
+            )
+            person_conflict, room_conflict = batch_overlap_masks(batch_df, existing_df)
+            if not commit or person_conflict.any() or room_conflict.any():
+                return person_conflict, room_conflict
+
+            starts = to_epoch_ns(batch_df["datetime_start"])
+            ends = to_epoch_ns(batch_df["datetime_end"])
+            connection.executemany(
+                f"INSERT INTO timetable ({', '.join(TIMETABLE_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                zip(
+                    batch_df["person"].astype(str),
+                    starts.tolist(),
+                    ends.tolist(),
+                    batch_df["room"].astype(str),
+                ),
+            )
+            self._update_longest(connection, int((ends - starts).max()))
+            self._bump_version(connection)
+        return person_conflict, room_conflict
+
+    def delete(
+        self,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+    ):
+        with self._transaction() as connection:
+            deleted_df = self._select(
+                connection,
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+                occurrences=False,
+            )
+            connection.executemany(
+                "DELETE FROM timetable WHERE id = ?",
+                [(int(row_id),) for row_id in deleted_df.index],
+            )
+
+            # Occurrences are removed by splitting their rules.
+            hit_df = self._select_rules(
+                connection,
+                person_requested,
+                room_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+            )
+            kept_df, parts_df, deleted_occurrences = split_rules(
+                hit_df, datetime_start_requested, datetime_end_requested
+            )
+            connection.executemany(
+                "DELETE FROM timetable_rules WHERE id = ?",
+                [(int(rule_id),) for rule_id in hit_df.index.difference(kept_df.index)],
+            )
+            self._insert_rules(connection, parts_df)
+            if len(deleted_df) + deleted_occurrences > 0:
+                self._bump_version(connection)
+        return len(deleted_df) + deleted_occurrences
+
+    def post_rule(self, rule_df):
+        person, room = rule_df["person"].iat[0], rule_df["room"].iat[0]
+        datetime_start, datetime_end = rule_span(rule_tuples(rule_df)[0])
+        with self._transaction() as connection:
+            if rule_has_conflict(
+                rule_df,
+                self._select(
+                    connection,
+                    [person],
+                    [room],
+                    datetime_start,
+                    datetime_end,
+                    either=True,
+                    occurrences=False,
+                ),
+                rule_tuples(
+                    self._select_rules(
+                        connection,
+                        [person],
+                        [room],
+                        datetime_start,
+                        datetime_end,
+                        either=True,
+                    )
+                ),
+            ):
+                return False
+            self._insert_rules(connection, rule_df)
+            self._bump_version(connection)
+        return True
+
+
+@functools.lru_cache(maxsize=None)
+def open_sqlite_backend(path: str) -> SQLiteBackend:
+    """One backend per database file and process."""
+    return SQLiteBackend(path)
+
+
+def get_backend() -> TimetableBackend:
+    """Backend of the Streamlit app.
+
+    SQLite when ``TIMETABLE_DATABASE`` is set, the session state of the
+    current script run otherwise. Code running outside the app passes its own
+    backend to the functions instead.
+    """
+    database = os.environ.get("TIMETABLE_DATABASE")
+    if database:
+        return open_sqlite_backend(database)
+    # Imported here so the engine can be used without Streamlit.
+    import streamlit as st
+
+    return DataFrameBackend(st.session_state)
@@ -11,6 +11,11 @@ class InstanceTypeEnum(str, Enum):
     ROOM = "room"
 
 
+class FrequencyEnum(str, Enum):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+
 class TimetableInstanceFinderInput(BaseModel):
     """Input for Timetable check."""
 
@@ -46,6 +51,36 @@ class TimetableCheckInput(BaseModel):
         arbitrary_types_allowed = True
 
 
+class TimetableFreeSlotInput(BaseModel):
+    """Input for Timetable free slot search."""
+
+    person_requested: Optional[list[str]] = Field(
+        default=[], description="List of person name that all need to be available"
+    )
+    room_requested: Optional[list[str]] = Field(
+        default=[], description="List of room name that all need to be available"
+    )
+    datetime_start_requested: datetime.datetime = Field(
+        description="Start date and start time of the search window",
+    )
+    datetime_end_requested: datetime.datetime = Field(
+        description="End date and end time of the search window",
+    )
+    duration_minutes_requested: int = Field(
+        default=30, description="Required duration of the free slot in minutes"
+    )
+    working_hour_start_requested: Optional[datetime.time] = Field(
+        default=None, description="Earliest time of day a slot may start, e.g. 08:00"
+    )
+    working_hour_end_requested: Optional[datetime.time] = Field(
+        default=None, description="Latest time of day a slot may end, e.g. 17:00"
+    )
+    top_k: int = Field(default=5, description="Maximum number of free slots to return")
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
 class TimetablePostInput(BaseModel):
     """Input for Timetable check."""
 
@@ -60,3 +95,114 @@ class TimetablePostInput(BaseModel):
 
     class Config:
         arbitrary_types_allowed = True
+
+
+class TimetablePostRecurringInput(BaseModel):
+    """Input for Timetable recurring post."""
+
+    person_requested: str = Field(description="Person name to put in the Timetable")
+    datetime_start_requested: datetime.datetime = Field(
+        description="Start date and start time of the first occurrence",
+    )
+    datetime_end_requested: datetime.datetime = Field(
+        description="End date and end time of the first occurrence",
+    )
+    room_requested: str = Field(description="Room name to put in the Timetable")
+    frequency_requested: FrequencyEnum = Field(
+        default=FrequencyEnum.WEEKLY, description="How often the schedule repeats"
+    )
+    interval_requested: int = Field(
+        default=1,
+        description="Number of days or weeks between occurrences, e.g. 2 for every other week",
+    )
+    datetime_until_requested: datetime.datetime = Field(
+        description="Date and time after which the schedule no longer repeats",
+    )
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class TimetablePostBatchInput(BaseModel):
+    """Input for Timetable batch post."""
+
+    schedules_requested: list[TimetablePostInput] = Field(
+        description="List of schedules to put in the Timetable, all of them are added or none",
+    )
+
+
+class TimetableMeetingInput(BaseModel):
+    """Input for one meeting of a Timetable solve."""
+
+    person_requested: list[str] = Field(
+        description="List of person name that all attend the meeting"
+    )
+    room_requested: list[str] = Field(
+        description="List of candidate room name, the meeting takes one of them"
+    )
+    duration_minutes_requested: int = Field(
+        default=30, description="Duration of the meeting in minutes"
+    )
+    datetime_start_requested: datetime.datetime = Field(
+        description="Earliest date and time the meeting may start",
+    )
+    datetime_end_requested: datetime.datetime = Field(
+        description="Latest date and time the meeting may end",
+    )
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class TimetableSolveInput(BaseModel):
+    """Input for Timetable solve."""
+
+    meetings_requested: list[TimetableMeetingInput] = Field(
+        description="List of meetings to place in the Timetable without conflict",
+    )
+    working_hour_start_requested: Optional[datetime.time] = Field(
+        default=None, description="Earliest time of day a meeting may start, e.g. 08:00"
+    )
+    working_hour_end_requested: Optional[datetime.time] = Field(
+        default=None, description="Latest time of day a meeting may end, e.g. 17:00"
+    )
+    step_minutes_requested: int = Field(
+        default=15, description="Meetings start on multiples of this many minutes"
+    )
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class TimetableAuditInput(BaseModel):
+    """Input for Timetable audit, the whole Timetable is checked."""
+
+
+class TimetableAvailabilityMatrixInput(BaseModel):
+    """Input for Timetable availability of many person or rooms over many slots."""
+
+    instance_type: InstanceTypeEnum = Field(
+        default=InstanceTypeEnum.ROOM,
+        description="Type of object to check in the Timetable (person or room)",
+    )
+    names_requested: Optional[list[str]] = Field(
+        default=[], description="List of person or room name, all of them when empty"
+    )
+    datetime_start_requested: datetime.datetime = Field(
+        description="Start date and start time of the first slot",
+    )
+    datetime_end_requested: datetime.datetime = Field(
+        description="End date and end time of the last slot",
+    )
+    slot_minutes_requested: int = Field(
+        default=60, description="Length of each slot in minutes, e.g. 60 for every hour"
+    )
+    working_hour_start_requested: Optional[datetime.time] = Field(
+        default=None, description="Earliest time of day a slot may start, e.g. 08:00"
+    )
+    working_hour_end_requested: Optional[datetime.time] = Field(
+        default=None, description="Latest time of day a slot may end, e.g. 17:00"
+    )
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -0,0 +1,80 @@
+import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.backends import TimetableBackend
+from utils.intervals import conflict_mask
+
+# Weeks loaded on each side of the selected one, so moving to the previous or
+# next week is already served from the cache.
+PREFETCH_WEEKS = 1
+# Up to this many resources are all listed, above it only those with events.
+MAX_ALL_RESOURCES = 200
+CONFLICT_COLOR = "#d62728"
+
+
+def week_of(date: datetime.date) -> datetime.date:
+    """Monday of the week of ``date``."""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def window_weeks(date: datetime.date) -> list[datetime.date]:
+    week = week_of(date)
+    return [
+        week + datetime.timedelta(weeks=offset)
+        for offset in range(-PREFETCH_WEEKS, PREFETCH_WEEKS + 1)
+    ]
+
+
+def conflict_ids(week_df: pd.DataFrame, backend: TimetableBackend) -> np.ndarray:
+    """Ids of the rows of ``week_df`` overlapping another row of the same person
+    or room.
+
+    A row overlapping one of the week intersects the span from their first
+    start to their last end, only that span is queried, not the whole Timetable.
+    """
+    if len(week_df) == 0:
+        return week_df.index.to_numpy()
+    span_df = backend.query(
+        None, None, week_df["datetime_start"].min(), week_df["datetime_end"].max()
+    )
+    span_ids = span_df.index.to_numpy()[conflict_mask(span_df)]
+    return week_df.index.to_numpy()[week_df.index.isin(span_ids)]
+
+
+def to_events(
+    timetable_df: pd.DataFrame, mode: str, conflict_ids: Optional[np.ndarray] = None
+) -> list[dict]:
+    """FullCalendar events of ``timetable_df``, by room or by person.
+
+    Events of the rows in ``conflict_ids`` are shown in ``CONFLICT_COLOR``.
+    """
+    resource, title = ("room", "person") if mode == "Room" else ("person", "room")
+    events = pd.DataFrame(
+        {
+            "id": timetable_df.index.astype(str),
+            "start": timetable_df["datetime_start"].dt.strftime("%Y-%m-%dT%H:%M:%S"),
+            "end": timetable_df["datetime_end"].dt.strftime("%Y-%m-%dT%H:%M:%S"),
+            "title": timetable_df[title].astype(str),
+            "resourceId": timetable_df[resource].astype(str),
+        }
+    ).to_dict(orient="records")
+    if conflict_ids is not None:
+        for event, is_conflict in zip(
+            events, np.isin(timetable_df.index.to_numpy(), conflict_ids)
+        ):
+            if is_conflict:
+                event["color"] = CONFLICT_COLOR
+    return events
+
+
+def to_resources(names: list[str], mode: str) -> list[dict]:
+    prefix = "Room " if mode == "Room" else ""
+    return [{"id": name, "title": f"{prefix}{name}"} for name in sorted(names)]
+
+
+def merge_events(chunks: list[list[dict]]) -> list[dict]:
+    """Events of consecutive weeks, without the ones that span two weeks twice."""
+    return list({event["id"]: event for chunk in chunks for event in chunk}.values())
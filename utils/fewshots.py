@@ -1,4 +1,17 @@
-from langchain.schema import AIMessage, FunctionMessage, HumanMessage
+import math
+import os
+import re
+from collections import Counter
+from typing import Optional
+
+from langchain.schema import AIMessage, BaseMessage, FunctionMessage, HumanMessage
+
+from utils.formatters import estimate_tokens
+
+# Few-shot examples sent with each question, the most relevant first.
+FEW_SHOT_K = 2
+FEW_SHOT_TOKEN_BUDGET = int(os.environ.get("TIMETABLE_FEW_SHOT_TOKEN_BUDGET", "400"))
+MIN_RELATIVE_SCORE = 0.5
 
 example_1 = [
     HumanMessage(
@@ -13,37 +26,15 @@ example_1 = [
         additional_kwargs={"name": "example_ai"},
     ),
     FunctionMessage(
-        content="""
-List of person in the Timetable are:
-```
-- Abby Montgomery
-- Abdirahman Castaneda
-```
-
-List of room in the Timetable are:
-```
-- Room Alpha
-- Room Bravo
-- Room Charlie
-```
-
-Person inavailability based on user requested time range are specified below:
-
-```
-- Abby Montgomery is unavailable/occupied from:
--- 09:10:00 to 10:50:00
--- 11:00:00 to 12:40:00
-- Abdirahman Castaneda is unavailable/occupied from:
--- 10:10:00 to 12:40:00
-```
-
-Room inavailability based on user requested time range are specified below:
-
-```
-- Room Alpha is unavailable/occupied.
-- Room Charlie is unavailable/occupied.
-```
-""",
+        content="""Timetable has 2 person and 3 room. Requested time range: 2023-02-06 10:00 to 2023-02-06 12:00.
+
+Unavailable/occupied person (2 of 2):
+- Abby Montgomery: 09:10-10:50, 11:00-12:40
+- Abdirahman Castaneda: 10:10-12:40
+Available person (0): none
+
+Unavailable/occupied room (2 of 3): Room Alpha, Room Charlie
+Available room (1): Room Bravo""",
         name="timetable_availability",
         additional_kwargs={"name": "example_function"},
     ),
@@ -92,39 +83,15 @@ example_3 = [
         additional_kwargs={"name": "example_ai_3"},
     ),
     FunctionMessage(
-        content="""
-List of person in the Timetable are:
-```
-- Abby Montgomery
-- Abdirahman Castaneda
-- Anna Koch
-- Wilson Cole
-```
-
-List of room in the Timetable are:
-```
-- Room Alpha
-- Room Bravo
-- Room Charlie
-```
-
-Person inavailability based on user requested time range are specified below:
-
-```
-- Anna Koch is unavailable/occupied from:
--- 09:10:00 to 10:50:00
--- 11:00:00 to 12:40:00
-- Wilson Cole is unavailable/occupied from:
--- 10:10:00 to 12:40:00
-```
-
-Room inavailability based on user requested time range are specified below:
-
-```
-- Room Alpha is unavailable/occupied.
-- Room Charlie is unavailable/occupied.
-```
-""",
+        content="""Timetable has 4 person and 3 room. Requested time range: 2023-02-06 00:00 to 2023-02-06 23:59.
+
+Unavailable/occupied person (2 of 3):
+- Anna Koch: 09:10-10:50, 11:00-12:40
+- Wilson Cole: 10:10-12:40
+Available person (1): Person X
+
+Unavailable/occupied room (2 of 3): Room Alpha, Room Charlie
+Available room (1): Room Bravo""",
         name="timetable_availability",
         additional_kwargs={"name": "example_function_3"},
     ),
@@ -133,3 +100,365 @@ Room inavailability based on user requested time range are specified below:
         additional_kwargs={"name": "example_assistant_3"},
     ),
 ]
+
+
+example_4 = [
+    HumanMessage(
+        content="find a free one hour slot for Abby Montgomery and Anna Koch in room Alpha on February 6th, 2023",
+        additional_kwargs={"name": "example_user_4"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_free_slot', 'arguments': '{\
+  \"person_requested\": [\"Abby Montgomery\", \"Anna Koch\"],\
+  \"room_requested\": [\"Alpha\"],\
+  \"datetime_start_requested\": \"2023-02-06T08:00:00\",\
+  \"datetime_end_requested\": \"2023-02-06T18:00:00\",\
+  \"duration_minutes_requested\": 60,\
+  \"top_k\": 3\
+}'}""",
+        additional_kwargs={"name": "example_ai_4"},
+    ),
+    FunctionMessage(
+        content="""Free slots where everyone requested is available:
+- 2023-02-06 08:00 to 2023-02-06 09:09
+- 2023-02-06 15:11 to 2023-02-06 18:00""",
+        name="timetable_free_slot",
+        additional_kwargs={"name": "example_function_4"},
+    ),
+    AIMessage(
+        content="Abby Montgomery, Anna Koch and Room Alpha are all free on February 6th, 2023 from 08:00 to 09:09 and from 15:11 to 18:00, so the first one hour slot is from 08:00 to 09:00",
+        additional_kwargs={"name": "example_assistant_4"},
+    ),
+]
+
+
+example_5 = [
+    HumanMessage(
+        content="show me the schedule of Abby Montgomery on February 6th, 2023",
+        additional_kwargs={"name": "example_user_5"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_get', 'arguments': '{\
+  \"person_requested\": [\"Abby Montgomery\"],\
+  \"datetime_start_requested\": \"2023-02-06T00:00:00\",\
+  \"datetime_end_requested\": \"2023-02-06T23:59:59\"\
+}'}""",
+        additional_kwargs={"name": "example_ai_5"},
+    ),
+    FunctionMessage(
+        content="""2 schedules of 1 person in 2 room, from 2023-02-06 09:10 to 2023-02-06 12:40:
+- Abby Montgomery | 2023-02-06 09:10 to 2023-02-06 10:50 | Room Alpha
+- Abby Montgomery | 2023-02-06 11:00 to 2023-02-06 12:40 | Room Charlie""",
+        name="timetable_get",
+        additional_kwargs={"name": "example_function_5"},
+    ),
+    AIMessage(
+        content="Abby Montgomery has 2 schedules on February 6th, 2023:\n - 09:10 to 10:50 in Room Alpha\n - 11:00 to 12:40 in Room Charlie",
+        additional_kwargs={"name": "example_assistant_5"},
+    ),
+]
+
+
+example_6 = [
+    HumanMessage(
+        content="which rooms are free each hour on February 6th, 2023 from 9am to 1pm?",
+        additional_kwargs={"name": "example_user_6"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_availability_matrix', 'arguments': '{\
+  \"instance_type\": \"room\",\
+  \"datetime_start_requested\": \"2023-02-06T09:00:00\",\
+  \"datetime_end_requested\": \"2023-02-06T13:00:00\",\
+  \"slot_minutes_requested\": 60\
+}'}""",
+        additional_kwargs={"name": "example_ai_6"},
+    ),
+    FunctionMessage(
+        content="""- 2023-02-06 09:00 to 10:00: 1 of 3 free: Room Bravo
+- 2023-02-06 10:00 to 11:00: 0 of 3 free: none
+- 2023-02-06 11:00 to 12:00: 1 of 3 free: Room Alpha
+- 2023-02-06 12:00 to 13:00: 1 of 3 free: Room Alpha""",
+        name="timetable_availability_matrix",
+        additional_kwargs={"name": "example_function_6"},
+    ),
+    AIMessage(
+        content="On February 6th, 2023:\n - 9am to 10am: Room Bravo is free\n - 10am to 11am: no room is free\n - 11am to 1pm: Room Alpha is free",
+        additional_kwargs={"name": "example_assistant_6"},
+    ),
+]
+
+
+example_7 = [
+    HumanMessage(
+        content="plan a 1 hour meeting of Abby Montgomery and Anna Koch in room Alpha or Bravo, and a 30 minutes meeting of Anna Koch and Wilson Cole in room Alpha, on February 7th, 2023",
+        additional_kwargs={"name": "example_user_7"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_solve', 'arguments': '{\
+  \"meetings_requested\": [{\"person_requested\": [\"Abby Montgomery\", \"Anna Koch\"], \"room_requested\": [\"Alpha\", \"Bravo\"], \"duration_minutes_requested\": 60, \"datetime_start_requested\": \"2023-02-07T08:00:00\", \"datetime_end_requested\": \"2023-02-07T18:00:00\"}, {\"person_requested\": [\"Anna Koch\", \"Wilson Cole\"], \"room_requested\": [\"Alpha\"], \"duration_minutes_requested\": 30, \"datetime_start_requested\": \"2023-02-07T08:00:00\", \"datetime_end_requested\": \"2023-02-07T18:00:00\"}]\
+}'}""",
+        additional_kwargs={"name": "example_ai_7"},
+    ),
+    FunctionMessage(
+        content="""2 of 2 meetings placed without conflict, nothing was added to the Timetable.
+1. Abby Montgomery, Anna Koch | 2023-02-07 08:00 to 2023-02-07 09:00 | Room Alpha
+2. Anna Koch, Wilson Cole | 2023-02-07 09:15 to 2023-02-07 09:45 | Room Alpha""",
+        name="timetable_solve",
+        additional_kwargs={"name": "example_function_7"},
+    ),
+    AIMessage(
+        content="Both meetings fit on February 7th, 2023 without conflict:\n 1. Abby Montgomery and Anna Koch from 08:00 to 09:00 in Room Alpha\n 2. Anna Koch and Wilson Cole from 09:15 to 09:45 in Room Alpha\nShould I add them to the Timetable?",
+        additional_kwargs={"name": "example_assistant_7"},
+    ),
+]
+
+
+example_8 = [
+    HumanMessage(
+        content="book Wilson Cole in room Charlie every week on Tuesday from 9am to 9.30am, starting February 7th, 2023 until the end of March",
+        additional_kwargs={"name": "example_user_8"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_post_recurring', 'arguments': '{\
+  \"person_requested\": \"Wilson Cole\",\
+  \"datetime_start_requested\": \"2023-02-07T09:00:00\",\
+  \"datetime_end_requested\": \"2023-02-07T09:30:00\",\
+  \"room_requested\": \"Charlie\",\
+  \"frequency_requested\": \"weekly\",\
+  \"interval_requested\": 1,\
+  \"datetime_until_requested\": \"2023-03-31T00:00:00\"\
+}'}""",
+        additional_kwargs={"name": "example_ai_8"},
+    ),
+    FunctionMessage(
+        content="""New recurring schedule successfuly added to the Timetable: 8 occurrences from 2023-02-07 09:00 to 2023-03-28 09:00""",
+        name="timetable_post_recurring",
+        additional_kwargs={"name": "example_function_8"},
+    ),
+    AIMessage(
+        content="I have booked Wilson Cole in Room Charlie every Tuesday from 9am to 9.30am, 8 times from February 7th to March 28th, 2023",
+        additional_kwargs={"name": "example_assistant_8"},
+    ),
+]
+
+
+example_9 = [
+    HumanMessage(
+        content="add Person X in room Alpha and Person Y in room Bravo on February 8th, 2023 from 10am to 11am",
+        additional_kwargs={"name": "example_user_9"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_post_batch', 'arguments': '{\
+  \"schedules_requested\": [{\"person_requested\": \"Person X\", \"datetime_start_requested\": \"2023-02-08T10:00:00\", \"datetime_end_requested\": \"2023-02-08T11:00:00\", \"room_requested\": \"Alpha\"}, {\"person_requested\": \"Person Y\", \"datetime_start_requested\": \"2023-02-08T10:00:00\", \"datetime_end_requested\": \"2023-02-08T11:00:00\", \"room_requested\": \"Bravo\"}]\
+}'}""",
+        additional_kwargs={"name": "example_ai_9"},
+    ),
+    FunctionMessage(
+        content="""2 new schedules successfuly added to the Timetable:
+1. Person X, Room Alpha, 2023-02-08 10:00 to 2023-02-08 11:00: ok
+2. Person Y, Room Bravo, 2023-02-08 10:00 to 2023-02-08 11:00: ok""",
+        name="timetable_post_batch",
+        additional_kwargs={"name": "example_function_9"},
+    ),
+    AIMessage(
+        content="I have added both schedules on February 8th, 2023 from 10am to 11am: Person X in Room Alpha and Person Y in Room Bravo",
+        additional_kwargs={"name": "example_assistant_9"},
+    ),
+]
+
+
+example_10 = [
+    HumanMessage(
+        content="remove all schedules of Abdirahman Castaneda on February 6th, 2023",
+        additional_kwargs={"name": "example_user_10"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_delete', 'arguments': '{\
+  \"person_requested\": [\"Abdirahman Castaneda\"],\
+  \"datetime_start_requested\": \"2023-02-06T00:00:00\",\
+  \"datetime_end_requested\": \"2023-02-06T23:59:59\"\
+}'}""",
+        additional_kwargs={"name": "example_ai_10"},
+    ),
+    FunctionMessage(
+        content="""Sucessfully deleted entries""",
+        name="timetable_delete",
+        additional_kwargs={"name": "example_function_10"},
+    ),
+    AIMessage(
+        content="I have deleted the schedules of Abdirahman Castaneda on February 6th, 2023",
+        additional_kwargs={"name": "example_assistant_10"},
+    ),
+]
+
+
+example_11 = [
+    HumanMessage(
+        content="are there any overlapping schedules in the timetable?",
+        additional_kwargs={"name": "example_user_11"},
+    ),
+    AIMessage(
+        content="""{'name': 'timetable_audit', 'arguments': '{}'}""",
+        additional_kwargs={"name": "example_ai_11"},
+    ),
+    FunctionMessage(
+        content="""There is no conflict in the Timetable, 6 schedules checked""",
+        name="timetable_audit",
+        additional_kwargs={"name": "example_function_11"},
+    ),
+    AIMessage(
+        content="There is no overlapping schedule in the Timetable, all 6 schedules were checked",
+        additional_kwargs={"name": "example_assistant_11"},
+    ),
+]
+
+
+EXAMPLES = [
+    example_1,
+    example_2,
+    example_3,
+    example_4,
+    example_5,
+    example_6,
+    example_7,
+    example_8,
+    example_9,
+    example_10,
+    example_11,
+]
+
+STOP_WORDS = frozenset(
+    "a an and are at be for from i in is it me my of on or the to with".split()
+)
+# Words of the same intent, mapped to the one the examples and tools use.
+SYNONYMS = {
+    "book": "add",
+    "booking": "schedule",
+    "create": "add",
+    "reserve": "add",
+    "put": "add",
+    "cancel": "delete",
+    "remove": "delete",
+    "drop": "delete",
+    "free": "available",
+    "unoccupied": "available",
+    "availability": "available",
+    "busy": "occupied",
+    "overlap": "conflict",
+    "overlapping": "conflict",
+    "double": "conflict",
+    "clash": "conflict",
+    "plan": "arrange",
+    "organize": "arrange",
+    "meeting": "arrange",
+    "recurring": "every",
+    "weekly": "every",
+    "daily": "every",
+}
+
+
+def terms(text: str) -> list[str]:
+    """Lowercase words of ``text`` without stop words and numbers.
+
+    Plurals are cut to their singular and synonyms replaced, so "cancel the
+    bookings" matches "delete the schedule".
+    """
+    words = []
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        word = SYNONYMS.get(word, word)
+        if word not in STOP_WORDS and len(word) > 1:
+            words.append(word)
+    return words
+
+
+class FewShotIndex:
+    """TF-IDF index of few-shot examples on their question and tools.
+
+    An example is indexed on its question, the names of the tools it calls
+    and their ``descriptions``. ``select`` returns the messages of the ``k``
+    examples most similar to a question that fit in ``token_budget`` tokens
+    together. Everything is computed locally, the library can grow without
+    growing every prompt.
+    """
+
+    def __init__(
+        self,
+        examples: list[list[BaseMessage]],
+        descriptions: Optional[dict[str, str]] = None,
+    ):
+        self.examples = examples
+        self.descriptions = descriptions or {}
+        self.tokens = [
+            sum(estimate_tokens(message.content) + 4 for message in example)
+            for example in examples
+        ]
+        documents = [Counter(terms(self.__document(example))) for example in examples]
+        document_frequency = Counter(
+            term for document in documents for term in document
+        )
+        # Terms of every example, e.g. "useful" of the descriptions, weigh 0.
+        self.idf = {
+            term: math.log((1 + len(examples)) / (1 + frequency))
+            for term, frequency in document_frequency.items()
+        }
+        self.vectors = [self.__vector(document) for document in documents]
+
+    def __document(self, example: list[BaseMessage]) -> str:
+        # Capitalized words of the question are its data, names and months.
+        words = example[0].content.split()
+        question = [words[0]] + [word for word in words[1:] if not word[0].isupper()]
+        tools = [
+            f"{message.name.replace('_', ' ')} {self.descriptions.get(message.name, '')}"
+            for message in example
+            if isinstance(message, FunctionMessage)
+        ]
+        return " ".join([*question, *tools])
+
+    def __vector(self, counts: Counter) -> dict[str, float]:
+        weights = {
+            term: count * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
+
+    def scores(self, question: str) -> list[float]:
+        query = self.__vector(Counter(terms(question)))
+        return [
+            sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            for vector in self.vectors
+        ]
+
+    def select(
+        self,
+        question: str,
+        k: int = FEW_SHOT_K,
+        token_budget: int = FEW_SHOT_TOKEN_BUDGET,
+    ) -> list[BaseMessage]:
+        """Messages of the most similar examples, the first example when none is.
+
+        Examples scoring less than ``MIN_RELATIVE_SCORE`` of the best one are
+        left out, a weak match teaches the model less than it costs.
+        """
+        scores = self.scores(question)
+        best = max(scores, default=0.0)
+        ranked = sorted(
+            (
+                number
+                for number, score in enumerate(scores)
+                if score > 0 and score >= best * MIN_RELATIVE_SCORE
+            ),
+            key=lambda number: -scores[number],
+        ) or [0]
+        selected, tokens = [], 0
+        for number in ranked:
+            if len(selected) == k:
+                break
+            if tokens + self.tokens[number] > token_budget and selected:
+                continue
+            selected.append(number)
+            tokens += self.tokens[number]
+        return [message for number in selected for message in self.examples[number]]
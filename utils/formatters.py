@@ -0,0 +1,290 @@
+import datetime
+import logging
+import os
+from collections.abc import Iterable
+
+import pandas as pd
+
+from utils.intervals import merge_intervals
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BUDGET = int(os.environ.get("TIMETABLE_TOKEN_BUDGET", "1000"))
+
+# Rough size of an OpenAI token for English text and timestamps, good enough to
+# keep tool results under budget without a tokenizer dependency.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def __time_format(
+    datetime_start_requested: datetime.datetime,
+    datetime_end_requested: datetime.datetime,
+) -> str:
+    if (
+        pd.Timestamp(datetime_start_requested).date()
+        == pd.Timestamp(datetime_end_requested).date()
+    ):
+        return "%H:%M"
+    return "%Y-%m-%d %H:%M"
+
+
+def __budgeted_lines(
+    lines: Iterable[str], total: int, token_budget: int, overflow: str
+) -> list[str]:
+    """Keep the lines that fit the budget, then an overflow note with the remaining count."""
+    kept = []
+    used = 0
+    for line in lines:
+        used += estimate_tokens(line) + 1
+        if used > token_budget:
+            kept.append(overflow.format(total - len(kept)))
+            break
+        kept.append(line)
+    return kept
+
+
+def __names(names: list[str], prefix: str, token_budget: int) -> str:
+    kept = __budgeted_lines(
+        (f"{prefix}{name}" for name in names), len(names), token_budget, "and {} more"
+    )
+    return ", ".join(kept) if kept else "none"
+
+
+def __log_saving(name: str, verbose_chars: int, text: str):
+    saved = (verbose_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN - estimate_tokens(
+        text
+    )
+    logger.info(
+        "%s: %d tokens, about %d tokens saved against the verbose format",
+        name,
+        estimate_tokens(text),
+        saved,
+    )
+
+
+def format_availability(
+    list_all_person: list[str],
+    list_all_room: list[str],
+    person_busy_df: pd.DataFrame,
+    room_busy_df: pd.DataFrame,
+    person_requested,
+    room_requested,
+    datetime_start_requested: datetime.datetime,
+    datetime_end_requested: datetime.datetime,
+    token_budget: int = TOKEN_BUDGET,
+) -> str:
+    """Availability summary that stays within ``token_budget``.
+
+    Busy intervals of each person are merged when they overlap or touch, free
+    person/room are listed by name only, and long lists are cut with a count of
+    what was left out.
+    """
+    time_format = __time_format(datetime_start_requested, datetime_end_requested)
+    person_candidates = list(person_requested) if person_requested else list_all_person
+    room_candidates = list(room_requested) if room_requested else list_all_room
+
+    person_blocks = merge_intervals(
+        person_busy_df["person"],
+        person_busy_df["datetime_start"],
+        person_busy_df["datetime_end"],
+    )
+    blocks = (
+        person_blocks["datetime_start"].dt.strftime(time_format)
+        + "-"
+        + person_blocks["datetime_end"].dt.strftime(time_format)
+    )
+    person_unavailable = [
+        f"- {person}: {', '.join(person_times)}"
+        for person, person_times in blocks.groupby(person_blocks["key"], sort=True)
+    ]
+    person_unavailable_set = set(person_blocks["key"])
+    person_available = [
+        person for person in person_candidates if person not in person_unavailable_set
+    ]
+    room_unavailable = sorted(set(room_busy_df["room"].astype(str)))
+    room_unavailable_set = set(room_unavailable)
+    room_available = [
+        room for room in room_candidates if room not in room_unavailable_set
+    ]
+
+    # The budget is shared between the sections, busy person get the largest part.
+    header = (
+        f"Timetable has {len(list_all_person)} person and {len(list_all_room)} room. "
+        f"Requested time range: {datetime_start_requested:%Y-%m-%d %H:%M} to "
+        f"{datetime_end_requested:%Y-%m-%d %H:%M}."
+    )
+    section_budget = max(token_budget - estimate_tokens(header), 0) // 4
+    text = "\n".join(
+        [
+            header,
+            "",
+            f"Unavailable/occupied person ({len(person_unavailable)} of {len(person_candidates)}):",
+            *__budgeted_lines(
+                person_unavailable,
+                len(person_unavailable),
+                2 * section_budget,
+                "- ... and {} more person",
+            ),
+            f"Available person ({len(person_available)}): "
+            + __names(person_available, "", section_budget // 2),
+            "",
+            f"Unavailable/occupied room ({len(room_unavailable)} of {len(room_candidates)}): "
+            + __names(room_unavailable, "Room ", section_budget // 2),
+            f"Available room ({len(room_available)}): "
+            + __names(room_available, "Room ", section_budget // 2),
+        ]
+    )
+
+    __log_saving(
+        "timetable_availability",
+        sum(len(person) + 3 for person in list_all_person)
+        + sum(len(room) + 8 for room in list_all_room)
+        + 24 * len(person_busy_df)
+        + sum(len(person) + 40 for person in person_unavailable_set)
+        + sum(len(room) + 35 for room in room_unavailable),
+        text,
+    )
+    return text
+
+
+def format_timetable(
+    timetable_df: pd.DataFrame, token_budget: int = TOKEN_BUDGET
+) -> str:
+    """One line per schedule, cut to ``token_budget`` with a summary of the rest."""
+    if len(timetable_df) == 0:
+        return "There is no schedule in the Timetable for the requested person, room and time range"
+
+    lines = (
+        f"- {row.person} | {row.datetime_start:%Y-%m-%d %H:%M} to "
+        f"{row.datetime_end:%Y-%m-%d %H:%M} | Room {row.room}"
+        for row in timetable_df.itertuples()
+    )
+    summary = (
+        f"{len(timetable_df)} schedules of {timetable_df['person'].nunique()} person "
+        f"in {timetable_df['room'].nunique()} room, from "
+        f"{timetable_df['datetime_start'].min():%Y-%m-%d %H:%M} to "
+        f"{timetable_df['datetime_end'].max():%Y-%m-%d %H:%M}:"
+    )
+    text = "\n".join(
+        [
+            summary,
+            *__budgeted_lines(
+                lines,
+                len(timetable_df),
+                token_budget - estimate_tokens(summary),
+                "- ... and {} more schedules, ask for a narrower person, room or time range",
+            ),
+        ]
+    )
+
+    # Full to_string of a large frame is what we avoid, so extrapolate it from the head.
+    sample = timetable_df.head(5)
+    __log_saving(
+        "timetable_get",
+        len(sample.to_string()) * len(timetable_df) // len(sample),
+        text,
+    )
+    return text
+
+
+def format_solution(
+    placed_df: pd.DataFrame,
+    unplaced: list[int],
+    n_meetings: int,
+    token_budget: int = TOKEN_BUDGET,
+) -> str:
+    """One line per placed meeting, numbered as requested, cut to ``token_budget``."""
+    if n_meetings == 0:
+        return "No meeting to be placed"
+
+    summary = (
+        f"{len(placed_df)} of {n_meetings} meetings placed without conflict, "
+        "nothing was added to the Timetable."
+    )
+    if unplaced:
+        summary += (
+            " No conflict-free time in the requested window for meeting "
+            + ", ".join(str(number + 1) for number in unplaced[:20])
+            + (f" and {len(unplaced) - 20} more" if len(unplaced) > 20 else "")
+            + "."
+        )
+    lines = (
+        f"{number + 1}. {row.persons} | {row.datetime_start:%Y-%m-%d %H:%M} to "
+        f"{row.datetime_end:%Y-%m-%d %H:%M} | Room {row.room}"
+        for number, row in zip(placed_df.index, placed_df.itertuples())
+    )
+    return "\n".join(
+        [
+            summary,
+            *__budgeted_lines(
+                lines,
+                len(placed_df),
+                token_budget - estimate_tokens(summary),
+                "... and {} more meetings, ask for fewer meetings at once",
+            ),
+        ]
+    )
+
+
+def format_audit(
+    conflicts_df: pd.DataFrame,
+    total: int,
+    n_rows: int,
+    token_budget: int = TOKEN_BUDGET,
+) -> str:
+    """Conflicting pairs of the Timetable, earliest first, cut to ``token_budget``."""
+    if total == 0:
+        return f"There is no conflict in the Timetable, {n_rows} schedules checked"
+
+    summary = (
+        f"{total} conflicts found in the Timetable ({n_rows} schedules checked), "
+        "each between two schedules of the same person or room at the same time:"
+    )
+    lines = (
+        f"- {row.resource.capitalize()} {row.name} | "
+        f"{row.datetime_start:%Y-%m-%d %H:%M} to {row.datetime_end:%Y-%m-%d %H:%M} | "
+        f"schedules {row.row_id} and {row.other_row_id}"
+        for row in conflicts_df.itertuples()
+    )
+    return "\n".join(
+        [
+            summary,
+            *__budgeted_lines(
+                lines,
+                total,
+                token_budget - estimate_tokens(summary),
+                "- ... and {} more conflicts",
+            ),
+        ]
+    )
+
+
+def format_availability_matrix(
+    free_df: pd.DataFrame, prefix: str = "", token_budget: int = TOKEN_BUDGET
+) -> str:
+    """Free person or rooms of each slot, one line per slot, cut to ``token_budget``."""
+    if free_df.shape[1] == 0:
+        return "There is no slot in the requested time range"
+
+    # Each slot gets the same share of the budget for its names.
+    line_budget = max(token_budget // free_df.shape[1] - 12, 8)
+    lines = []
+    for window in free_df.columns:
+        free = free_df.index[free_df[window].to_numpy()].tolist()
+        time_format = __time_format(window.left, window.right)
+        lines.append(
+            f"- {window.left:%Y-%m-%d %H:%M} to {window.right.strftime(time_format)}: "
+            f"{len(free)} of {len(free_df)} free: " + __names(free, prefix, line_budget)
+        )
+    return "\n".join(
+        __budgeted_lines(
+            lines,
+            len(lines),
+            token_budget,
+            "- ... and {} more slots, ask for a shorter time range or longer slots",
+        )
+    )
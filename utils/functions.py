@@ -1,221 +1,505 @@
 import datetime
+import os
+from typing import Optional
 
+import numpy as np
 import pandas as pd
-import streamlit as st
-from datetimerange import DateTimeRange
 
-
-def __filter_intersection(
-    timetable_df: pd.DataFrame,
+from utils import metrics
+from utils.backends import TimetableBackend, get_backend
+from utils.classes import TimetableMeetingInput, TimetablePostInput
+from utils.formatters import TOKEN_BUDGET, format_availability
+from utils.intervals import busy_matrix, free_windows, overlap_pairs
+from utils.recurrence import make_rule
+from utils.solver import Meeting, solve_meetings
+from utils.store import TIMETABLE_COLUMNS
+
+# Conflicts listed by the audit, the total is always counted.
+AUDIT_MAX_PAIRS = 10_000
+# Threads of the availability matrix, NumPy releases the GIL while they search.
+AVAILABILITY_WORKERS = min(os.cpu_count() or 1, 8)
+
+
+def __busy(
+    backend: TimetableBackend,
+    person_requested,
+    room_requested,
     datetime_start_requested: datetime.datetime,
     datetime_end_requested: datetime.datetime,
-):
-    timetable_df["intersection"] = timetable_df.apply(
-        lambda row: DateTimeRange(
-            row["datetime_start"], row["datetime_end"]
-        ).is_intersection(
-            DateTimeRange(datetime_start_requested, datetime_end_requested)
-        ),
-        axis=1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Schedules of the requested person and of the requested room in the time
+    range, each in any room or with any person.
+
+    A person is unavailable when booked in another room, and a room when booked
+    by another person, so the two are not filtered by each other.
+    """
+    person_busy_df = backend.query(
+        person_requested, None, datetime_start_requested, datetime_end_requested
     )
-    return timetable_df[timetable_df["intersection"]].sort_values(
-        ["datetime_start", "datetime_end"]
+    if not person_requested and not room_requested:
+        return person_busy_df, person_busy_df
+    room_busy_df = backend.query(
+        None, room_requested, datetime_start_requested, datetime_end_requested
     )
+    return person_busy_df, room_busy_df
 
 
+@metrics.instrumented
 def get_availability(
     person_requested=None,
     datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     datetime_end_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     room_requested=None,
+    token_budget=TOKEN_BUDGET,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-    timetable_df["initial_prompt_person"] = "- " + timetable_df["person"]
-    timetable_df["initial_prompt_room"] = "- " + "Room " + timetable_df["room"]
-    initial_prompt = (
-        "List of person in the Timetable are: \n```\n"
-        + "\n".join(timetable_df["initial_prompt_person"].sort_values().unique())
-        + "\n```\n\nList of room in the Timetable are: \n```\n"
-        + "\n".join(timetable_df["initial_prompt_room"].sort_values().unique())
+    backend = get_backend() if backend is None else backend
+    person_busy_df, room_busy_df = __busy(
+        backend,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
     )
 
-    if person_requested:
-        timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
-    if room_requested:
-        timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
-
-    timetable_intersect_df = __filter_intersection(
-        timetable_df, datetime_start_requested, datetime_end_requested
+    return format_availability(
+        backend.list_persons(),
+        backend.list_rooms(),
+        person_busy_df.astype({"person": str, "room": str}),
+        room_busy_df.astype({"person": str, "room": str}),
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        token_budget,
     )
-    timetable_intersect_df["prompt"] = (
-        "-- "
-        + timetable_intersect_df["datetime_start"].dt.strftime("%H:%M:%S")
-        + " to "
-        + timetable_intersect_df["datetime_end"].dt.strftime("%H:%M:%S")
+
+
+@metrics.instrumented
+def get_availability_json(
+    person_requested=None,
+    datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
+    datetime_end_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
+    room_requested=None,
+    backend: Optional[TimetableBackend] = None,
+):
+    """Availability as lists of names.
+
+    ``list_person_unavailable`` holds the requested person, or any person when
+    none is requested, booked in any room during the time range, and
+    ``list_room_unavailable`` the requested rooms, or any room, booked by
+    anyone. The two are not filtered by each other.
+    """
+    backend = get_backend() if backend is None else backend
+    list_all_person = backend.list_persons()
+    list_all_room = backend.list_rooms()
+
+    person_busy_df, room_busy_df = __busy(
+        backend,
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
     )
 
-    person = (
-        timetable_intersect_df[["person", "prompt"]]
-        .groupby(["person"], as_index=False)
-        .agg({"prompt": "\n".join})
+    list_person_unavailable = sorted(person_busy_df["person"].unique())
+    list_room_unavailable = sorted(room_busy_df["room"].unique())
+
+    return {
+        "list_all_person": list_all_person,
+        "list_all_room": list_all_room,
+        "list_person_unavailable": list_person_unavailable,
+        "list_room_unavailable": list_room_unavailable,
+    }
+
+
+@metrics.instrumented
+def get_availability_matrix(
+    instance_type: str,
+    names_requested: Optional[list[str]],
+    window_starts_requested: list[datetime.datetime],
+    window_ends_requested: list[datetime.datetime],
+    workers: int = AVAILABILITY_WORKERS,
+    backend: Optional[TimetableBackend] = None,
+) -> pd.DataFrame:
+    """Which person or room is free during each window, all answered at once.
+
+    One backend query loads the busy time of the requested names, or of every
+    person or room, over all windows. Returns a boolean frame with one row per
+    name and one column per window, True when the name is free for the whole
+    window.
+    """
+    if len(window_starts_requested) != len(window_ends_requested):
+        raise ValueError("every window needs a start and an end")
+    for window_start, window_end in zip(window_starts_requested, window_ends_requested):
+        if window_start > window_end:
+            raise ValueError(f"time inversion found: {window_start} > {window_end}")
+    backend = get_backend() if backend is None else backend
+    if names_requested:
+        names = list(dict.fromkeys(names_requested))
+    elif instance_type == "person":
+        names = backend.list_persons()
+    else:
+        names = backend.list_rooms()
+    windows = pd.IntervalIndex.from_arrays(
+        pd.to_datetime(window_starts_requested),
+        pd.to_datetime(window_ends_requested),
+        closed="both",
     )
-    person["prompt_person"] = (
-        "- " + person["person"] + " is unavailable/occupied from: \n" + person["prompt"]
+    if len(names) == 0 or len(windows) == 0:
+        return pd.DataFrame(index=pd.Index(names), columns=windows, dtype=bool)
+
+    busy_df = backend.query(
+        names if instance_type == "person" else None,
+        names if instance_type != "person" else None,
+        windows.left.min(),
+        windows.right.max(),
     )
-    room = (
-        timetable_intersect_df[["room", "prompt"]]
-        .groupby(["room"], as_index=False)
-        .agg({"prompt": "\n".join})
+    busy = busy_matrix(
+        busy_df[instance_type],
+        busy_df["datetime_start"],
+        busy_df["datetime_end"],
+        names,
+        windows.left,
+        windows.right,
+        workers,
     )
-    room["prompt_room"] = "- " + "Room " + room["room"] + " is unavailable/occupied."
+    return pd.DataFrame(~busy, index=pd.Index(names), columns=windows)
+
 
+def working_hours_from(
+    working_hour_start_requested: Optional[datetime.time],
+    working_hour_end_requested: Optional[datetime.time],
+):
+    """Working hours for ``find_free_slots``, ``None`` when neither bound is given."""
+    if working_hour_start_requested is None and working_hour_end_requested is None:
+        return None
     return (
-        initial_prompt
-        + "\n```\n\nPerson inavailability based on user requested time range are specified below:\n\n```\n"
-        + "\n".join(person["prompt_person"].sort_values().unique())
-        + "\n```\n\nRoom inavailability based on user requested time range are specified below:\n\n```\n"
-        + "\n".join(room["prompt_room"].sort_values().unique())
-        + "\n```\n"
+        working_hour_start_requested or datetime.time(0, 0, 0),
+        working_hour_end_requested or datetime.time(23, 59, 59),
     )
 
 
-def get_availability_json(
+def slot_windows(
+    datetime_start_requested: datetime.datetime,
+    datetime_end_requested: datetime.datetime,
+    slot_requested: datetime.timedelta,
+    working_hours_requested=None,
+) -> tuple[pd.DatetimeIndex, pd.DatetimeIndex]:
+    """Consecutive slots of the requested range, within the working hours."""
+    if slot_requested <= datetime.timedelta(0):
+        raise ValueError(f"slot must be positive, got {slot_requested}")
+    starts = pd.date_range(
+        datetime_start_requested,
+        pd.Timestamp(datetime_end_requested) - slot_requested,
+        freq=slot_requested,
+    )
+    ends = starts + slot_requested
+    if working_hours_requested is not None:
+        work_start, work_end = working_hours_requested
+        inside = (
+            (starts.time >= work_start)
+            & (ends.time <= work_end)
+            & (starts.normalize() == ends.normalize())
+        )
+        starts, ends = starts[inside], ends[inside]
+    return starts, ends
+
+
+@metrics.instrumented
+def find_free_slots(
     person_requested=None,
+    room_requested=None,
     datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     datetime_end_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
-    room_requested=None,
+    duration_requested=datetime.timedelta(minutes=30),
+    working_hours_requested=None,
+    top_k=5,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-    list_all_person = list(timetable_df["person"].sort_values().unique())
-    list_all_room = list(timetable_df["room"].sort_values().unique())
-
+    backend = get_backend() if backend is None else backend
+    busy_frames = []
     if person_requested:
-        timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
+        busy_frames.append(
+            backend.query(
+                person_requested, None, datetime_start_requested, datetime_end_requested
+            )
+        )
     if room_requested:
-        timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
-
-    timetable_intersect_df = __filter_intersection(
-        timetable_df, datetime_start_requested, datetime_end_requested
+        busy_frames.append(
+            backend.query(
+                None, room_requested, datetime_start_requested, datetime_end_requested
+            )
+        )
+    # Without person or room nothing is busy, the whole range is free.
+    busy_df = (
+        pd.concat(busy_frames)
+        if busy_frames
+        else pd.DataFrame(columns=TIMETABLE_COLUMNS).astype(
+            {"datetime_start": "datetime64[ns]", "datetime_end": "datetime64[ns]"}
+        )
     )
-
-    list_person_unavailable = list(
-        timetable_intersect_df["person"].sort_values().unique()
+    return free_windows(
+        busy_df["datetime_start"],
+        busy_df["datetime_end"],
+        datetime_start_requested,
+        datetime_end_requested,
+        duration_requested,
+        working_hours_requested,
+        top_k,
     )
-    list_room_unavailable = list(timetable_intersect_df["room"].sort_values().unique())
 
-    return {
-        "list_all_person": list_all_person,
-        "list_all_room": list_all_room,
-        "list_person_unavailable": list_person_unavailable,
-        "list_room_unavailable": list_room_unavailable,
-    }
+
+@metrics.instrumented
+def solve_timetable(
+    meetings_requested: list[TimetableMeetingInput],
+    working_hours_requested=None,
+    step_requested=datetime.timedelta(minutes=15),
+    workers: Optional[int] = None,
+    backend: Optional[TimetableBackend] = None,
+):
+    """Conflict-free start, end and room of each meeting, nothing is written.
+
+    Returns the placed meetings indexed by their position in the request and
+    the positions of the meetings that could not be placed.
+    """
+    meetings = []
+    for meeting in meetings_requested:
+        if meeting.datetime_start_requested > meeting.datetime_end_requested:
+            raise ValueError(
+                f"time inversion found: {meeting.datetime_start_requested} > "
+                f"{meeting.datetime_end_requested}"
+            )
+        if not meeting.person_requested or not meeting.room_requested:
+            raise ValueError("every meeting needs at least one person and one room")
+        if meeting.duration_minutes_requested < 1:
+            raise ValueError(
+                f"duration must be at least 1 minute, got {meeting.duration_minutes_requested}"
+            )
+        meetings.append(
+            Meeting(
+                tuple(meeting.person_requested),
+                tuple(meeting.room_requested),
+                datetime.timedelta(minutes=meeting.duration_minutes_requested),
+                meeting.datetime_start_requested,
+                meeting.datetime_end_requested,
+            )
+        )
+    if len(meetings) == 0:
+        return solve_meetings([], pd.DataFrame(columns=TIMETABLE_COLUMNS))
+
+    backend = get_backend() if backend is None else backend
+    datetime_start = min(meeting.datetime_start for meeting in meetings)
+    datetime_end = max(meeting.datetime_end for meeting in meetings)
+    busy_df = pd.concat(
+        [
+            backend.query(
+                sorted({person for meeting in meetings for person in meeting.persons}),
+                None,
+                datetime_start,
+                datetime_end,
+            ),
+            backend.query(
+                None,
+                sorted({room for meeting in meetings for room in meeting.rooms}),
+                datetime_start,
+                datetime_end,
+            ),
+        ]
+    )
+    return solve_meetings(
+        meetings, busy_df, working_hours_requested, step_requested, workers
+    )
 
 
+@metrics.instrumented
 def get_timetable(
     person_requested=None,
     datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     datetime_end_requested=datetime.datetime(9999, 1, 1, 0, 0, 0),
     room_requested=None,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-    if person_requested:
-        timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
-    if room_requested:
-        timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
-
-    timetable_df = (
-        __filter_intersection(
-            timetable_df, datetime_start_requested, datetime_end_requested
-        )
-        if len(timetable_df) > 0
-        else timetable_df
+    backend = get_backend() if backend is None else backend
+    return backend.query(
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
     )
-    return timetable_df
 
 
+@metrics.instrumented
 def post_timetable(
     person_requested: str,
     datetime_start_requested: datetime.datetime,
     datetime_end_requested: datetime.datetime,
     room_requested: str,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-    timetable_df_person_filtered = timetable_df[
-        timetable_df["person"] == person_requested
-    ]
-    timetable_df_room_filtered = timetable_df[timetable_df["room"] == room_requested]
-
-    person_intersection_check = (
-        __filter_intersection(
-            timetable_df_person_filtered,
-            datetime_start_requested,
-            datetime_end_requested,
-        )
-        if len(timetable_df_person_filtered) > 0
-        else pd.DataFrame()
-    )
-    room_intersection_check = (
-        __filter_intersection(
-            timetable_df_room_filtered,
-            datetime_start_requested,
-            datetime_end_requested,
+    if datetime_start_requested > datetime_end_requested:
+        raise ValueError(
+            f"time inversion found: {datetime_start_requested} > {datetime_end_requested}"
         )
-        if len(timetable_df_room_filtered) > 0
-        else pd.DataFrame()
-    )
-
-    if len(person_intersection_check) > 0 or len(room_intersection_check) > 0:
+    backend = get_backend() if backend is None else backend
+    if not backend.post(
+        person_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        room_requested,
+    ):
         return "Cannot add requested schedule, there will be conflict in the Timetable"
 
-    timetable_df.loc[len(timetable_df)] = {
-        "person": person_requested,
-        "datetime_start": datetime_start_requested,
-        "datetime_end": datetime_end_requested,
-        "room": room_requested,
-    }
-    st.session_state["timetable"] = timetable_df
     return "New schedule successfuly added to the Timetable"
 
 
+@metrics.instrumented
+def post_timetable_recurring(
+    person_requested: str,
+    datetime_start_requested: datetime.datetime,
+    datetime_end_requested: datetime.datetime,
+    room_requested: str,
+    frequency_requested: str,
+    interval_requested: int,
+    datetime_until_requested: datetime.datetime,
+    backend: Optional[TimetableBackend] = None,
+):
+    rule_df = make_rule(
+        person_requested,
+        datetime_start_requested,
+        datetime_end_requested,
+        room_requested,
+        frequency_requested,
+        interval_requested,
+        datetime_until_requested,
+    )
+    backend = get_backend() if backend is None else backend
+    if not backend.post_rule(rule_df):
+        return "Cannot add requested recurring schedule, there will be conflict in the Timetable"
+
+    rule = rule_df.iloc[0]
+    last_start = rule["datetime_start"] + rule["period"] * (rule["count"] - 1)
+    return (
+        f"New recurring schedule successfuly added to the Timetable: {rule['count']} "
+        f"occurrences from {rule['datetime_start']:%Y-%m-%d %H:%M} to "
+        f"{last_start:%Y-%m-%d %H:%M}"
+    )
+
+
+def post_timetable_batch(
+    schedules_requested: list[TimetablePostInput],
+    backend: Optional[TimetableBackend] = None,
+):
+    return post_timetable_batch_result(schedules_requested, backend)[1]
+
+
+@metrics.instrumented
+def post_timetable_batch_result(
+    schedules_requested: list[TimetablePostInput],
+    backend: Optional[TimetableBackend] = None,
+) -> tuple[bool, str]:
+    """Add all schedules or none, return whether they were added and the status
+    of each schedule.
+    """
+    if len(schedules_requested) == 0:
+        return True, "No schedule to be added"
+    backend = get_backend() if backend is None else backend
+
+    batch_df = pd.DataFrame(
+        {
+            "person": [schedule.person_requested for schedule in schedules_requested],
+            "datetime_start": pd.to_datetime(
+                [schedule.datetime_start_requested for schedule in schedules_requested]
+            ),
+            "datetime_end": pd.to_datetime(
+                [schedule.datetime_end_requested for schedule in schedules_requested]
+            ),
+            "room": [schedule.room_requested for schedule in schedules_requested],
+        }
+    )
+    invalid = (batch_df["datetime_start"] > batch_df["datetime_end"]).to_numpy()
+    person_conflict = np.zeros(len(batch_df), dtype=bool)
+    room_conflict = np.zeros(len(batch_df), dtype=bool)
+    if not invalid.all():
+        (
+            person_conflict[~invalid],
+            room_conflict[~invalid],
+        ) = backend.post_batch(batch_df[~invalid], commit=not invalid.any())
+
+    report = []
+    for number, (
+        schedule,
+        is_invalid,
+        is_person_conflict,
+        is_room_conflict,
+    ) in enumerate(
+        zip(schedules_requested, invalid, person_conflict, room_conflict), start=1
+    ):
+        if is_invalid:
+            status = "invalid time range"
+        elif is_person_conflict and is_room_conflict:
+            status = "person and room conflict"
+        elif is_person_conflict:
+            status = "person conflict"
+        elif is_room_conflict:
+            status = "room conflict"
+        else:
+            status = "ok"
+        report.append(
+            f"{number}. {schedule.person_requested}, Room {schedule.room_requested}, "
+            f"{schedule.datetime_start_requested:%Y-%m-%d %H:%M} to "
+            f"{schedule.datetime_end_requested:%Y-%m-%d %H:%M}: {status}"
+        )
+
+    if invalid.any() or person_conflict.any() or room_conflict.any():
+        return False, (
+            "Cannot add requested schedules, there will be conflict in the Timetable. "
+            "No schedule was added:\n" + "\n".join(report)
+        )
+
+    return True, (
+        f"{len(batch_df)} new schedules successfuly added to the Timetable:\n"
+        + "\n".join(report)
+    )
+
+
+@metrics.instrumented
 def delete_timetable(
     person_requested=None,
     datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     datetime_end_requested=datetime.datetime(9999, 1, 1, 0, 0, 0),
     room_requested=None,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-    if person_requested:
-        timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
-    if room_requested:
-        timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
-
-    timetable_df = __filter_intersection(
-        timetable_df, datetime_start_requested, datetime_end_requested
+    backend = get_backend() if backend is None else backend
+    deleted = backend.delete(
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
     )
-    print(datetime_start_requested, datetime_end_requested)
+    metrics.add(rows_matched=deleted)
 
-    if len(timetable_df) == 0:
+    if deleted == 0:
         return "No entries to be deleted"
 
-    st.session_state["timetable"].drop(list(timetable_df.index), inplace=True)
     return "Sucessfully deleted entries"
 
 
+@metrics.instrumented
 def get_conflict_status(
     person_requested=None,
     datetime_start_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     datetime_end_requested=datetime.datetime(1970, 1, 1, 0, 0, 0),
     room_requested=None,
+    backend: Optional[TimetableBackend] = None,
 ):
-    timetable_df = st.session_state["timetable"]
-
-    if person_requested:
-        timetable_df = timetable_df[timetable_df["person"].isin(person_requested)]
-    if room_requested:
-        timetable_df = timetable_df[timetable_df["room"].isin(room_requested)]
-
-    timetable_df = __filter_intersection(
-        timetable_df, datetime_start_requested, datetime_end_requested
+    backend = get_backend() if backend is None else backend
+    timetable_df = backend.query(
+        person_requested,
+        room_requested,
+        datetime_start_requested,
+        datetime_end_requested,
     )
 
     return (
@@ -223,3 +507,57 @@ def get_conflict_status(
         if (len(timetable_df) > 0)
         else "There is no conflict in the timetable"
     )
+
+
+@metrics.instrumented
+def audit_timetable(
+    max_pairs: Optional[int] = AUDIT_MAX_PAIRS,
+    backend: Optional[TimetableBackend] = None,
+):
+    """Every pair of stored rows sharing a person or a room at the same time.
+
+    Recurring schedules are checked against the rows when they are added, so
+    the audit covers the stored rows, e.g. an uploaded file. Returns at most
+    ``max_pairs`` conflicts, one row per pair with its resource, the two row
+    ids and the overlapping time, the total number of conflicting pairs and
+    the number of rows checked.
+    """
+    backend = get_backend() if backend is None else backend
+    timetable_df = backend.read()
+    metrics.add(rows_scanned=len(timetable_df))
+
+    conflict_dfs = []
+    total = 0
+    for resource in ("person", "room"):
+        first, second, resource_total = overlap_pairs(
+            timetable_df[resource],
+            timetable_df["datetime_start"],
+            timetable_df["datetime_end"],
+            None if max_pairs is None else max(max_pairs - total, 0),
+        )
+        total += resource_total
+        conflict_dfs.append(
+            pd.DataFrame(
+                {
+                    "resource": resource,
+                    "name": timetable_df[resource].to_numpy()[first],
+                    "row_id": timetable_df.index.to_numpy()[first],
+                    "other_row_id": timetable_df.index.to_numpy()[second],
+                    "datetime_start": np.maximum(
+                        timetable_df["datetime_start"].to_numpy()[first],
+                        timetable_df["datetime_start"].to_numpy()[second],
+                    ),
+                    "datetime_end": np.minimum(
+                        timetable_df["datetime_end"].to_numpy()[first],
+                        timetable_df["datetime_end"].to_numpy()[second],
+                    ),
+                }
+            )
+        )
+    conflicts_df = pd.concat(conflict_dfs, ignore_index=True)
+    metrics.add(rows_matched=total)
+    return (
+        conflicts_df.sort_values("datetime_start", kind="stable"),
+        total,
+        len(timetable_df),
+    )
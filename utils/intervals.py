@@ -0,0 +1,467 @@
+import bisect
+import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+def to_epoch_ns(values) -> np.ndarray:
+    """Convert datetimes (scalar, Series or array) to int64 nanoseconds since epoch."""
+    if isinstance(values, (datetime.datetime, pd.Timestamp, np.datetime64, str)):
+        timestamp = pd.Timestamp(values)
+        try:
+            return np.int64(timestamp.value)
+        except OverflowError:
+            # Sentinels such as datetime(9999, 1, 1) fall outside the
+            # nanosecond range; saturate instead of failing (min is NaT).
+            if timestamp > pd.Timestamp.max:
+                return np.iinfo(np.int64).max
+            return np.iinfo(np.int64).min + 1
+    if isinstance(values, pd.Series):
+        values = values.to_numpy()
+    return np.asarray(values, dtype="datetime64[ns]").view("i8")
+
+
+def overlap_mask(
+    starts,
+    ends,
+    datetime_start_requested,
+    datetime_end_requested,
+) -> np.ndarray:
+    """Boolean mask of the intervals that intersect the requested range.
+
+    Matches ``DateTimeRange.is_intersection``: both ranges are closed, so
+    intervals that only touch at an endpoint are considered intersecting,
+    and an inverted range raises ``ValueError``.
+    """
+    starts = to_epoch_ns(starts)
+    ends = to_epoch_ns(ends)
+    start_requested = to_epoch_ns(datetime_start_requested)
+    end_requested = to_epoch_ns(datetime_end_requested)
+
+    if start_requested > end_requested:
+        raise ValueError(
+            f"time inversion found: {datetime_start_requested} > {datetime_end_requested}"
+        )
+    if np.any(starts > ends):
+        raise ValueError("time inversion found in the Timetable")
+
+    return (starts <= end_requested) & (ends >= start_requested)
+
+
+def sweep_overlap_mask(keys, starts, ends) -> np.ndarray:
+    """Mark every interval that intersects another interval with the same key.
+
+    Intervals are sorted by (key, start) once; an interval overlaps an earlier
+    one iff its start is not after the running maximum of the earlier ends,
+    and overlaps a later one iff its end is not before the next start.
+    """
+    codes, _ = pd.factorize(keys, use_na_sentinel=False)
+    starts = to_epoch_ns(starts)
+    ends = to_epoch_ns(ends)
+    if len(codes) == 0:
+        return np.zeros(0, dtype=bool)
+
+    order = np.lexsort((starts, codes))
+    codes = codes[order]
+    starts = starts[order]
+    ends = ends[order]
+    group_start = np.r_[True, codes[1:] != codes[:-1]]
+    group_end = np.r_[group_start[1:], True]
+
+    running_end = pd.Series(ends).groupby(codes).cummax().to_numpy()
+    previous_end = np.r_[running_end[0], running_end[:-1]]
+    next_start = np.r_[starts[1:], starts[-1]]
+    overlap = (~group_start & (starts <= previous_end)) | (
+        ~group_end & (ends >= next_start)
+    )
+
+    mask = np.empty_like(overlap)
+    mask[order] = overlap
+    return mask
+
+
+def overlap_pairs(
+    keys, starts, ends, max_pairs: Optional[int] = None
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """Positions of every pair of intervals with the same key that intersect.
+
+    Intervals are sorted by (key, start) once; interval ``i`` intersects each
+    later interval of its key starting at or before its end, and those form a
+    contiguous run found with one ``searchsorted``. That is O(n log n) plus the
+    number of pairs. Returns the first and second positions of at most
+    ``max_pairs`` pairs, in key and start order, and the total number of pairs.
+    """
+    codes, _ = pd.factorize(keys, use_na_sentinel=False)
+    starts = to_epoch_ns(starts)
+    ends = to_epoch_ns(ends)
+    n = len(codes)
+    if n == 0:
+        return np.zeros(0, dtype="int64"), np.zeros(0, dtype="int64"), 0
+
+    order = np.lexsort((starts, codes))
+    codes = codes[order].astype("int64")
+    # Times are replaced by their rank so that (key, time) fits in one int64.
+    times, ranks = np.unique(
+        np.concatenate((starts[order], ends[order])), return_inverse=True
+    )
+    start_keys = codes * len(times) + ranks[:n]
+    end_keys = codes * len(times) + ranks[n:]
+    run_end = np.searchsorted(start_keys, end_keys, side="right")
+    counts = np.maximum(run_end - np.arange(n) - 1, 0)
+
+    total = int(counts.sum())
+    if max_pairs is not None and total > max_pairs:
+        kept = np.cumsum(counts)
+        counts = np.clip(max_pairs - (kept - counts), 0, counts)
+    first = np.repeat(np.arange(n), counts)
+    second = (
+        first
+        + 1
+        + np.arange(len(first))
+        - np.repeat(np.cumsum(counts) - counts, counts)
+    )
+    return order[first], order[second], total
+
+
+def merge_intervals(keys, starts, ends) -> pd.DataFrame:
+    """Merge overlapping or touching intervals of the same key.
+
+    Returns one row per merged block with its key, start, end and the number of
+    intervals it covers, sorted by key and start.
+    """
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    starts = to_epoch_ns(starts)
+    ends = to_epoch_ns(ends)
+    if len(codes) == 0:
+        return pd.DataFrame(
+            {
+                "key": pd.Series(dtype=object),
+                "datetime_start": pd.Series(dtype="datetime64[ns]"),
+                "datetime_end": pd.Series(dtype="datetime64[ns]"),
+                "count": pd.Series(dtype="int64"),
+            }
+        )
+
+    order = np.lexsort((starts, codes))
+    codes = codes[order]
+    starts = starts[order]
+    ends = ends[order]
+    running_end = pd.Series(ends).groupby(codes).cummax().to_numpy()
+    new_block = np.r_[True, (codes[1:] != codes[:-1]) | (starts[1:] > running_end[:-1])]
+    block = np.cumsum(new_block) - 1
+
+    block_end = np.maximum.reduceat(ends, np.flatnonzero(new_block))
+    return pd.DataFrame(
+        {
+            "key": np.asarray(uniques, dtype=object)[codes[new_block]],
+            "datetime_start": starts[new_block].view("datetime64[ns]"),
+            "datetime_end": block_end.view("datetime64[ns]"),
+            "count": np.bincount(block),
+        }
+    )
+
+
+def batch_overlap_masks(
+    batch_df: pd.DataFrame, existing_df: pd.DataFrame
+) -> tuple[np.ndarray, np.ndarray]:
+    """Person and room conflict masks of ``batch_df`` against itself and ``existing_df``."""
+    sweep_df = pd.concat([batch_df, existing_df], ignore_index=True)
+    person_conflict = sweep_overlap_mask(
+        sweep_df["person"], sweep_df["datetime_start"], sweep_df["datetime_end"]
+    )
+    room_conflict = sweep_overlap_mask(
+        sweep_df["room"], sweep_df["datetime_start"], sweep_df["datetime_end"]
+    )
+    return person_conflict[: len(batch_df)], room_conflict[: len(batch_df)]
+
+
+def conflict_mask(timetable_df: pd.DataFrame) -> np.ndarray:
+    """Rows overlapping another row of the same person or room."""
+    return sweep_overlap_mask(
+        timetable_df["person"],
+        timetable_df["datetime_start"],
+        timetable_df["datetime_end"],
+    ) | sweep_overlap_mask(
+        timetable_df["room"],
+        timetable_df["datetime_start"],
+        timetable_df["datetime_end"],
+    )
+
+
+def free_windows(
+    starts,
+    ends,
+    datetime_start_requested,
+    datetime_end_requested,
+    duration: datetime.timedelta,
+    working_hours: Optional[tuple[datetime.time, datetime.time]] = None,
+    top_k: Optional[int] = None,
+    resolution: datetime.timedelta = datetime.timedelta(minutes=1),
+) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """Earliest free windows of at least ``duration`` between the busy intervals.
+
+    Busy intervals are closed, so a window starts one ``resolution`` after a busy
+    interval ends and finishes one ``resolution`` before the next one starts;
+    any slot inside a returned window can be posted without conflict. Time
+    outside ``working_hours`` is blocked on every day of the requested range.
+    """
+    window_start = int(to_epoch_ns(datetime_start_requested))
+    window_end = int(to_epoch_ns(datetime_end_requested))
+    duration_ns = int(pd.Timedelta(duration).value)
+    resolution_ns = int(pd.Timedelta(resolution).value)
+    if window_start > window_end:
+        raise ValueError(
+            f"time inversion found: {datetime_start_requested} > {datetime_end_requested}"
+        )
+
+    blocked_starts = [to_epoch_ns(starts) - resolution_ns]
+    blocked_ends = [to_epoch_ns(ends) + resolution_ns]
+    if working_hours is not None:
+        day_ns = int(pd.Timedelta(days=1).value)
+        days = np.arange(
+            window_start // day_ns * day_ns - day_ns, window_end + day_ns, day_ns
+        )
+        work_start, work_end = (
+            int(
+                pd.Timedelta(
+                    hours=hour.hour, minutes=hour.minute, seconds=hour.second
+                ).value
+            )
+            for hour in working_hours
+        )
+        blocked_starts.append(days + work_end)
+        blocked_ends.append(days + day_ns + work_start)
+
+    blocked_starts = np.concatenate(blocked_starts)
+    blocked_ends = np.concatenate(blocked_ends)
+    order = np.argsort(blocked_starts, kind="stable")
+    blocked_starts = blocked_starts[order]
+    blocked_ends = np.maximum.accumulate(blocked_ends[order])
+
+    # Gaps between consecutive blocked intervals, plus both ends of the window.
+    gap_starts = np.r_[window_start, blocked_ends]
+    gap_ends = np.r_[blocked_starts, window_end]
+    gap_starts = np.maximum(gap_starts, window_start)
+    gap_ends = np.minimum(gap_ends, window_end)
+    feasible = np.flatnonzero(gap_ends - gap_starts >= duration_ns)
+    if top_k is not None:
+        feasible = feasible[:top_k]
+
+    return [(pd.Timestamp(gap_starts[i]), pd.Timestamp(gap_ends[i])) for i in feasible]
+
+
+def _busy_block(start_keys, running_ends, first, query_keys, window_starts):
+    """Busy flags of one block of resources, see ``busy_matrix``."""
+    if len(start_keys) == 0:
+        return np.zeros(len(query_keys), dtype=bool)
+    position = np.searchsorted(start_keys, query_keys, side="right") - 1
+    return (position >= first) & (
+        running_ends[np.maximum(position, 0)] >= window_starts
+    )
+
+
+def busy_matrix(
+    keys,
+    starts,
+    ends,
+    names: list,
+    window_starts,
+    window_ends,
+    workers: int = 1,
+    executor: str = "thread",
+) -> np.ndarray:
+    """Whether each of ``names`` has an interval intersecting each window.
+
+    Intervals are sorted by (key, start) with the running maximum of the ends
+    of each key. Resource ``r`` is busy during ``[a, b]`` iff its last interval
+    starting at or before ``b`` has a running end at or after ``a``, one
+    ``searchsorted`` for the whole matrix. Names are split into contiguous
+    blocks of the sorted arrays, evaluated by ``workers`` threads (NumPy
+    releases the GIL) or processes, each receiving only its own block.
+    Returns a boolean array of shape ``(len(names), len(windows))``.
+    """
+    codes = pd.Categorical(keys, categories=names).codes.astype("int64")
+    starts = to_epoch_ns(starts)[codes >= 0]
+    ends = to_epoch_ns(ends)[codes >= 0]
+    codes = codes[codes >= 0]
+    window_starts = to_epoch_ns(window_starts)
+    window_ends = to_epoch_ns(window_ends)
+    n_name, n_window = len(names), len(window_starts)
+
+    order = np.lexsort((starts, codes))
+    codes = codes[order]
+    running_ends = pd.Series(ends[order]).groupby(codes).cummax().to_numpy()
+    # Times are replaced by their rank so that (key, time) fits in one int64.
+    times, ranks = np.unique(
+        np.concatenate((starts[order], window_ends)), return_inverse=True
+    )
+    start_keys = codes * len(times) + ranks[: len(codes)]
+    window_ranks = ranks[len(codes) :]
+    group_starts = np.searchsorted(codes, np.arange(n_name + 1))
+
+    blocks = np.array_split(np.arange(n_name), max(1, min(workers, n_name)))
+    jobs = []
+    for block in blocks:
+        if len(block) == 0:
+            continue
+        lo, hi = group_starts[block[0]], group_starts[block[-1] + 1]
+        jobs.append(
+            (
+                start_keys[lo:hi],
+                running_ends[lo:hi],
+                np.repeat(group_starts[block] - lo, n_window),
+                (block[:, None] * len(times) + window_ranks).ravel(),
+                np.tile(window_starts, len(block)),
+            )
+        )
+
+    if workers > 1 and len(jobs) > 1:
+        pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool(len(jobs)) as pool_executor:
+            busy = list(pool_executor.map(_busy_block, *zip(*jobs)))
+    else:
+        busy = [_busy_block(*job) for job in jobs]
+    if not busy:
+        return np.zeros((n_name, n_window), dtype=bool)
+    return np.concatenate(busy).reshape(n_name, n_window)
+
+
+class ResourceIntervalIndex:
+    """Per-resource intervals kept sorted by start for bisect-based overlap checks.
+
+    Each resource also tracks its longest interval, so an overlap query only has
+    to look at the intervals starting in
+    ``[start_requested - longest, end_requested]``.
+    """
+
+    def __init__(self):
+        self._starts: dict = {}
+        self._entries: dict = {}
+        self._longest: dict = {}
+
+    @classmethod
+    def from_arrays(cls, keys, starts, ends, row_ids):
+        index = cls()
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+        order = np.lexsort((to_epoch_ns(starts), codes))
+        codes = codes[order]
+        starts = to_epoch_ns(starts)[order]
+        ends = to_epoch_ns(ends)[order]
+        row_ids = np.asarray(row_ids)[order]
+
+        boundaries = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        for lo, hi in zip(
+            np.concatenate(([0], boundaries)),
+            np.concatenate((boundaries, [len(codes)])),
+        ):
+            if lo == hi:
+                continue
+            key = uniques[codes[lo]]
+            index._starts[key] = starts[lo:hi].tolist()
+            index._entries[key] = list(
+                zip(
+                    starts[lo:hi].tolist(),
+                    ends[lo:hi].tolist(),
+                    row_ids[lo:hi].tolist(),
+                )
+            )
+            index._longest[key] = int((ends[lo:hi] - starts[lo:hi]).max())
+        return index
+
+    def overlaps(self, key, datetime_start_requested, datetime_end_requested) -> list:
+        """Row ids of the intervals of ``key`` intersecting the requested range."""
+        starts = self._starts.get(key)
+        if not starts:
+            return []
+        start_requested = int(to_epoch_ns(datetime_start_requested))
+        end_requested = int(to_epoch_ns(datetime_end_requested))
+
+        lo = bisect.bisect_left(starts, start_requested - self._longest[key])
+        hi = bisect.bisect_right(starts, end_requested)
+        return [
+            row_id
+            for _, end, row_id in self._entries[key][lo:hi]
+            if end >= start_requested
+        ]
+
+    def overlap_end(self, key, start_requested: int, end_requested: int):
+        """Latest end (epoch ns) of the intervals of ``key`` intersecting the range, or ``None``."""
+        starts = self._starts.get(key)
+        if not starts:
+            return None
+        lo = bisect.bisect_left(starts, start_requested - self._longest[key])
+        hi = bisect.bisect_right(starts, end_requested)
+        return max(
+            (end for _, end, _ in self._entries[key][lo:hi] if end >= start_requested),
+            default=None,
+        )
+
+    def has_overlap(
+        self, key, datetime_start_requested, datetime_end_requested
+    ) -> bool:
+        return (
+            len(self.overlaps(key, datetime_start_requested, datetime_end_requested))
+            > 0
+        )
+
+    def insert(self, key, datetime_start, datetime_end, row_id):
+        start = int(to_epoch_ns(datetime_start))
+        end = int(to_epoch_ns(datetime_end))
+        starts = self._starts.setdefault(key, [])
+        position = bisect.bisect_right(starts, start)
+        starts.insert(position, start)
+        self._entries.setdefault(key, []).insert(position, (start, end, row_id))
+        self._longest[key] = max(self._longest.get(key, 0), end - start)
+
+    def remove(self, key, datetime_start, row_id):
+        starts = self._starts.get(key)
+        if not starts:
+            return
+        start = int(to_epoch_ns(datetime_start))
+        entries = self._entries[key]
+        position = bisect.bisect_left(starts, start)
+        while position < len(starts) and starts[position] == start:
+            if entries[position][2] == row_id:
+                del starts[position]
+                del entries[position]
+                return
+            position += 1
+
+
+class TimetableIndex:
+    """Person and room interval indexes for one timetable DataFrame."""
+
+    def __init__(self, timetable_df: pd.DataFrame):
+        self.source = timetable_df
+        self.person = ResourceIntervalIndex.from_arrays(
+            timetable_df["person"],
+            timetable_df["datetime_start"],
+            timetable_df["datetime_end"],
+            timetable_df.index,
+        )
+        self.room = ResourceIntervalIndex.from_arrays(
+            timetable_df["room"],
+            timetable_df["datetime_start"],
+            timetable_df["datetime_end"],
+            timetable_df.index,
+        )
+
+    def has_conflict(
+        self, person, datetime_start_requested, datetime_end_requested, room
+    ) -> bool:
+        return self.person.has_overlap(
+            person, datetime_start_requested, datetime_end_requested
+        ) or self.room.has_overlap(
+            room, datetime_start_requested, datetime_end_requested
+        )
+
+    def insert(self, person, datetime_start, datetime_end, room, row_id):
+        self.person.insert(person, datetime_start, datetime_end, row_id)
+        self.room.insert(room, datetime_start, datetime_end, row_id)
+
+    def remove(self, person, datetime_start, room, row_id):
+        self.person.remove(person, datetime_start, row_id)
+        self.room.remove(room, datetime_start, row_id)
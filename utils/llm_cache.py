@@ -0,0 +1,164 @@
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, Optional
+
+from langchain.cache import RETURN_VAL_TYPE, BaseCache
+from langchain.load.dump import dumps
+from langchain.load.load import loads
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompt with the whitespace of every message content collapsed.
+
+    Chat models pass the messages serialized as JSON, anything else is
+    normalized as plain text.
+    """
+
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.split())
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [normalize(item) for item in value]
+        return value
+
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return normalize(prompt)
+    return json.dumps(normalize(messages), sort_keys=True)
+
+
+class TimetableLLMCache(BaseCache):
+    """LLM response cache in SQLite, shared by every session and app worker.
+
+    Entries are keyed on the model parameters, the normalized prompt and the
+    stamp returned by ``stamp`` (a hash of the Timetable content), expire after ``ttl``
+    seconds and are evicted least recently used first beyond ``max_entries``
+    or ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        stamp: Callable[[], str] = lambda: "",
+        max_entries: int = 10_000,
+        max_bytes: int = 64 * 2**20,
+        ttl: float = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.stamp = stamp
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS llm_cache_accessed
+                    ON llm_cache (accessed);
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connection(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            yield connection
+        finally:
+            connection.close()
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(
+            "\0".join([llm_string, self.stamp(), normalize_prompt(prompt)]).encode()
+        ).hexdigest()
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT response FROM llm_cache WHERE key = ? AND created >= ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key)
+                )
+        self._count(row is not None)
+        if row is None:
+            return None
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE):
+        response = json.dumps([dumps(generation) for generation in return_val])
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?)",
+                (self._key(prompt, llm_string), response, len(response), now, now),
+            )
+            connection.execute(
+                "DELETE FROM llm_cache WHERE created < ?", (now - self.ttl,)
+            )
+            # Least recently used entries beyond the entry and size limits.
+            connection.execute(
+                """
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT
+                            key,
+                            row_number() OVER recent AS position,
+                            sum(size) OVER recent AS total_size
+                        FROM llm_cache
+                        WINDOW recent AS (ORDER BY accessed DESC)
+                    )
+                    WHERE position > ? OR total_size > ?
+                )
+                """,
+                (self.max_entries, self.max_bytes),
+            )
+            connection.execute("COMMIT")
+
+    def clear(self, **kwargs: Any):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        """Hit and miss counts of this process and the size of the shared cache."""
+        with self._connection() as connection:
+            entries, size = connection.execute(
+                "SELECT count(*), coalesce(sum(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
@@ -0,0 +1,96 @@
+import re
+from typing import Any
+
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.schema import BaseMessage, SystemMessage, get_buffer_string
+
+from utils.formatters import estimate_tokens
+
+
+def shorten(text: str, max_tokens: int) -> str:
+    """``text`` cut to about ``max_tokens``, with a note of how much was left out."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    head = text[: max_tokens * 4].rsplit("\n", 1)[0]
+    return (
+        f"{head}\n[... {estimate_tokens(text) - estimate_tokens(head)} more tokens "
+        "omitted, use the tools again for the details]"
+    )
+
+
+class TimetableMemory(BaseChatMemory):
+    """Chat history bounded to ``max_token_limit`` tokens.
+
+    Each message is cut to ``max_message_tokens`` when saved, which drops the
+    bulk of long answers and tool results. The oldest exchanges beyond the
+    limit are folded into a running summary of one line per exchange. The
+    summary is built locally, so pruning never adds an LLM call to a turn.
+    """
+
+    memory_key: str = "memory"
+    max_token_limit: int = 1500
+    max_message_tokens: int = 300
+    max_summary_tokens: int = 300
+    summary: list[str] = []
+    summarized: int = 0
+
+    @property
+    def memory_variables(self) -> list[str]:
+        return [self.memory_key]
+
+    @property
+    def buffer(self) -> list[BaseMessage]:
+        messages = self.chat_memory.messages
+        if self.summary:
+            omitted = self.summarized - len(self.summary)
+            messages = [
+                SystemMessage(
+                    content="Summary of the earlier conversation:\n"
+                    + (f"({omitted} earlier exchanges omitted)\n" if omitted else "")
+                    + "\n".join(self.summary)
+                ),
+                *messages,
+            ]
+        return messages
+
+    def load_memory_variables(self, inputs: dict[str, Any]) -> dict[str, Any]:
+        if self.return_messages:
+            return {self.memory_key: self.buffer}
+        return {self.memory_key: get_buffer_string(self.buffer)}
+
+    def save_context(self, inputs: dict[str, Any], outputs: dict[str, str]) -> None:
+        input_str, output_str = self._get_input_output(inputs, outputs)
+        self.chat_memory.add_user_message(shorten(input_str, self.max_message_tokens))
+        self.chat_memory.add_ai_message(shorten(output_str, self.max_message_tokens))
+        self.prune()
+
+    def prune(self) -> None:
+        messages = self.chat_memory.messages
+        total = sum(estimate_tokens(message.content) for message in messages)
+        # Whole exchanges only, and always keep the latest one.
+        while len(messages) > 2 and total > self.max_token_limit:
+            human, ai = messages.pop(0), messages.pop(0)
+            total -= estimate_tokens(human.content) + estimate_tokens(ai.content)
+            self.summary.append(
+                f"- User: {self.__gist(human.content, 80)} / "
+                f"AI: {self.__gist(ai.content, 160)}"
+            )
+            self.summarized += 1
+        while sum(estimate_tokens(line) for line in self.summary) > (
+            self.max_summary_tokens
+        ):
+            self.summary.pop(0)
+
+    @staticmethod
+    def __gist(text: str, max_chars: int) -> str:
+        text = " ".join(text.split())
+        # Up to the end of the first sentence, if that is short enough.
+        sentence = re.match(r".+?[.!?](\s|$)", text)
+        if sentence and len(sentence.group(0)) <= max_chars:
+            return sentence.group(0).strip()
+        return text if len(text) <= max_chars else text[: max_chars - 3] + "..."
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary = []
+        self.summarized = 0
@@ -0,0 +1,199 @@
+"""Wall time, rows and tokens of each tool call, agent turn and API request.
+
+Every span is added to the process-wide counters exported by
+``prometheus_text``, which only costs a clock read and a locked dict update.
+A share ``TIMETABLE_METRICS_SAMPLE_RATE`` of the outermost spans, agent turns
+or API requests, is also kept as detailed records: the last
+``RECENT_RECORDS`` in memory for ``jsonl``, and every one appended to
+``TIMETABLE_METRICS_FILE`` when set. Nested spans, e.g. the tool calls of a
+turn, inherit the sampling decision and the trace id of the outermost span,
+so the records of a slow turn can be put back together.
+"""
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+SAMPLE_RATE = float(os.environ.get("TIMETABLE_METRICS_SAMPLE_RATE", "0.1"))
+METRICS_FILE = os.environ.get("TIMETABLE_METRICS_FILE")
+RECENT_RECORDS = 1000
+
+COUNTERS = (
+    "rows_scanned",
+    "rows_matched",
+    "prompt_tokens",
+    "completion_tokens",
+    "llm_calls",
+)
+
+
+class Span:
+    """Measurements of one tool call, agent turn or API request."""
+
+    def __init__(self, kind: str, name: str, trace_id: int, sampled: bool):
+        self.kind = kind
+        self.name = name
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.values = dict.fromkeys(COUNTERS, 0)
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.first_token_seconds: Optional[float] = None
+        self.discarded = False
+
+    def add(self, **values: int):
+        for counter, value in values.items():
+            self.values[counter] += value
+
+    def first_token(self, at: Optional[float] = None):
+        """Note the time to the first streamed token of the answer, once.
+
+        ``at`` is the ``time.perf_counter`` of the token, now by default.
+        """
+        if self.first_token_seconds is None:
+            at = time.perf_counter() if at is None else at
+            self.first_token_seconds = at - self.started
+
+    def discard(self):
+        """Leave the span out of the counters and records when it ends."""
+        self.discarded = True
+
+    def record(self) -> dict:
+        return {
+            "time": time.time(),
+            "kind": self.kind,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "seconds": round(self.seconds, 6),
+            "first_token_seconds": None
+            if self.first_token_seconds is None
+            else round(self.first_token_seconds, 6),
+            **self.values,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "timetable_span", default=None
+)
+_trace_ids = itertools.count(1)
+_lock = threading.Lock()
+# (kind, name) -> [count, seconds, *COUNTERS, first tokens, first token seconds]
+_totals: dict = {}
+_recent: deque = deque(maxlen=RECENT_RECORDS)
+
+
+@contextlib.contextmanager
+def span(kind: str, name: str):
+    """Measure the enclosed block as a ``kind`` span, e.g. "turn" or "tool"."""
+    parent = _current_span.get()
+    if parent is None:
+        current = Span(kind, name, next(_trace_ids), random.random() < SAMPLE_RATE)
+    else:
+        current = Span(kind, name, parent.trace_id, parent.sampled)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - current.started
+        _current_span.reset(token)
+        _finish(current)
+
+
+def _finish(current: Span):
+    if current.discarded:
+        return
+    with _lock:
+        totals = _totals.setdefault(
+            (current.kind, current.name), [0, 0.0] + [0] * len(COUNTERS) + [0, 0.0]
+        )
+        totals[0] += 1
+        totals[1] += current.seconds
+        for position, counter in enumerate(COUNTERS, start=2):
+            totals[position] += current.values[counter]
+        if current.first_token_seconds is not None:
+            totals[-2] += 1
+            totals[-1] += current.first_token_seconds
+        if current.sampled:
+            record = current.record()
+            _recent.append(record)
+            if METRICS_FILE:
+                with open(METRICS_FILE, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+
+
+def add(**values: int):
+    """Add to the counters of the innermost span, nothing outside of one."""
+    current = _current_span.get()
+    if current is not None:
+        current.add(**values)
+
+
+def instrumented(func):
+    """Record each call of ``func`` as a tool span named after it."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with span("tool", func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def prometheus_text() -> str:
+    """Counters of every span name in the Prometheus text exposition format."""
+    with _lock:
+        totals = {key: list(values) for key, values in _totals.items()}
+    lines = []
+    metrics = (
+        [
+            ("calls_total", "counter", "Number of calls", 0),
+            ("seconds_sum", "counter", "Total wall time in seconds", 1),
+        ]
+        + [
+            (
+                f"{counter}_total",
+                "counter",
+                f"Total {counter.replace('_', ' ')}",
+                position,
+            )
+            for position, counter in enumerate(COUNTERS, start=2)
+        ]
+        + [
+            ("first_tokens_total", "counter", "Number of streamed answers", -2),
+            (
+                "first_token_seconds_sum",
+                "counter",
+                "Total time to the first streamed token in seconds",
+                -1,
+            ),
+        ]
+    )
+    for suffix, metric_type, help_text, position in metrics:
+        name = f"timetable_{suffix}"
+        lines.append(f"# HELP {name} {help_text} per span kind and name.")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for (kind, span_name), values in sorted(totals.items()):
+            lines.append(
+                f'{name}{{kind="{kind}",name="{span_name}"}} {values[position]}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def jsonl() -> str:
+    """The recent sampled records, one JSON object per line."""
+    with _lock:
+        records = list(_recent)
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def reset():
+    with _lock:
+        _totals.clear()
+        _recent.clear()
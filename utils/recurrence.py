@@ -0,0 +1,333 @@
+"""Recurring schedules stored as rules and expanded only where they are queried.
+
+A rule is the first occurrence of a schedule (person, start, end, room)
+repeated ``count`` times every ``period``, like an RRULE with a daily or weekly
+frequency, an interval and an until date. Occurrence ``k`` starts at
+``datetime_start + k * period``, every occurrence lasts as long as the first
+one, and intervals are closed like the rest of the Timetable. Occurrences
+returned with the concrete rows get negative row ids, see ``occurrence_ids``.
+"""
+import datetime
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.intervals import to_epoch_ns
+from utils.store import TIMETABLE_COLUMNS
+
+RULE_COLUMNS = [*TIMETABLE_COLUMNS, "period", "count"]
+FREQUENCIES = {
+    "daily": datetime.timedelta(days=1),
+    "weekly": datetime.timedelta(weeks=1),
+}
+
+
+def compact_rules(rules_df: pd.DataFrame) -> pd.DataFrame:
+    return rules_df[RULE_COLUMNS].astype(
+        {
+            "person": object,
+            "datetime_start": "datetime64[ns]",
+            "datetime_end": "datetime64[ns]",
+            "room": object,
+            "period": "timedelta64[ns]",
+            "count": "int64",
+        }
+    )
+
+
+def empty_rules() -> pd.DataFrame:
+    return compact_rules(pd.DataFrame(columns=RULE_COLUMNS))
+
+
+def make_rule(
+    person: str,
+    datetime_start: datetime.datetime,
+    datetime_end: datetime.datetime,
+    room: str,
+    frequency: str,
+    interval: int,
+    datetime_until: datetime.datetime,
+) -> pd.DataFrame:
+    """One-row rules frame repeating the schedule until ``datetime_until``.
+
+    The last occurrence is the last one starting at or before ``datetime_until``.
+    """
+    if datetime_start > datetime_end:
+        raise ValueError(f"time inversion found: {datetime_start} > {datetime_end}")
+    if frequency not in FREQUENCIES:
+        raise ValueError(
+            f"unknown frequency {frequency}, use one of {list(FREQUENCIES)}"
+        )
+    if interval < 1:
+        raise ValueError(f"interval must be at least 1, got {interval}")
+    if datetime_until < datetime_start:
+        raise ValueError(f"until {datetime_until} is before the start {datetime_start}")
+
+    period = FREQUENCIES[frequency] * interval
+    count = (pd.Timestamp(datetime_until) - pd.Timestamp(datetime_start)) // period + 1
+    if period <= pd.Timestamp(datetime_end) - pd.Timestamp(datetime_start):
+        raise ValueError("occurrences of a recurring schedule must not overlap")
+    return compact_rules(
+        pd.DataFrame(
+            {
+                "person": [person],
+                "datetime_start": [datetime_start],
+                "datetime_end": [datetime_end],
+                "room": [room],
+                "period": [period],
+                "count": [count],
+            }
+        )
+    )
+
+
+def rule_arrays(rules_df: pd.DataFrame):
+    """First start, duration, period and count of each rule, as int64 nanoseconds."""
+    starts = to_epoch_ns(rules_df["datetime_start"])
+    return (
+        starts,
+        to_epoch_ns(rules_df["datetime_end"]) - starts,
+        np.asarray(rules_df["period"], dtype="timedelta64[ns]").view("i8"),
+        rules_df["count"].to_numpy(dtype="int64"),
+    )
+
+
+def last_ends(rules_df: pd.DataFrame) -> pd.Series:
+    """End of the last occurrence of each rule."""
+    return rules_df["datetime_end"] + rules_df["period"] * (rules_df["count"] - 1)
+
+
+def occurrence_ids(rule_ids, occurrences) -> np.ndarray:
+    """Negative row ids of rule occurrences, unique and distinct from stored rows."""
+    return -((np.asarray(rule_ids, dtype="int64") << 32) + occurrences) - 1
+
+
+def occurrence_range(rules_df, datetime_start_requested, datetime_end_requested):
+    """First and last occurrence number of each rule intersecting the requested range.
+
+    A rule has no occurrence in the range when the first is after the last.
+    """
+    starts, durations, periods, counts = rule_arrays(rules_df)
+    start_requested = int(to_epoch_ns(datetime_start_requested))
+    end_requested = int(to_epoch_ns(datetime_end_requested))
+    if start_requested > end_requested:
+        raise ValueError(
+            f"time inversion found: {datetime_start_requested} > {datetime_end_requested}"
+        )
+    if len(starts) == 0:
+        return np.zeros(0, dtype="int64"), np.zeros(0, dtype="int64")
+
+    # Clamped so sentinels such as 1970 or 9999 cannot overflow below.
+    lower = int((starts - durations).min()) - 1
+    upper = int((starts + periods * counts).max()) + 1
+    start_requested = min(max(start_requested, lower), upper)
+    end_requested = min(max(end_requested, lower), upper)
+
+    # Occurrence k intersects [a, b] iff start + k * period is in [a - duration, b].
+    first = np.maximum(-((starts + durations - start_requested) // periods), 0)
+    last = np.minimum((end_requested - starts) // periods, counts - 1)
+    return first, last
+
+
+def filter_rules(
+    rules_df: pd.DataFrame,
+    person_requested: Optional[list[str]],
+    room_requested: Optional[list[str]],
+    datetime_start_requested,
+    datetime_end_requested,
+    either: bool = False,
+) -> pd.DataFrame:
+    """Rules of the requested person and room active during the requested range.
+
+    With ``either`` a rule matches the person or the room, like a conflict check.
+    """
+    matches = []
+    if person_requested:
+        matches.append(rules_df["person"].isin(person_requested))
+    if room_requested:
+        matches.append(rules_df["room"].isin(room_requested))
+    if matches:
+        mask = matches[0]
+        for match in matches[1:]:
+            mask = (mask | match) if either else (mask & match)
+        rules_df = rules_df[mask]
+    starts, durations, periods, counts = rule_arrays(rules_df)
+    return rules_df[
+        (starts <= to_epoch_ns(datetime_end_requested))
+        & (
+            starts + durations + periods * (counts - 1)
+            >= to_epoch_ns(datetime_start_requested)
+        )
+    ]
+
+
+def expand_rules(
+    rules_df: pd.DataFrame, datetime_start_requested, datetime_end_requested
+) -> pd.DataFrame:
+    """Occurrences intersecting the requested range, as Timetable rows."""
+    first, last = occurrence_range(
+        rules_df, datetime_start_requested, datetime_end_requested
+    )
+    numbers = np.maximum(last - first + 1, 0)
+    rule_positions = np.repeat(np.arange(len(rules_df)), numbers)
+    occurrences = first[rule_positions] + (
+        np.arange(numbers.sum()) - np.repeat(np.cumsum(numbers) - numbers, numbers)
+    )
+
+    starts, durations, periods, _ = rule_arrays(rules_df)
+    occurrence_starts = starts[rule_positions] + occurrences * periods[rule_positions]
+    return pd.DataFrame(
+        {
+            "person": rules_df["person"].to_numpy()[rule_positions],
+            "datetime_start": occurrence_starts.view("datetime64[ns]"),
+            "datetime_end": (occurrence_starts + durations[rule_positions]).view(
+                "datetime64[ns]"
+            ),
+            "room": rules_df["room"].to_numpy()[rule_positions],
+        },
+        index=occurrence_ids(rules_df.index.to_numpy()[rule_positions], occurrences),
+    )
+
+
+def rule_tuples(rules_df: pd.DataFrame) -> list[tuple[int, int, int, int]]:
+    """First start, duration, period and count of each rule, as Python ints."""
+    return list(zip(*(values.tolist() for values in rule_arrays(rules_df))))
+
+
+def rule_span(rule) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """Start of the first and end of the last occurrence of a rule tuple."""
+    start, duration, period, count = rule
+    return pd.Timestamp(start), pd.Timestamp(start + duration + period * (count - 1))
+
+
+def occurrence_bounds(rule, start_requested: int, end_requested: int):
+    """First and last occurrence number of one rule tuple intersecting the range."""
+    start, duration, period, count = rule
+    return (
+        max(-((start + duration - start_requested) // period), 0),
+        min((end_requested - start) // period, count - 1),
+    )
+
+
+def occurrences_overlap(starts: np.ndarray, ends: np.ndarray, rule) -> np.ndarray:
+    """Mask of the int64 intervals intersecting an occurrence of the rule tuple."""
+    start, duration, period, count = rule
+    first = np.maximum(-((start + duration - starts) // period), 0)
+    last = np.minimum((ends - start) // period, count - 1)
+    return first <= last
+
+
+def rules_overlap(rule_a, rule_b) -> bool:
+    """Whether any occurrence of one rule tuple intersects one of the other.
+
+    Start differences of two occurrences are the first-start difference plus
+    multiples of ``g = gcd(period_a, period_b)``, so without the counts the
+    rules overlap iff such a multiple falls in ``[-duration_b, duration_a]``.
+    The pattern repeats every ``lcm(period_a, period_b)``: when the rules are
+    both active for longer than that, the answer without the counts holds,
+    otherwise the occurrences of one rule within the common range are checked
+    against the other.
+    """
+    start_a, duration_a, period_a, count_a = rule_a
+    start_b, duration_b, period_b, count_b = rule_b
+
+    step = math.gcd(period_a, period_b)
+    lowest = -duration_b + (start_b - start_a + duration_b) % step
+    if lowest > duration_a:
+        return False
+
+    common_start = max(start_a, start_b)
+    common_end = min(
+        start_a + (count_a - 1) * period_a, start_b + (count_b - 1) * period_b
+    )
+    hyperperiod = period_a // step * period_b
+    if common_end - common_start >= hyperperiod + duration_a + duration_b:
+        return True
+
+    margin = max(duration_a, duration_b)
+    first, last = occurrence_bounds(rule_a, common_start - margin, common_end + margin)
+    starts = start_a + period_a * np.arange(first, last + 1, dtype="int64")
+    return bool(occurrences_overlap(starts, starts + duration_a, rule_b).any())
+
+
+def split_rules(
+    rules_df: pd.DataFrame, datetime_start_requested, datetime_end_requested
+) -> tuple[pd.DataFrame, pd.DataFrame, int]:
+    """Remove the occurrences intersecting the requested range from the rules.
+
+    Each rule with such occurrences is replaced by the part before and the part
+    after them. Returns the rules kept unchanged, the new parts and the number
+    of removed occurrences.
+    """
+    first, last = occurrence_range(
+        rules_df, datetime_start_requested, datetime_end_requested
+    )
+    hit = first <= last
+    if not hit.any():
+        return rules_df, empty_rules(), 0
+
+    hit_df = rules_df[hit]
+    first, last = first[hit], last[hit]
+    before_df = hit_df.assign(count=first)
+    after_df = hit_df.assign(
+        datetime_start=hit_df["datetime_start"] + hit_df["period"] * (last + 1),
+        datetime_end=hit_df["datetime_end"] + hit_df["period"] * (last + 1),
+        count=hit_df["count"] - last - 1,
+    )
+    parts_df = pd.concat([before_df, after_df], ignore_index=True)
+    return (
+        rules_df[~hit],
+        compact_rules(parts_df[parts_df["count"] > 0]).reset_index(drop=True),
+        int((last - first + 1).sum()),
+    )
+
+
+def rule_has_conflict(
+    rule_df: pd.DataFrame, timetable_df: pd.DataFrame, rules: list
+) -> bool:
+    """Whether the one-row ``rule_df`` overlaps rows or rule tuples.
+
+    ``timetable_df`` and ``rules`` are the rows and rules of the person or the
+    room of the rule, at least those active while it is.
+    """
+    rule = rule_tuples(rule_df)[0]
+    if occurrences_overlap(
+        to_epoch_ns(timetable_df["datetime_start"]),
+        to_epoch_ns(timetable_df["datetime_end"]),
+        rule,
+    ).any():
+        return True
+    return any(rules_overlap(rule, other) for other in rules)
+
+
+class RuleIndex:
+    """Rule tuples of one rules DataFrame per person and per room, for single checks."""
+
+    def __init__(self, rules_df: pd.DataFrame):
+        self.source = rules_df
+        self.person: dict = {}
+        self.room: dict = {}
+        for person, room, rule in zip(
+            rules_df["person"], rules_df["room"], rule_tuples(rules_df)
+        ):
+            self.insert(person, room, rule)
+
+    def insert(self, person, room, rule):
+        self.person.setdefault(person, []).append(rule)
+        self.room.setdefault(room, []).append(rule)
+
+    def rules(self, person, room) -> list:
+        return self.person.get(person, []) + self.room.get(room, [])
+
+    def has_conflict(
+        self, person, datetime_start_requested, datetime_end_requested, room
+    ) -> bool:
+        start_requested = int(to_epoch_ns(datetime_start_requested))
+        end_requested = int(to_epoch_ns(datetime_end_requested))
+        for rule in self.rules(person, room):
+            first, last = occurrence_bounds(rule, start_requested, end_requested)
+            if first <= last:
+                return True
+        return False
@@ -0,0 +1,128 @@
+"""Record the model responses of agent turns and replay them without OpenAI.
+
+A transcript is a JSON lines file with one agent turn per line::
+
+    {"input": "...", "multi_action": true,
+     "responses": [{"content": "", "function_call": {"name": ..., "arguments": ...},
+                    "model_seconds": 1.2}, ...]}
+
+``responses`` holds every model response of the turn in order, the function
+calls and the final answer. Replayed, the same function calls run the real
+tools on the current Timetable.
+"""
+import asyncio
+import json
+import re
+import time
+from typing import Any, Optional
+
+from langchain.callbacks.base import BaseCallbackHandler
+from langchain.chat_models import ChatOpenAI
+from langchain.schema import AIMessage, ChatGeneration, ChatResult, LLMResult
+from pydantic import PrivateAttr
+
+
+def read_transcript(path: str) -> list[dict]:
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class TranscriptRecorder(BaseCallbackHandler):
+    """Keep the model responses of one agent turn, with the time each took."""
+
+    def __init__(self):
+        self.responses: list[dict] = []
+        self.started: dict = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        seconds = time.perf_counter() - self.started.pop(run_id, time.perf_counter())
+        message = response.generations[0][0].message
+        self.responses.append(
+            {
+                "content": message.content,
+                "function_call": message.additional_kwargs.get("function_call"),
+                "model_seconds": round(seconds, 3),
+            }
+        )
+
+    def write(self, path: str, prompt: str, multi_action: bool):
+        """Append the turn to the transcript at ``path``."""
+        turn = {
+            "input": prompt,
+            "multi_action": multi_action,
+            "responses": self.responses,
+        }
+        with open(path, "a") as file:
+            file.write(json.dumps(turn) + "\n")
+
+
+class ReplayChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that answers with the responses of a transcript, in order.
+
+    Each call sleeps ``latency`` seconds, or the recorded ``model_seconds`` of
+    the response when ``latency`` is None. With ``streaming`` the text is sent
+    to the callbacks word by word, the time spread evenly over the words.
+    """
+
+    responses: list[dict] = []
+    latency: Optional[float] = 0.0
+    _position: int = PrivateAttr(default=0)
+
+    @classmethod
+    def from_transcript(cls, turns: list[dict], **kwargs: Any) -> "ReplayChatOpenAI":
+        return cls(
+            client="TimetableGPT",
+            openai_api_key="sk-replay",
+            responses=[response for turn in turns for response in turn["responses"]],
+            **kwargs,
+        )
+
+    def _next(self) -> tuple[ChatResult, float]:
+        if self._position >= len(self.responses):
+            raise ValueError(
+                f"the transcript has no response left after {len(self.responses)}"
+            )
+        response = self.responses[self._position]
+        self._position += 1
+        additional_kwargs = (
+            {"function_call": response["function_call"]}
+            if response.get("function_call")
+            else {}
+        )
+        message = AIMessage(
+            content=response.get("content") or "", additional_kwargs=additional_kwargs
+        )
+        seconds = (
+            response.get("model_seconds", 0.0) if self.latency is None else self.latency
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)]), seconds
+
+    def _tokens(self, result: ChatResult, run_manager) -> list[str]:
+        if not (self.streaming and run_manager):
+            return []
+        return re.findall(r"\s*\S+", result.generations[0].message.content)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        result, seconds = self._next()
+        tokens = self._tokens(result, run_manager)
+        if not tokens:
+            time.sleep(seconds)
+        for token in tokens:
+            time.sleep(seconds / len(tokens))
+            run_manager.on_llm_new_token(token)
+        return result
+
+    async def _agenerate(
+        self, messages, stop=None, run_manager: Optional[Any] = None, **kwargs: Any
+    ):
+        result, seconds = self._next()
+        tokens = self._tokens(result, run_manager)
+        if not tokens:
+            await asyncio.sleep(seconds)
+        for token in tokens:
+            await asyncio.sleep(seconds / len(tokens))
+            await run_manager.on_llm_new_token(token)
+        return result
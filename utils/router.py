@@ -0,0 +1,421 @@
+import calendar
+import datetime
+import re
+from typing import Optional
+
+from utils.backends import get_backend
+from utils.formatters import format_timetable
+from utils.functions import get_availability, get_conflict_status, get_timetable
+
+# Requests that change the Timetable or need reasoning (best slot, suggestions)
+# always go to the agent.
+AGENT_ONLY_WORDS = {
+    "add",
+    "arrange",
+    "best",
+    "book",
+    "cancel",
+    "create",
+    "delete",
+    "find",
+    "insert",
+    "move",
+    "my",
+    "organize",
+    "plan",
+    "put",
+    "remove",
+    "reschedule",
+    "reserve",
+    "set",
+    "suggest",
+    "when",
+    "which",
+    "why",
+}
+CONFLICT_WORDS = {"conflict", "conflicts", "clash", "clashes", "overlap", "overlaps"}
+AVAILABILITY_WORDS = {
+    "availability",
+    "available",
+    "busy",
+    "free",
+    "occupied",
+    "unavailable",
+    "unoccupied",
+    "vacant",
+}
+TIMETABLE_WORDS = {
+    "agenda",
+    "bookings",
+    "calendar",
+    "meetings",
+    "schedule",
+    "schedules",
+    "show",
+    "timetable",
+}
+
+# Words that may be capitalized in a question without being a name.
+KNOWN_WORDS = (
+    AVAILABILITY_WORDS
+    | CONFLICT_WORDS
+    | TIMETABLE_WORDS
+    | {"am", "pm", "i", "room", "rooms", "today", "tomorrow", "yesterday"}
+)
+# Words after "room" that are not the name of a room, "is room free".
+ROOM_FOLLOWERS = {
+    "and",
+    "at",
+    "between",
+    "by",
+    "for",
+    "from",
+    "in",
+    "is",
+    "on",
+    "or",
+    "the",
+    "to",
+    "today",
+    "tomorrow",
+    "with",
+} | AVAILABILITY_WORDS
+
+MONTHS = {
+    name.lower(): number
+    for names in (calendar.month_name, calendar.month_abbr)
+    for number, name in enumerate(names)
+    if name
+}
+WEEKDAYS = {name.lower(): number for number, name in enumerate(calendar.day_name)}
+
+__month = "|".join(sorted(MONTHS, key=len, reverse=True))
+__year = r"(?:,?\s*(?P<year>\d{4}))?"
+DATE_PATTERNS = [
+    re.compile(r"\b(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})-(?P<iso_day>\d{1,2})\b"),
+    re.compile(
+        rf"\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<month>{__month})\b\.?{__year}"
+    ),
+    re.compile(
+        rf"\b(?P<month>{__month})\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\b{__year}"
+    ),
+    re.compile(r"\b(?P<relative>today|tonight|tomorrow|yesterday)\b"),
+    re.compile(rf"\b(?:(?P<next>next|this)\s+)?(?P<weekday>{'|'.join(WEEKDAYS)})\b"),
+]
+__time = r"(?:(?P<{0}>\d{{1,2}})(?::(?P<{0}_minute>\d{{2}}))?\s*(?P<{0}_meridiem>am|pm|a\.m\.|p\.m\.)?|(?P<{0}_word>noon|midnight))"
+TIME_RANGE_PATTERN = re.compile(
+    r"\b(?:from\s+|(?P<between>between)\s+)?"
+    + __time.format("start")
+    + r"\s*(?P<separator>-|–|to|until|till|and)\s*"
+    + __time.format("end")
+    + r"(?![\d:])"
+)
+TIME_PATTERN = re.compile(
+    r"\b(?:at|by|around)\s+" + __time.format("start") + r"(?![\d:])"
+    r"|\b(?P<bare>\d{1,2}(?::\d{2})?\s*(?:am|pm)|noon|midnight)\b"
+)
+# Times the rules do not resolve to a range: open ranges like "after 3pm" and
+# clock times left over once the known forms are parsed, like "10.30".
+OPEN_TIME_PATTERN = re.compile(
+    r"\b(?:after|before|since|past|until|till|from|later\s+than|earlier\s+than)\s+"
+    + __time.format("start")
+    + r"(?![\d:])"
+)
+CLOCK_PATTERN = re.compile(
+    r"\b\d{1,2}\s*(?:[:.]\d{2}|am|pm|a\.m\.|p\.m\.)|\b(?:noon|midnight)\b"
+)
+
+
+def __parse_date(
+    text: str, now: datetime.datetime
+) -> tuple[Optional[datetime.date], str]:
+    """First date expression of ``text`` and the text with it blanked out."""
+    for pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        try:
+            if groups.get("iso_year"):
+                date = datetime.date(
+                    int(groups["iso_year"]),
+                    int(groups["iso_month"]),
+                    int(groups["iso_day"]),
+                )
+            elif groups.get("month"):
+                date = datetime.date(
+                    int(groups["year"] or now.year),
+                    MONTHS[groups["month"]],
+                    int(groups["day"]),
+                )
+            elif groups.get("relative"):
+                date = now.date() + datetime.timedelta(
+                    days={"yesterday": -1, "tomorrow": 1}.get(groups["relative"], 0)
+                )
+            else:
+                days_ahead = (WEEKDAYS[groups["weekday"]] - now.weekday()) % 7
+                if groups["next"] == "next" and days_ahead == 0:
+                    days_ahead = 7
+                date = now.date() + datetime.timedelta(days=days_ahead)
+        except ValueError:
+            return None, text
+        return date, text[: match.start()] + " " + text[match.end() :]
+    return None, text
+
+
+def __to_time(hour, minute, meridiem, word) -> Optional[datetime.time]:
+    """The clock time, None when out of range like "25:00" or "13pm"."""
+    if word:
+        return datetime.time(12) if word == "noon" else datetime.time(0)
+    hour = int(hour)
+    minute = int(minute or 0)
+    if minute > 59 or hour > (12 if meridiem else 23) or (meridiem and hour == 0):
+        return None
+    if meridiem and meridiem[0] == "p" and hour < 12:
+        hour += 12
+    elif meridiem and meridiem[0] == "a" and hour == 12:
+        hour = 0
+    return datetime.time(hour, minute)
+
+
+def __parse_times(
+    text: str,
+) -> Optional[tuple[Optional[datetime.time], Optional[datetime.time]]]:
+    """Start and end time of ``text``, (None, None) when it has no time and
+    None when it has one the rules cannot resolve to a range.
+    """
+    for match in TIME_RANGE_PATTERN.finditer(text):
+        # "and" is only a range in "between 10 and 12", not in "room 1 and 2".
+        if match["separator"] == "and" and match["between"] is None:
+            continue
+        groups = match.groupdict()
+        start_meridiem = groups["start_meridiem"]
+        end_meridiem = groups["end_meridiem"]
+        end = __to_time(
+            groups["end"], groups["end_minute"], end_meridiem, groups["end_word"]
+        )
+        if end is None:
+            return None
+        # "1-3pm" is 13:00 to 15:00, "10-12pm" stays 10:00 to 12:00.
+        if (
+            start_meridiem is None
+            and end_meridiem is not None
+            and groups["start"] is not None
+            and groups["end"] is not None
+            and int(groups["start"]) < 12
+            and int(groups["start"]) + 12 <= end.hour
+        ):
+            start_meridiem = end_meridiem
+        start = __to_time(
+            groups["start"],
+            groups["start_minute"],
+            start_meridiem,
+            groups["start_word"],
+        )
+        if start is None:
+            return None
+        # Office hours without am/pm, "3-5" is in the afternoon.
+        if start_meridiem is None and groups["start_word"] is None and start.hour < 7:
+            start = start.replace(hour=start.hour + 12)
+        if end_meridiem is None and groups["end_word"] is None and end < start:
+            end = end.replace(hour=(end.hour + 12) % 24)
+        # Over midnight, "11pm to 1am", is not a range of one day.
+        if end < start:
+            return None
+        return start, end
+
+    if OPEN_TIME_PATTERN.search(text):
+        return None
+    match = TIME_PATTERN.search(text)
+    if match is not None:
+        if match["bare"]:
+            bare = re.fullmatch(
+                r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)|(noon|midnight)", match["bare"]
+            )
+            time = __to_time(*bare.groups())
+        else:
+            time = __to_time(
+                match["start"],
+                match["start_minute"],
+                match["start_meridiem"],
+                match["start_word"],
+            )
+            if time is not None and match["start_meridiem"] is None and time.hour < 7:
+                time = time.replace(hour=time.hour + 12)
+        if time is None:
+            return None
+        return time, time
+    if CLOCK_PATTERN.search(text):
+        return None
+    return None, None
+
+
+def __match_names(
+    words: list[str], names: list[str], first_name: bool
+) -> list[tuple[int, int, str]]:
+    """(start, end, name) of every word n-gram that is a known name."""
+    lookup = {}
+    first_names = {}
+    for name in names:
+        name_words = tuple(re.findall(r"[\w']+", name.lower()))
+        if name_words:
+            lookup[name_words] = name
+            first_names.setdefault(name_words[0], []).append(name)
+    if first_name:
+        for word, candidates in first_names.items():
+            # Only unambiguous first names, "Anna" but not "Person".
+            if len(candidates) == 1:
+                lookup.setdefault((word,), candidates[0])
+    longest = max((len(key) for key in lookup), default=0)
+
+    found = []
+    position = 0
+    while position < len(words):
+        for size in range(min(longest, len(words) - position), 0, -1):
+            name = lookup.get(tuple(words[position : position + size]))
+            if name is not None:
+                found.append((position, position + size, name))
+                position += size
+                break
+        else:
+            position += 1
+    return found
+
+
+def __words(prompt: str) -> list[str]:
+    return [
+        word[:-2] if word.endswith("'s") else word
+        for word in re.findall(r"[\w']+", prompt.lower().replace("’", "'"))
+    ]
+
+
+def intent(prompt: str) -> Optional[str]:
+    """Tool name for the intent of ``prompt``, ``None`` if it needs the agent."""
+    word_set = set(__words(prompt))
+    if word_set & AGENT_ONLY_WORDS:
+        return None
+    if word_set & CONFLICT_WORDS:
+        return "timetable_check_conflict"
+    if word_set & AVAILABILITY_WORDS:
+        return "timetable_availability"
+    if word_set & TIMETABLE_WORDS:
+        return "timetable_get"
+    return None
+
+
+def route(
+    prompt: str,
+    list_all_person: list[str],
+    list_all_room: list[str],
+    now: Optional[datetime.datetime] = None,
+) -> Optional[tuple[str, dict]]:
+    """Map a simple question to a tool name and its arguments.
+
+    Returns ``None`` when the question is not one of the read-only intents the
+    rules understand, the caller should then ask the agent.
+    """
+    tool_name = intent(prompt)
+    if tool_name is None:
+        return None
+    now = datetime.datetime.now() if now is None else now
+    text = prompt.lower().strip()
+    words = __words(prompt)
+
+    # A first name alone only counts when written as one, "Anna" but not "anna".
+    capitalized = set(re.findall(r"\b[A-Z]\w*", prompt))
+    person_matches = __match_names(words, list_all_person, True)
+    person_requested = sorted(
+        {
+            name
+            for start, end, name in person_matches
+            if end - start > 1
+            or len(name.split()) == 1
+            or name.split()[0] in capitalized
+        }
+    )
+    # Rooms are only recognized after the word room(s), "room Alpha and Bravo".
+    room_requested = set()
+    room_starts = set()
+    room_words = {"room", "rooms"}
+    for start, end, name in __match_names(words, list_all_room, False):
+        previous = [word for word in words[:start] if word not in {"and", "or"}]
+        # Or names that include the word, "Room 1".
+        if (
+            words[start] in room_words
+            or (previous and previous[-1] in room_words)
+            or (previous and previous[-1] in {room.lower() for room in room_requested})
+        ):
+            room_requested.add(name)
+            room_starts.add(start)
+    room_requested = sorted(room_requested)
+
+    # Names the rules cannot resolve go to the agent rather than being dropped:
+    # "anna" for Anna Koch, "Charlie" or "room Zulu" that are no known name.
+    if len(person_requested) < len({name for _, _, name in person_matches}):
+        return None
+    name_words = {
+        word for name in person_requested + room_requested for word in __words(name)
+    }
+    # The first word of a sentence is capitalized anyway.
+    sentence_starts = set(re.findall(r"(?:^|[.!?]\s+)([A-Z]\w*)", prompt.strip()))
+    for word in capitalized - sentence_starts:
+        word = __words(word)[0]
+        if not (
+            word in name_words
+            or word in KNOWN_WORDS
+            or word in MONTHS
+            or word in WEEKDAYS
+        ):
+            return None
+    for position, word in enumerate(words[:-1]):
+        if (
+            word in room_words
+            and words[position + 1] not in ROOM_FOLLOWERS
+            and not room_starts & {position, position + 1}
+        ):
+            return None
+    # Questions about the whole Timetable need the agent to pick what matters.
+    if not person_requested and not room_requested:
+        return None
+
+    date, text = __parse_date(text, now)
+    times = __parse_times(text)
+    if times is None:
+        return None
+    start_time, end_time = times
+    if date is None and start_time is None:
+        if tool_name != "timetable_get":
+            return None
+        datetime_start_requested = datetime.datetime(1970, 1, 1, 0, 0, 0)
+        datetime_end_requested = datetime.datetime(9999, 1, 1, 0, 0, 0)
+    else:
+        date = now.date() if date is None else date
+        if start_time is None:
+            start_time, end_time = datetime.time(0, 0, 0), datetime.time(23, 59, 59)
+        datetime_start_requested = datetime.datetime.combine(date, start_time)
+        datetime_end_requested = datetime.datetime.combine(date, end_time)
+
+    return tool_name, {
+        "person_requested": person_requested or None,
+        "datetime_start_requested": datetime_start_requested,
+        "datetime_end_requested": datetime_end_requested,
+        "room_requested": room_requested or None,
+    }
+
+
+def answer(prompt: str, now: Optional[datetime.datetime] = None) -> Optional[str]:
+    """Answer ``prompt`` without the LLM, or ``None`` if it needs the agent."""
+    backend = get_backend()
+    # Keywords are checked first, listing names scans the whole Timetable.
+    if intent(prompt) is None or not backend.has_timetable():
+        return None
+    routed = route(prompt, backend.list_persons(), backend.list_rooms(), now)
+    if routed is None:
+        return None
+
+    tool_name, arguments = routed
+    if tool_name == "timetable_availability":
+        return get_availability(**arguments)
+    if tool_name == "timetable_check_conflict":
+        return get_conflict_status(**arguments)
+    return format_timetable(get_timetable(**arguments))
@@ -0,0 +1,317 @@
+"""Place many meetings at once without overlaps, for bulk timetable generation.
+
+Each meeting needs all of its participants and one of its candidate rooms for
+its duration, inside its window and the working hours. Bookings follow the
+Timetable rules: intervals are closed, so two bookings of the same person or
+room must not even touch, and the existing Timetable, recurring occurrences
+included, is busy time.
+
+Meetings are placed greedily, most constrained first, at the earliest start
+of a ``step`` grid where everyone and a room are free. A meeting that does
+not fit tries to move one of the placed meetings blocking it (an ejection),
+which settles most dead ends of the greedy order. Meetings that share no
+person and no room are independent: such groups are solved separately, in
+worker processes when there are enough meetings.
+"""
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils.intervals import ResourceIntervalIndex, to_epoch_ns
+
+PARALLEL_MIN_MEETINGS = 500
+MAX_EJECTIONS = 8
+
+
+class Meeting(NamedTuple):
+    persons: tuple[str, ...]
+    rooms: tuple[str, ...]
+    duration: datetime.timedelta
+    datetime_start: datetime.datetime
+    datetime_end: datetime.datetime
+
+
+def meeting_groups(meetings: list[Meeting]) -> list[list[int]]:
+    """Indexes of the meetings connected by a shared person or candidate room."""
+    parents = list(range(len(meetings)))
+
+    def find(number):
+        while parents[number] != number:
+            parents[number] = parents[parents[number]]
+            number = parents[number]
+        return number
+
+    owners: dict = {}
+    for number, meeting in enumerate(meetings):
+        resources = [("person", person) for person in meeting.persons] + [
+            ("room", room) for room in meeting.rooms
+        ]
+        for resource in resources:
+            owner = owners.setdefault(resource, number)
+            parents[find(number)] = find(owner)
+
+    groups: dict = {}
+    for number in range(len(meetings)):
+        groups.setdefault(find(number), []).append(number)
+    return list(groups.values())
+
+
+def busy_by_resource(keys, starts, ends) -> dict:
+    """Busy ``(starts, ends)`` epoch ns arrays of each resource."""
+    codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+    order = np.argsort(codes, kind="stable")
+    starts = to_epoch_ns(starts)[order]
+    ends = to_epoch_ns(ends)[order]
+    boundaries = np.flatnonzero(np.diff(codes[order])) + 1
+    return {
+        uniques[codes[order][part[0]]]: (starts[part], ends[part])
+        for part in np.split(np.arange(len(codes)), boundaries)
+        if len(part) > 0
+    }
+
+
+class _Placer:
+    """Greedy placement with ejections for one group of meetings."""
+
+    def __init__(self, meetings, person_busy, room_busy, working_hours, step_ns):
+        self.meetings = meetings
+        self.step_ns = step_ns
+        self.working_hours = working_hours
+        self.placed: dict = {}
+        self.person = self._index(person_busy)
+        self.room = self._index(room_busy)
+
+    @staticmethod
+    def _index(busy: dict) -> ResourceIntervalIndex:
+        keys = [key for key, (starts, _) in busy.items() for _ in range(len(starts))]
+        starts = np.concatenate([starts for starts, _ in busy.values()] or [[]])
+        ends = np.concatenate([ends for _, ends in busy.values()] or [[]])
+        # Existing bookings get row id 0, placed meetings their negative number.
+        return ResourceIntervalIndex.from_arrays(
+            keys,
+            starts.astype("int64").view("datetime64[ns]"),
+            ends.astype("int64").view("datetime64[ns]"),
+            np.zeros(len(keys), dtype="int64"),
+        )
+
+    def _aligned(self, start: int, duration: int, window_end: int) -> int:
+        """First grid start at or after ``start`` inside the working hours.
+
+        Past ``window_end - duration`` when there is none before the end of
+        the window.
+        """
+        start = -(-start // self.step_ns) * self.step_ns
+        if self.working_hours is None:
+            return start
+        day_ns = 24 * 3600 * 10**9
+        work_start, work_end = self.working_hours
+        if duration > work_end - work_start:
+            return window_end
+        while start + duration <= window_end:
+            day = start // day_ns * day_ns
+            if start < day + work_start:
+                start = -(-(day + work_start) // self.step_ns) * self.step_ns
+            # The grid may not line up with the working hours, check every day.
+            if start + duration <= day + work_end:
+                return start
+            start = -(-(day + day_ns) // self.step_ns) * self.step_ns
+        return start
+
+    def _first_fit(self, number: int) -> Optional[tuple[int, int, str]]:
+        meeting = self.meetings[number]
+        duration = int(pd.Timedelta(meeting.duration).value)
+        window_end = int(to_epoch_ns(meeting.datetime_end))
+        start = self._aligned(
+            int(to_epoch_ns(meeting.datetime_start)), duration, window_end
+        )
+        while start + duration <= window_end:
+            end = start + duration
+            busy_until = max(
+                (
+                    busy_end
+                    for busy_end in (
+                        self.person.overlap_end(person, start, end)
+                        for person in meeting.persons
+                    )
+                    if busy_end is not None
+                ),
+                default=None,
+            )
+            if busy_until is None:
+                room_busy_until = []
+                for room in meeting.rooms:
+                    busy_end = self.room.overlap_end(room, start, end)
+                    if busy_end is None:
+                        return start, end, room
+                    room_busy_until.append(busy_end)
+                busy_until = min(room_busy_until)
+            # Closed intervals: the next start must be after the busy end.
+            start = self._aligned(max(busy_until + 1, start + 1), duration, window_end)
+        return None
+
+    def _place(self, number: int, placement: tuple[int, int, str]):
+        start, end, room = placement
+        for person in self.meetings[number].persons:
+            self.person.insert(person, start, end, -number - 1)
+        self.room.insert(room, start, end, -number - 1)
+        self.placed[number] = placement
+
+    def _remove(self, number: int):
+        start, _, room = self.placed.pop(number)
+        for person in self.meetings[number].persons:
+            self.person.remove(person, start, -number - 1)
+        self.room.remove(room, start, -number - 1)
+
+    def _blockers(self, number: int) -> list[int]:
+        """Placed meetings sharing a person or a candidate room within the window."""
+        meeting = self.meetings[number]
+        window = (
+            int(to_epoch_ns(meeting.datetime_start)),
+            int(to_epoch_ns(meeting.datetime_end)),
+        )
+        blockers = set()
+        for index, keys in [(self.person, meeting.persons), (self.room, meeting.rooms)]:
+            for key in keys:
+                blockers.update(
+                    -row_id - 1 for row_id in index.overlaps(key, *window) if row_id < 0
+                )
+        return sorted(blockers)
+
+    def _eject(self, number: int) -> bool:
+        """Place the meeting by moving one blocking meeting elsewhere."""
+        for blocker in self._blockers(number)[:MAX_EJECTIONS]:
+            previous = self.placed[blocker]
+            self._remove(blocker)
+            placement = self._first_fit(number)
+            if placement is not None:
+                self._place(number, placement)
+                moved = self._first_fit(blocker)
+                if moved is not None:
+                    self._place(blocker, moved)
+                    return True
+                self._remove(number)
+            self._place(blocker, previous)
+        return False
+
+    def solve(self, order: list[int]) -> list[int]:
+        """Place the meetings in ``order``, return the ones that could not be placed."""
+        unplaced = []
+        for number in order:
+            placement = self._first_fit(number)
+            if placement is not None:
+                self._place(number, placement)
+            elif not self._eject(number):
+                unplaced.append(number)
+        return unplaced
+
+
+def _difficulty(meeting: Meeting):
+    """Sort key placing the tightest, largest and longest meetings first."""
+    slack = pd.Timestamp(meeting.datetime_end) - pd.Timestamp(meeting.datetime_start)
+    return (
+        slack - pd.Timedelta(meeting.duration),
+        len(meeting.rooms),
+        -len(meeting.persons),
+        -pd.Timedelta(meeting.duration),
+    )
+
+
+def _solve_groups(jobs) -> list[tuple[int, int, int, str]]:
+    """Solve independent groups, returning ``(number, start, end, room)`` placements."""
+    placements = []
+    for meetings, numbers, person_busy, room_busy, working_hours, step_ns in jobs:
+        placer = _Placer(meetings, person_busy, room_busy, working_hours, step_ns)
+        placer.solve(
+            sorted(
+                range(len(meetings)), key=lambda number: _difficulty(meetings[number])
+            )
+        )
+        placements += [
+            (numbers[number], start, end, room)
+            for number, (start, end, room) in placer.placed.items()
+        ]
+    return placements
+
+
+def solve_meetings(
+    meetings: list[Meeting],
+    busy_df: pd.DataFrame,
+    working_hours: Optional[tuple[datetime.time, datetime.time]] = None,
+    step: datetime.timedelta = datetime.timedelta(minutes=15),
+    workers: Optional[int] = None,
+) -> tuple[pd.DataFrame, list[int]]:
+    """Conflict-free placement of ``meetings`` around the bookings of ``busy_df``.
+
+    ``busy_df`` holds at least the bookings of the meeting persons and rooms
+    during the meeting windows. Returns one row per placed meeting, indexed by
+    its position in ``meetings``, and the positions of those left unplaced.
+    """
+    step_ns = int(pd.Timedelta(step).value)
+    if working_hours is not None:
+        working_hours = tuple(
+            int(
+                pd.Timedelta(
+                    hours=hour.hour, minutes=hour.minute, seconds=hour.second
+                ).value
+            )
+            for hour in working_hours
+        )
+    person_busy = busy_by_resource(
+        busy_df["person"], busy_df["datetime_start"], busy_df["datetime_end"]
+    )
+    room_busy = busy_by_resource(
+        busy_df["room"], busy_df["datetime_start"], busy_df["datetime_end"]
+    )
+
+    jobs = []
+    for numbers in meeting_groups(meetings):
+        group = [meetings[number] for number in numbers]
+        persons = {person for meeting in group for person in meeting.persons}
+        rooms = {room for meeting in group for room in meeting.rooms}
+        jobs.append(
+            (
+                group,
+                numbers,
+                {
+                    person: person_busy[person]
+                    for person in persons & person_busy.keys()
+                },
+                {room: room_busy[room] for room in rooms & room_busy.keys()},
+                working_hours,
+                step_ns,
+            )
+        )
+
+    workers = os.cpu_count() if workers is None else workers
+    if workers > 1 and len(jobs) > 1 and len(meetings) >= PARALLEL_MIN_MEETINGS:
+        # Largest groups first, dealt round-robin so the workers stay balanced.
+        jobs.sort(key=lambda job: len(job[0]), reverse=True)
+        chunks = [jobs[worker::workers] for worker in range(workers)]
+        with ProcessPoolExecutor(workers) as executor:
+            placements = [
+                placement
+                for chunk_placements in executor.map(_solve_groups, chunks)
+                for placement in chunk_placements
+            ]
+    else:
+        placements = _solve_groups(jobs)
+
+    placed_df = pd.DataFrame(
+        {
+            "persons": [
+                ", ".join(meetings[number].persons) for number, *_ in placements
+            ],
+            "datetime_start": pd.to_datetime([start for _, start, _, _ in placements]),
+            "datetime_end": pd.to_datetime([end for _, _, end, _ in placements]),
+            "room": [room for *_, room in placements],
+        },
+        index=pd.Index([number for number, *_ in placements], dtype="int64"),
+    ).sort_index()
+    placed = set(placed_df.index)
+    return placed_df, [
+        number for number in range(len(meetings)) if number not in placed
+    ]
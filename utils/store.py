@@ -0,0 +1,92 @@
+import os
+from typing import Optional
+
+import pandas as pd
+
+TIMETABLE_COLUMNS = ["person", "datetime_start", "datetime_end", "room"]
+TIMETABLE_FILE_TYPES = [".xlsx", ".xls", ".csv", ".parquet", ".feather", ".arrow"]
+
+
+def compact_timetable(timetable_df: pd.DataFrame) -> pd.DataFrame:
+    """Typed timetable frame kept in ``st.session_state["timetable"]``.
+
+    Only the four timetable columns are kept. Person and room are categorical,
+    so each row stores an integer code instead of a Python string, and start/end
+    are ``datetime64[ns]``, i.e. int64 nanoseconds since epoch that can be viewed
+    as ``i8`` without copying.
+    """
+    return timetable_df[TIMETABLE_COLUMNS].astype(
+        {
+            "person": "category",
+            "datetime_start": "datetime64[ns]",
+            "datetime_end": "datetime64[ns]",
+            "room": "category",
+        }
+    )
+
+
+def read_timetable(file, file_name: str) -> pd.DataFrame:
+    """Parse an uploaded Timetable into the compact representation, sorted by time.
+
+    Excel is the slowest format to parse, large imports should prefer CSV or,
+    better, Parquet/Feather which keep the column types.
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == ".csv":
+        timetable_df = pd.read_csv(file, parse_dates=["datetime_start", "datetime_end"])
+    elif extension == ".parquet":
+        timetable_df = pd.read_parquet(file, columns=TIMETABLE_COLUMNS)
+    elif extension in (".feather", ".arrow"):
+        timetable_df = pd.read_feather(file, columns=TIMETABLE_COLUMNS)
+    else:
+        timetable_df = pd.read_excel(
+            file, parse_dates=["datetime_start", "datetime_end"]
+        )
+
+    return (
+        compact_timetable(timetable_df)
+        .sort_values(["datetime_start", "datetime_end", "person", "room"])
+        .reset_index(drop=True)
+    )
+
+
+def add_categories(timetable_df: pd.DataFrame, column: str, values) -> None:
+    """Register new person/room names before they are written into the frame."""
+    if not isinstance(timetable_df[column].dtype, pd.CategoricalDtype):
+        return
+    new_values = pd.Index(pd.unique(pd.Series(values, dtype=object))).difference(
+        timetable_df[column].cat.categories
+    )
+    if len(new_values) > 0:
+        timetable_df[column] = timetable_df[column].cat.add_categories(new_values)
+
+
+def next_row_id(timetable_df: pd.DataFrame) -> int:
+    return int(timetable_df.index.max()) + 1 if len(timetable_df) > 0 else 0
+
+
+def append_rows(
+    timetable_df: pd.DataFrame,
+    rows_df: pd.DataFrame,
+    first_row_id: Optional[int] = None,
+) -> pd.DataFrame:
+    """Concatenate new rows with fresh row ids, keeping the categorical columns.
+
+    The rows are numbered from ``first_row_id``, by default after the largest
+    id of ``timetable_df``. ``timetable_df`` itself is left untouched, readers
+    may still hold it.
+    """
+    if first_row_id is None:
+        first_row_id = next_row_id(timetable_df)
+    rows_df = rows_df[TIMETABLE_COLUMNS].set_axis(
+        pd.RangeIndex(first_row_id, first_row_id + len(rows_df))
+    )
+    timetable_df = timetable_df.copy(deep=False)
+    for column in ["person", "room"]:
+        add_categories(timetable_df, column, rows_df[column])
+    return pd.concat([timetable_df, rows_df.astype(timetable_df.dtypes.to_dict())])
+
+
+def memory_footprint(timetable_df: pd.DataFrame) -> int:
+    """Bytes held by the timetable frame, including the Python string objects."""
+    return int(timetable_df.memory_usage(index=True, deep=True).sum())
@@ -1,22 +1,64 @@
+import asyncio
+import contextvars
 import datetime
+import functools
 from typing import Optional, Type
 
 from langchain.tools import BaseTool
 from pydantic import BaseModel
 
-from utils.classes import TimetableCheckInput, TimetablePostInput
+from utils.classes import (
+    TimetableAuditInput,
+    TimetableAvailabilityMatrixInput,
+    TimetableCheckInput,
+    TimetableFreeSlotInput,
+    TimetableMeetingInput,
+    TimetablePostBatchInput,
+    TimetablePostInput,
+    TimetablePostRecurringInput,
+    TimetableSolveInput,
+)
+from utils.formatters import (
+    format_audit,
+    format_availability_matrix,
+    format_solution,
+    format_timetable,
+)
 from utils.functions import (
+    audit_timetable,
     delete_timetable,
+    find_free_slots,
     get_availability,
+    get_availability_matrix,
     get_conflict_status,
     get_timetable,
     post_timetable,
+    post_timetable_batch,
+    post_timetable_recurring,
+    slot_windows,
+    solve_timetable,
+    working_hours_from,
 )
 
 
+async def run_in_thread(func, *args):
+    """Run a blocking tool in the default executor of the running event loop.
+
+    The tool runs in a copy of the current context, so its metrics span is
+    attached to the agent turn that called it.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(contextvars.copy_context().run, func, *args)
+    )
+
+
 class TimetableAvailabilityTool(BaseTool):
     name = "timetable_availability"
-    description = "Useful for when you need to find the availability of person and/or room(s) based on specific date and time"
+    description = """
+    Useful for when you need to find the availability of person and/or room(s) based on specific date and time.
+    A person is unavailable when booked in any room and a room when booked by anyone; with no person (or room)
+    requested, every person (or room) of the Timetable is checked.
+    """
 
     def _run(
         self,
@@ -49,11 +91,74 @@ class TimetableAvailabilityTool(BaseTool):
         ),
         room_requested: Optional[list[str]] = None,
     ):
-        raise NotImplementedError("This tool does not support async")
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        )
 
     args_schema: Optional[Type[BaseModel]] = TimetableCheckInput
 
 
+class TimetableAvailabilityMatrixTool(BaseTool):
+    name = "timetable_availability_matrix"
+    description = """
+    Useful for when you need the availability of many person or rooms over many time slots at once,
+    e.g. which rooms are free at each hour of the week. Ask this once instead of checking slot by slot.
+    """
+
+    def _run(
+        self,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        instance_type: str = "room",
+        names_requested: Optional[list[str]] = None,
+        slot_minutes_requested: int = 60,
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+    ):
+        window_starts, window_ends = slot_windows(
+            datetime_start_requested,
+            datetime_end_requested,
+            datetime.timedelta(minutes=slot_minutes_requested),
+            working_hours_from(
+                working_hour_start_requested, working_hour_end_requested
+            ),
+        )
+        free_df = get_availability_matrix(
+            instance_type, names_requested, window_starts, window_ends
+        )
+
+        return format_availability_matrix(
+            free_df, "Room " if instance_type == "room" else ""
+        )
+
+    async def _arun(
+        self,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        instance_type: str = "room",
+        names_requested: Optional[list[str]] = None,
+        slot_minutes_requested: int = 60,
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+    ):
+        return await run_in_thread(
+            self._run,
+            datetime_start_requested,
+            datetime_end_requested,
+            instance_type,
+            names_requested,
+            slot_minutes_requested,
+            working_hour_start_requested,
+            working_hour_end_requested,
+        )
+
+    args_schema: Optional[Type[BaseModel]] = TimetableAvailabilityMatrixInput
+
+
 class TimetableGetTool(BaseTool):
     name = "timetable_get"
     description = "Useful for when you need to find the schedule of specific person or room based on user request"
@@ -69,11 +174,13 @@ class TimetableGetTool(BaseTool):
         ),
         room_requested: Optional[list[str]] = None,
     ):
-        result = get_timetable(
-            person_requested,
-            datetime_start_requested,
-            datetime_end_requested,
-            room_requested,
+        result = format_timetable(
+            get_timetable(
+                person_requested,
+                datetime_start_requested,
+                datetime_end_requested,
+                room_requested,
+            )
         )
 
         return result
@@ -89,7 +196,13 @@ class TimetableGetTool(BaseTool):
         ),
         room_requested: Optional[list[str]] = None,
     ):
-        raise NotImplementedError("This tool does not support async")
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        )
 
     args_schema: Optional[Type[BaseModel]] = TimetableCheckInput
 
@@ -129,11 +242,145 @@ class TimetableConflictCheckerTool(BaseTool):
         ),
         room_requested: Optional[list[str]] = None,
     ):
-        raise NotImplementedError("This tool does not support async")
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        )
 
     args_schema: Optional[Type[BaseModel]] = TimetableCheckInput
 
 
+class TimetableAuditTool(BaseTool):
+    name = "timetable_audit"
+    description = """
+    Useful for when you need to check the whole timetable for conflicts,
+    e.g. after a new timetable file was uploaded or when the user asks whether anything overlaps.
+    Lists the person and rooms that are booked twice at the same time.
+    """
+
+    def _run(self):
+        return format_audit(*audit_timetable())
+
+    async def _arun(self):
+        return await run_in_thread(self._run)
+
+    args_schema: Optional[Type[BaseModel]] = TimetableAuditInput
+
+
+class TimetableFreeSlotTool(BaseTool):
+    name = "timetable_free_slot"
+    description = """
+    Useful for when you need to find when a group of person and/or room(s) are all available,
+    e.g. the best time to arrange a meeting of a given duration within a date range.
+    Returns the earliest free time windows that fit the requested duration.
+    """
+
+    def _run(
+        self,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        person_requested: Optional[list[str]] = None,
+        room_requested: Optional[list[str]] = None,
+        duration_minutes_requested: int = 30,
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+        top_k: int = 5,
+    ):
+        free_slots = find_free_slots(
+            person_requested,
+            room_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            datetime.timedelta(minutes=duration_minutes_requested),
+            working_hours_from(
+                working_hour_start_requested, working_hour_end_requested
+            ),
+            top_k,
+        )
+
+        if len(free_slots) == 0:
+            return "There is no free slot for the requested duration in the requested time range"
+        return "Free slots where everyone requested is available:\n" + "\n".join(
+            f"- {slot_start:%Y-%m-%d %H:%M} to {slot_end:%Y-%m-%d %H:%M}"
+            for slot_start, slot_end in free_slots
+        )
+
+    async def _arun(
+        self,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        person_requested: Optional[list[str]] = None,
+        room_requested: Optional[list[str]] = None,
+        duration_minutes_requested: int = 30,
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+        top_k: int = 5,
+    ):
+        return await run_in_thread(
+            self._run,
+            datetime_start_requested,
+            datetime_end_requested,
+            person_requested,
+            room_requested,
+            duration_minutes_requested,
+            working_hour_start_requested,
+            working_hour_end_requested,
+            top_k,
+        )
+
+    args_schema: Optional[Type[BaseModel]] = TimetableFreeSlotInput
+
+
+class TimetableSolveTool(BaseTool):
+    name = "timetable_solve"
+    description = """
+    Useful for when you need to arrange many meetings at once, each with its person, duration,
+    candidate rooms and allowed time window, e.g. to plan a whole week of meetings.
+    Returns a start time and a room for every meeting so that nothing overlaps, but does not add them:
+    show the plan to the user and add the schedules with timetable_post_batch once they agree.
+    """
+
+    def _run(
+        self,
+        meetings_requested: list[dict],
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+        step_minutes_requested: int = 15,
+    ):
+        meetings = [
+            TimetableMeetingInput.parse_obj(meeting) for meeting in meetings_requested
+        ]
+        placed_df, unplaced = solve_timetable(
+            meetings,
+            working_hours_from(
+                working_hour_start_requested, working_hour_end_requested
+            ),
+            datetime.timedelta(minutes=step_minutes_requested),
+        )
+
+        return format_solution(placed_df, unplaced, len(meetings))
+
+    async def _arun(
+        self,
+        meetings_requested: list[dict],
+        working_hour_start_requested: Optional[datetime.time] = None,
+        working_hour_end_requested: Optional[datetime.time] = None,
+        step_minutes_requested: int = 15,
+    ):
+        return await run_in_thread(
+            self._run,
+            meetings_requested,
+            working_hour_start_requested,
+            working_hour_end_requested,
+            step_minutes_requested,
+        )
+
+    args_schema: Optional[Type[BaseModel]] = TimetableSolveInput
+
+
 class TimetablePostTool(BaseTool):
     name = "timetable_post"
     description = """
@@ -165,11 +412,93 @@ class TimetablePostTool(BaseTool):
         datetime_end_requested: datetime.datetime,
         room_requested: str,
     ):
-        raise NotImplementedError("This tool does not support async")
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        )
 
     args_schema: Optional[Type[BaseModel]] = TimetablePostInput
 
 
+class TimetablePostBatchTool(BaseTool):
+    name = "timetable_post_batch"
+    description = """
+    Useful for when you need to add several new entries/schedules to the timetable at once,
+    e.g. a meeting with multiple person.
+    Either all schedules are added or none of them, the result lists the status of each schedule.
+    If the schedules cannot be created, explain the reason for the user.
+    """
+
+    def _run(self, schedules_requested: list[dict]):
+        result = post_timetable_batch(
+            [TimetablePostInput.parse_obj(schedule) for schedule in schedules_requested]
+        )
+
+        return result
+
+    async def _arun(self, schedules_requested: list[dict]):
+        return await run_in_thread(self._run, schedules_requested)
+
+    args_schema: Optional[Type[BaseModel]] = TimetablePostBatchInput
+
+
+class TimetablePostRecurringTool(BaseTool):
+    name = "timetable_post_recurring"
+    description = """
+    Useful for when you need to add a schedule that repeats every day(s) or week(s) to the timetable,
+    e.g. a weekly class for a semester. It is stored once and checked against every occurrence.
+    If the schedule cannot be created, explain the reason for the user.
+    """
+
+    def _run(
+        self,
+        person_requested: str,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        room_requested: str,
+        datetime_until_requested: datetime.datetime,
+        frequency_requested: str = "weekly",
+        interval_requested: int = 1,
+    ):
+        result = post_timetable_recurring(
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+            frequency_requested,
+            interval_requested,
+            datetime_until_requested,
+        )
+
+        return result
+
+    async def _arun(
+        self,
+        person_requested: str,
+        datetime_start_requested: datetime.datetime,
+        datetime_end_requested: datetime.datetime,
+        room_requested: str,
+        datetime_until_requested: datetime.datetime,
+        frequency_requested: str = "weekly",
+        interval_requested: int = 1,
+    ):
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+            datetime_until_requested,
+            frequency_requested,
+            interval_requested,
+        )
+
+    args_schema: Optional[Type[BaseModel]] = TimetablePostRecurringInput
+
+
 class TimetableDeleteTool(BaseTool):
     name = "timetable_delete"
     description = "Useful for when you need to delete entry/schedule in the timetable based on user request."
@@ -205,6 +534,12 @@ class TimetableDeleteTool(BaseTool):
         ),
         room_requested: Optional[list[str]] = None,
     ):
-        raise NotImplementedError("This tool does not support async")
+        return await run_in_thread(
+            self._run,
+            person_requested,
+            datetime_start_requested,
+            datetime_end_requested,
+            room_requested,
+        )
 
     args_schema: Optional[Type[BaseModel]] = TimetableCheckInput